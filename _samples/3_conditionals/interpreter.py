@@ -0,0 +1,22 @@
+acc = 0
+count = int(input())
+i = 0
+while i < count:
+    op = int(input())
+    arg = int(input())
+    # a dense chain of tests on op: dispatched through a table of addresses
+    if op == 0:
+        acc = arg
+    elif op == 1:
+        acc = acc + arg
+    elif op == 2:
+        acc = acc - arg
+    elif op == 3:
+        acc = acc * arg
+    elif op == 4:
+        acc = acc // arg
+    elif op == 5:
+        print(acc)
+    else:
+        exit(-1)
+    i = i + 1
@@ -0,0 +1,13 @@
+first = int(input())
+last = int(input())
+leap = 0
+year = first
+while year <= last:
+    r4 = year % 4
+    r100 = year % 100
+    r400 = year % 400
+    if r4 == 0 and r100 != 0 or r400 == 0:
+        leap = leap + 1
+    year = year + 1
+
+print(leap)
@@ -0,0 +1,10 @@
+def gcd(a, b):
+    if b == 0:
+        return a
+    rest = a % b
+    return gcd(b, rest)
+
+x = int(input())
+y = int(input())
+result = gcd(x, y)
+print(result)
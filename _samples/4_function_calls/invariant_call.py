@@ -0,0 +1,17 @@
+def mult(a, b):
+    mult_r = 0
+    while b > 0:
+        mult_r = mult_r + a
+        b = b - 1
+    return mult_r
+
+width = int(input())
+height = int(input())
+count = int(input())
+total = 0
+i = 0
+while i < count:
+    area = mult(width, height) # the same every time: computed once, before the loop
+    total = total + area
+    i = i + 1
+print(total)
@@ -0,0 +1,11 @@
+def sum_to(n):
+    if n <= 0:
+        return 0
+    pred = n - 1
+    partial = sum_to(pred)
+    total = partial + n
+    return total
+
+n = int(input())
+value = sum_to(n)
+print(value)
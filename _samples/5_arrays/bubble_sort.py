@@ -0,0 +1,22 @@
+values_ = [0] * 16 # Initializing an array with 16 cells
+
+n = int(input())
+
+if n > 16:
+    exit(-1) # Pep/9 translation: STOP
+
+for i in range(n):
+    values_[i] = int(input())
+
+# after each pass, the largest remaining value is in place
+for last in range(n - 1, 0, -1):
+    for j in range(last):
+        k = j + 1
+        left = values_[j]
+        right = values_[k]
+        if left > right:
+            values_[j] = right
+            values_[k] = left
+
+for i in range(n):
+    print(values_[i])
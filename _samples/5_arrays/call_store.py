@@ -0,0 +1,25 @@
+def power(base, exp):
+    result = 1
+    while exp > 0:
+        result = result * base
+        exp = exp - 1
+    return result
+
+powers_ = [0] * 8
+
+b = int(input())
+n = int(input())
+
+if n > 8:
+    exit(-1) # Pep/9 translation: STOP
+
+# base and exponent are passed in A and X, X also indexing the array
+i = 0
+while i < n:
+    powers_[i] = power(b, i)
+    i = i + 1
+
+i = 0
+while i < n:
+    print(powers_[i])
+    i = i + 1
@@ -0,0 +1,17 @@
+results_ = [0] * 4 # Initializing an array with 4 cells
+
+a = int(input())
+b = int(input())
+
+# the runtime routines computing these values use X, which indexes the array
+i = 1
+results_[i] = a * b
+i = 2
+results_[i] = a // b
+i = 3
+results_[i] = a % b
+
+i = 0
+while i < 4:
+    print(results_[i])
+    i = i + 1
@@ -0,0 +1,18 @@
+digits_ = [3, 1, 4, 1, 5, 9, 2, 6] # only bytes: packed one element per byte
+copy_ = [0] * 8
+
+n = int(input())
+
+# reading the source element uses X, which then has to index the target again
+i = 0
+while i < n:
+    j = n - i
+    j = j - 1
+    copy_[j] = digits_[i]
+    i = i + 1
+
+copy_[0] = copy_[1]
+i = 0
+while i < n:
+    print(copy_[i])
+    i = i + 1
@@ -0,0 +1,15 @@
+days_ = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31] # initialized in the data section
+
+month = int(input())
+day = int(input())
+if month > 12:
+    exit(-1)
+
+total = day
+m = 1
+while m < month:
+    i = m - 1
+    d = days_[i]
+    total = total + d
+    m = m + 1
+print(total)
@@ -0,0 +1,32 @@
+prime_ = [0] * 100
+
+# eratosthenes.py with the sieve in the top level program: functions cannot access
+# arrays, mult is the same leaf function
+
+def mult(a, b):
+    mult_r = 0
+    while b > 0:
+        mult_r = mult_r + a
+        b = b - 1
+    return mult_r
+
+num = int(input())
+if num > 100:
+    exit(-1) # Pep/9 translation: STOP
+
+p = 2
+sq_p = mult(p, p)
+while sq_p <= num:
+    if prime_[p] == 0:
+        i = sq_p
+        while i < num:
+            prime_[i] = 1
+            i = i + p
+    p = p + 1
+    sq_p = mult(p, p)
+
+i = 2
+while i < num:
+    if prime_[i] == 0:
+        print(i)
+    i = i + 1
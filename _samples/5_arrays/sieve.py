@@ -0,0 +1,15 @@
+prime_ = [0] * 500 # only ever holds 0 and 1: packed one element per byte
+
+n = int(input())
+if n > 500:
+    exit(-1)
+
+p = 2
+while p < n:
+    if prime_[p] == 0:
+        print(p)
+        i = p + p
+        while i < n:
+            prime_[i] = 1
+            i = i + p
+    p = p + 1
@@ -0,0 +1,93 @@
+"""Measures how compile time scales with the number of functions in a program
+
+    python benchmarks/bench_frontend.py --sizes 100 1000 5000
+generates programs made of many small functions, and reports the time spent building
+the symbol table (single walk) next to the former analysis (GlobalVariableExtraction,
+then LocalVariableExtraction twice per function), and the time of a whole translation (rendered to a string). It also compares the memory
+held per instruction by the compiler's Instruction objects and by (label, text) pairs.
+"""
+import argparse
+import ast
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from translator import compile_tree, compile_source
+from generators.Instruction import Instruction
+from generators.Emitter import Emitter
+from visitors.GlobalVariables import GlobalVariableExtraction
+from visitors.LocalVariables import LocalVariableExtraction
+from visitors.SymbolTable import SymbolTable
+
+
+def generate(functions):
+    lines = ['_STEP = 1', 'total = 0']
+    for i in range(functions):
+        lines += [f'def f{i}(a, b):',
+                  '    acc = 0',
+                  '    while b > 0:',
+                  '        acc = acc + a',
+                  '        b = b - _STEP',
+                  '    total = acc',
+                  '    return acc',
+                  '']
+    lines += ['x = int(input())', 'y = int(input())']
+    lines += [f'r{i} = f{i}(x, y)' for i in range(functions)]
+    return '\n'.join(lines) + '\n'
+
+def legacy_analysis(root_node):
+    extractor = GlobalVariableExtraction()
+    extractor.visit(root_node)
+    for _ in range(2):  # once for TopLevelProgram, once in func_process
+        for s in root_node.body:
+            if isinstance(s, ast.FunctionDef):
+                LocalVariableExtraction(extractor.results).visit(s)
+
+def symbol_table(root_node):
+    SymbolTable().visit(root_node)
+
+def translate(root_node):
+    Emitter.render(compile_tree('generated', root_node))
+
+def instruction_memory(source):
+    """Bytes per instruction, as Instruction objects and as (label, text) pairs"""
+    instructions = compile_source(source).instructions()
+    tracemalloc.start()
+    objects = [Instruction(i.mnemonic, i.operand, i.mode, i.label) for i in instructions]
+    as_objects = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    pairs = [(i.label, i.text()) for i in instructions]
+    as_pairs = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return as_objects / len(objects), as_pairs / len(pairs)
+
+def best_of(action, source, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        root_node = ast.parse(source)  # passes annotate the tree, each run gets a fresh one
+        start = time.perf_counter()
+        action(root_node)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print(f'{"functions":>10}{"former analysis":>18}{"symbol table":>15}{"translation":>14}{"per function":>15}'
+          f'{"bytes/instruction":>20}')
+    for size in args.sizes:
+        source = generate(size)
+        legacy = best_of(legacy_analysis, source, args.repeat)
+        single = best_of(symbol_table, source, args.repeat)
+        whole = best_of(translate, source, args.repeat)
+        objects, pairs = instruction_memory(source)
+        print(f'{size:>10}{legacy * 1000:>15.1f} ms{single * 1000:>12.1f} ms{whole * 1000:>11.1f} ms'
+              f'{whole / size * 1e6:>12.1f} us{objects:>9.0f} (text {pairs:.0f})')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""Compares the reference and the threaded simulators on the sample programs
+
+    python benchmarks/bench_simulator.py -o simulator.json
+"""
+import os
+import sys
+import pyperf
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from translator import compile_source
+from simulator.Assembler import Assembler
+from simulator.Simulator import Simulator
+from simulator.ThreadedSimulator import ThreadedSimulator
+from samples import SAMPLES
+
+
+def assemble(path):
+    with open(path) as f:
+        source = f.read()
+    return Assembler(compile_source(source, path).assembly()).assemble()
+
+def run_suite(engine, programs):
+    for program, inputs in programs:
+        engine(program, inputs).run()
+
+if __name__ == '__main__':
+    runner = pyperf.Runner()
+    programs = [(assemble(path), inputs) for path, inputs in SAMPLES.items()]
+    runner.bench_func('samples-reference', run_suite, Simulator, programs)
+    runner.bench_func('samples-threaded', run_suite, ThreadedSimulator, programs)
@@ -0,0 +1,55 @@
+"""Measures what optimization passes bring on the sample programs
+
+    python benchmarks/compare.py --disable peephole [--without dead_code]
+    python benchmarks/compare.py --enable memoize=64
+compiles every sample with the default options and with the given passes disabled
+(passes listed after --without are disabled in both versions, opt-in passes listed
+after --enable are only enabled in the optimized version),
+checks that both versions print the same values, and reports code size (instructions),
+executed instructions, memory reads and stack high water mark (bytes) of each version.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from translator import compile_source, DEFAULT_OPTIONS
+from simulator.Assembler import Assembler
+from simulator.ThreadedSimulator import ThreadedSimulator
+from samples import SAMPLES
+
+
+def measure(path, inputs, options):
+    with open(path) as f:
+        source = f.read()
+    program = Assembler(compile_source(source, path, options).assembly()).assemble()
+    sim = ThreadedSimulator(program, inputs)
+    stats = sim.run()
+    return sim.output, len(program.listing), stats
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--disable', nargs='+', default=[], choices=DEFAULT_OPTIONS.keys())
+    parser.add_argument('--without', nargs='+', default=[], choices=DEFAULT_OPTIONS.keys())
+    parser.add_argument('--enable', nargs='+', default=[], metavar='NAME[=VALUE]')
+    args = parser.parse_args()
+    baseline = dict(DEFAULT_OPTIONS, **{name: False for name in args.without + args.disable})
+    optimized = dict(DEFAULT_OPTIONS, **{name: False for name in args.without})
+    for option in args.enable:
+        name, _, value = option.partition('=')
+        if name not in DEFAULT_OPTIONS:
+            raise ValueError(f'Unknown option: {name}')
+        optimized[name] = int(value) if value else True
+    root = os.path.join(os.path.dirname(__file__), '..')
+    print(f'{"sample":<36}{"code":>12}{"executed":>20}{"reads":>18}{"stack":>14}')
+    for path, inputs in SAMPLES.items():
+        before_output, before_size, before = measure(os.path.join(root, path), inputs, baseline)
+        after_output, after_size, after = measure(os.path.join(root, path), inputs, optimized)
+        if before_output != after_output:
+            raise ValueError(f'{path}: output changed from {before_output} to {after_output}')
+        print(f'{path[9:]:<36}{before_size:>5} -> {after_size:<5}'
+              f'{before.instructions:>9} -> {after.instructions:<8}{before.reads:>8} -> {after.reads:<6}'
+              f'{before.stack_high_water:>6} -> {after.stack_high_water:<5}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+# Sample programs that compile and run correctly, with the values read by their DECI
+SAMPLES = {
+    '_samples/1_global/add_sub.py': [5],
+    '_samples/1_global/factorial.py': [7],
+    '_samples/1_global/fibonnaci.py': [20],
+    '_samples/1_global/mult.py': [13, 3000],
+    '_samples/1_global/simple.py': [],
+    '_samples/2_mem_alloc/add_sub.py': [5],
+    '_samples/2_mem_alloc/factorial.py': [6],
+    '_samples/2_mem_alloc/fibonnaci.py': [20],
+    '_samples/2_mem_alloc/mult.py': [13, 3000],
+    '_samples/3_conditionals/factorial.py': [6],
+    '_samples/3_conditionals/gcd.py': [1071, 462],
+    '_samples/3_conditionals/leap_years.py': [1880, 2024],
+    '_samples/3_conditionals/interpreter.py': [12, 0, 7, 1, 3, 2, 1, 3, 5, 4, 2, 5, 0,
+                                               0, 100, 1, 1, 2, 2, 3, 3, 4, 4, 5, 0],
+    '_samples/3_conditionals/smart_mult.py': [3, 2000],
+    '_samples/4_function_calls/call_param.py': [5],
+    '_samples/4_function_calls/call_return.py': [5],
+    '_samples/4_function_calls/call_void.py': [5],
+    '_samples/4_function_calls/factorial.py': [6],
+    '_samples/4_function_calls/factorial_rec.py': [6],
+    '_samples/4_function_calls/fib_rec.py': [10],
+    '_samples/4_function_calls/fibonnaci.py': [20],
+    '_samples/4_function_calls/gcd_rec.py': [1071, 462],
+    '_samples/4_function_calls/invariant_call.py': [30, 20, 10],
+    '_samples/4_function_calls/sum_rec.py': [200],
+    '_samples/4_function_calls/test_1.py': [],
+    '_samples/4_function_calls/tester_main.py': [13, 300],
+    '_samples/5_arrays/bubble_sort.py': [8, 5, -3, 12, 0, 7, 7, -20, 100],
+    '_samples/5_arrays/call_store.py': [3, 6],
+    '_samples/5_arrays/computed_store.py': [17, 5],
+    '_samples/5_arrays/copy_elements.py': [8],
+    '_samples/5_arrays/day_of_year.py': [12, 31],
+    '_samples/5_arrays/eratosthenes_global.py': [100],
+    '_samples/5_arrays/global_read.py': [2, 5, 1, 2, 3, 4, 5],
+    '_samples/5_arrays/sieve.py': [100],
+    '_samples/5_arrays/test.py': [4, 9, 8, 7, 6],
+}
@@ -0,0 +1,23 @@
+import io
+from .Program import Program
+
+
+class Emitter():
+    """Writes a translated program as Pep/9 assembly to a text stream, in one write"""
+
+    def __init__(self, stream) -> None:
+        self.__stream = stream
+
+    def emit(self, program: Program):
+        self.__stream.write(self.render(program))
+
+    @staticmethod
+    def render(program: Program):
+        buffer = io.StringIO()
+        for section in program.sections():
+            for comment in section.comments:
+                buffer.write(f'; {comment}\n')
+            for instruction in section.instructions:
+                label, instr = instruction.label, instruction.text()
+                buffer.write(f'\t\t{instr}\n' if label == None else f'{str(label+":"):<9}\t{instr}\n')
+        return buffer.getvalue()
@@ -0,0 +1,46 @@
+class Instruction():
+    """One line of assembly: an optional label, a mnemonic (or a directive such as
+    .WORD), an optional operand (a symbol or a number) and its addressing mode.
+
+    Code generators and optimizers work on these, text is only produced by the emitter.
+    Mnemonics, modes and symbols are identifiers, so Python interns them: every
+    instruction only holds references to shared strings (or small ints)."""
+
+    __slots__ = ('label', 'mnemonic', 'operand', 'mode')
+
+    def __init__(self, mnemonic: str, operand=None, mode: str = None, label: str = None) -> None:
+        self.label = label
+        self.mnemonic = mnemonic
+        self.operand = operand
+        self.mode = mode
+
+    def argument(self):
+        """Operand as written in assembly (with its addressing mode), None without operand"""
+        if self.operand is None:
+            return None
+        return f'{self.operand},{self.mode}' if self.mode is not None else str(self.operand)
+
+    def text(self):
+        """Instruction as written in assembly, without its label"""
+        return self.mnemonic if self.operand is None else f'{self.mnemonic} {self.argument()}'
+
+    def relabel(self, label):
+        return Instruction(self.mnemonic, self.operand, self.mode, label)
+
+    def is_directive(self):
+        return self.mnemonic[0] == '.'
+
+    @staticmethod
+    def parse(text: str, label: str = None):
+        """Reads one instruction (without its label) written in assembly"""
+        parts = text.split(None, 1)
+        if len(parts) == 1:
+            return Instruction(parts[0], label=label)
+        mnemonic, argument = parts[0], parts[1].strip()
+        if mnemonic[0] != '.' and ',' in argument:  # .ASCII strings may contain commas
+            operand, mode = argument.rsplit(',', 1)
+            return Instruction(mnemonic, operand.strip(), mode.strip(), label)
+        return Instruction(mnemonic, argument, label=label)
+
+    def __repr__(self):
+        return f'Instruction({self.label!r}, {self.text()!r})'
@@ -1,34 +1,24 @@
-import ast
+from visitors.SymbolTable import FunctionSymbols
+from .Program import Section
+from .Instruction import Instruction
 
-class LocalMemoryAllocation(ast.NodeVisitor):
-# Responsible for local memory allocation of each function definition (printing equal statements)
-    def __init__(self, local_vars: dict()) -> None:
+class LocalMemoryAllocation():
+# Responsible for local memory allocation of each function definition (equate statements)
+    def __init__(self, local_vars: FunctionSymbols) -> None:
         self.__local_vars = local_vars
-        self.returns = False
+        self.returns = local_vars.returns
 
     def generate(self):
-        print('; Allocating local variables on the stack')
-        returns = False
-        numvars = len(self.__local_vars)*2 
-        for var in self.__local_vars: # if function returns a value, we have to allocate space for it
-            if  var.endswith('Ret'): 
-                # allocating space on the stack for the return address
-                numvars = len(self.__local_vars)*2 
-                print(f'{str(var+":"):<9}\t.EQUATE 0') 
-                returns = True
-                self.returns = True
-                
-            
-        for n in self.__local_vars:
-            if n.endswith('N') and returns == True:
-                numvars -= 2
-                returns = False
-            elif n.endswith('N') and returns == False:
-                numvars -= 2
-            if not n.endswith('Ret'):
-                print(f'{str(n+":"):<9}\t.EQUATE {numvars}') # reserving memory
-                numvars -= 2
-          
-             
-
-            
\ No newline at end of file
+        section = Section(['Allocating local variables on the stack'])
+        if self.__local_vars.registers:
+            section.comments.append('Parameters passed in A and X, result returned in A')
+        if self.__local_vars.memo:
+            section.comments.append(f'Results kept in {self.__local_vars.memo} for arguments 0 to '
+                                    f'{self.__local_vars.memo_size - 1}')
+        shared = [name for name, offset in self.__local_vars.results.items() if offset < self.__local_vars.locals_size]
+        if len(shared) > self.__local_vars.locals_size // 2:
+            section.comments.append(f'{len(shared)} local variables in {self.__local_vars.locals_size // 2} slots '
+                                    f'(variables never live at the same time share one)')
+        for name, offset in self.__local_vars.results.items():
+            section.instructions.append(Instruction('.EQUATE', offset, label=name)) # stack slot, relative to SP
+        return section
@@ -0,0 +1,53 @@
+from .Instruction import Instruction
+
+
+class Section():
+    """Comment lines followed by labeled instructions"""
+
+    def __init__(self, comments=(), instructions=()) -> None:
+        self.comments = list(comments)
+        self.instructions: list[Instruction] = list(instructions)
+
+
+class CompiledFunction():
+    """Stack frame equates and code of a function definition"""
+
+    def __init__(self, name: str, frame: Section, code: Section, runtime_calls=()) -> None:
+        self.name = name
+        self.frame = frame
+        self.code = code
+        self.runtime_calls = set(runtime_calls)  # runtime library routines it uses
+
+    def sections(self):
+        return [self.frame, self.code]
+
+
+class Program():
+    """A translated program: data section, per-function code, runtime library and
+    top-level code, in the order they are laid out in memory"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.header = Section([f'Translating {name}'])
+        self.data = Section()
+        self.functions = dict()  # function name -> CompiledFunction, in definition order
+        self.runtime = Section()
+        self.top_level = Section()
+
+    def sections(self):
+        result = [self.header, self.data]
+        for function in self.functions.values():
+            result += function.sections()
+        result += [self.runtime, self.top_level]
+        return result
+
+    def instructions(self) -> list[Instruction]:
+        """Every instruction of the program, in order"""
+        result = list()
+        for section in self.sections():
+            result += section.instructions
+        return result
+
+    def assembly(self) -> list[tuple[str, str]]:
+        """(label, instruction text) pairs, ready for the assembler"""
+        return [(instruction.label, instruction.text()) for instruction in self.instructions()]
@@ -0,0 +1,215 @@
+import ast
+from .Program import Section
+from .Instruction import Instruction
+
+# Runtime routines, called with the left operand in A and the right operand in X, and
+# returning their result in A. They keep their temporaries in static memory (they never
+# call user code, so they do not need to be reentrant) and run in O(log n): one
+# iteration per bit of a 16 bits word.
+ROUTINES = {
+    # A <- A * X, shift-and-add on the bits of the multiplier (16 bits wrap-around)
+    'rt_mul': [
+        ('rt_mul', 'STWA rt_mca,d'),
+        (None, 'STWX rt_mpr,d'),
+        (None, 'LDWA 0,i'),
+        (None, 'STWA rt_prd,d'),
+        ('rt_mull', 'LDWA rt_mpr,d'),
+        (None, 'BREQ rt_mule'),
+        (None, 'ASRA'),  # C <- lowest bit of the multiplier
+        (None, 'ANDA 0x7FFF,i'),  # logical shift: ANDA keeps C
+        (None, 'STWA rt_mpr,d'),
+        (None, 'BRC rt_mula'),
+        (None, 'BR rt_muls'),
+        ('rt_mula', 'LDWA rt_prd,d'),
+        (None, 'ADDA rt_mca,d'),
+        (None, 'STWA rt_prd,d'),
+        ('rt_muls', 'LDWA rt_mca,d'),
+        (None, 'ASLA'),
+        (None, 'STWA rt_mca,d'),
+        (None, 'BR rt_mull'),
+        ('rt_mule', 'LDWA rt_prd,d'),
+        (None, 'RET'),
+        ('rt_mca', '.BLOCK 2'),
+        ('rt_mpr', '.BLOCK 2'),
+        ('rt_prd', '.BLOCK 2'),
+    ],
+    # A <- A // X and X <- A % X (Python floor semantics), shift-and-subtract on the
+    # magnitudes, then sign correction. Dividing by zero is undefined.
+    'rt_div': [
+        ('rt_div', 'STWA rt_a,d'),
+        (None, 'STWX rt_b,d'),
+        (None, 'LDWA rt_a,d'),
+        (None, 'BRGE rt_dv1'),
+        (None, 'NEGA'),
+        ('rt_dv1', 'STWA rt_n,d'),  # |a|
+        (None, 'LDWA rt_b,d'),
+        (None, 'BRGE rt_dv2'),
+        (None, 'NEGA'),
+        ('rt_dv2', 'STWA rt_d,d'),  # |b|
+        (None, 'LDWA 0,i'),
+        (None, 'STWA rt_q,d'),
+        (None, 'STWA rt_r,d'),
+        (None, 'LDWX 16,i'),
+        ('rt_dv3', 'LDWA rt_n,d'),
+        (None, 'ASLA'),  # C <- next bit of the dividend
+        (None, 'STWA rt_n,d'),
+        (None, 'LDWA rt_r,d'),
+        (None, 'ROLA'),
+        (None, 'CPWA rt_d,d'),  # C set when r >= |b| (unsigned)
+        (None, 'BRC rt_dv4'),
+        (None, 'STWA rt_r,d'),
+        (None, 'LDWA rt_q,d'),
+        (None, 'ASLA'),
+        (None, 'STWA rt_q,d'),
+        (None, 'BR rt_dv5'),
+        ('rt_dv4', 'SUBA rt_d,d'),
+        (None, 'STWA rt_r,d'),
+        (None, 'LDWA rt_q,d'),
+        (None, 'ASLA'),
+        (None, 'ORA 1,i'),
+        (None, 'STWA rt_q,d'),
+        ('rt_dv5', 'SUBX 1,i'),
+        (None, 'BRNE rt_dv3'),
+        (None, 'LDWA rt_a,d'),  # the truncated remainder has the sign of a
+        (None, 'BRGE rt_dv6'),
+        (None, 'LDWA rt_r,d'),
+        (None, 'NEGA'),
+        (None, 'STWA rt_r,d'),
+        ('rt_dv6', 'LDWA rt_a,d'),
+        (None, 'BRLT rt_dv7'),
+        (None, 'LDWA rt_b,d'),
+        (None, 'BRGE rt_dve'),
+        (None, 'BR rt_dvn'),
+        ('rt_dv7', 'LDWA rt_b,d'),
+        (None, 'BRLT rt_dve'),
+        ('rt_dvn', 'LDWA rt_q,d'),  # signs differ: negative quotient, rounded down
+        (None, 'NEGA'),
+        (None, 'STWA rt_q,d'),
+        (None, 'LDWA rt_r,d'),
+        (None, 'BREQ rt_dve'),
+        (None, 'ADDA rt_b,d'),
+        (None, 'STWA rt_r,d'),
+        (None, 'LDWA rt_q,d'),
+        (None, 'SUBA 1,i'),
+        (None, 'STWA rt_q,d'),
+        ('rt_dve', 'LDWA rt_q,d'),
+        (None, 'LDWX rt_r,d'),
+        (None, 'RET'),
+        ('rt_a', '.BLOCK 2'),
+        ('rt_b', '.BLOCK 2'),
+        ('rt_n', '.BLOCK 2'),
+        ('rt_d', '.BLOCK 2'),
+        ('rt_q', '.BLOCK 2'),
+        ('rt_r', '.BLOCK 2'),
+    ],
+    # A <- A % X
+    'rt_mod': [
+        ('rt_mod', 'CALL rt_div'),
+        (None, 'LDWA rt_r,d'),
+        (None, 'RET'),
+    ],
+    # Bit arrays: A holds the index of the element, X the address of the array.
+    # A <- the element (0 or 1)
+    'rt_bget': [
+        ('rt_bget', 'CALL rt_bpos'),
+        (None, 'LDWA 0,i'),
+        (None, 'LDBA 0,x'),
+        (None, 'ANDA rt_bmk,d'),
+        (None, 'BREQ rt_bge'),
+        (None, 'LDWA 1,i'),
+        ('rt_bge', 'RET'),
+    ],
+    # element <- 1
+    'rt_bset': [
+        ('rt_bset', 'CALL rt_bpos'),
+        (None, 'LDBA 0,x'),
+        (None, 'ORA rt_bmk,d'),
+        (None, 'STBA 0,x'),
+        (None, 'RET'),
+    ],
+    # element <- 0
+    'rt_bclr': [
+        ('rt_bclr', 'CALL rt_bpos'),
+        (None, 'LDWA rt_bmk,d'),
+        (None, 'NOTA'),
+        (None, 'STWA rt_bmk,d'),
+        (None, 'LDBA 0,x'),
+        (None, 'ANDA rt_bmk,d'),
+        (None, 'STBA 0,x'),
+        (None, 'RET'),
+    ],
+    # X <- address of the byte holding the element, rt_bmk <- mask of its bit
+    'rt_bpos': [
+        ('rt_bpos', 'STWX rt_bad,d'),
+        (None, 'STWA rt_bix,d'),
+        (None, 'ANDA 7,i'),
+        (None, 'STWA rt_bmk,d'),
+        (None, 'LDWX rt_bmk,d'),
+        (None, 'LDWA 0,i'),
+        (None, 'LDBA rt_bits,x'),
+        (None, 'STWA rt_bmk,d'),
+        (None, 'LDWA rt_bix,d'),
+        (None, 'ASRA'),  # indexes are positive: 8 elements per byte
+        (None, 'ASRA'),
+        (None, 'ASRA'),
+        (None, 'ADDA rt_bad,d'),
+        (None, 'STWA rt_bad,d'),
+        (None, 'LDWX rt_bad,d'),
+        (None, 'RET'),
+        ('rt_bad', '.BLOCK 2'),
+        ('rt_bix', '.BLOCK 2'),
+        ('rt_bmk', '.BLOCK 2'),
+        ('rt_bits', '.BYTE 1'),
+    ] + [(None, f'.BYTE {1 << bit}') for bit in range(1, 8)],
+}
+
+DEPENDENCIES = {'rt_mod': {'rt_div'}, 'rt_bget': {'rt_bpos'}, 'rt_bset': {'rt_bpos'}, 'rt_bclr': {'rt_bpos'}}
+
+OPERATIONS = {ast.Mult: 'rt_mul', ast.FloorDiv: 'rt_div', ast.Mod: 'rt_mod'}
+
+
+class RuntimeLibrary():
+    """Generates the runtime routines used by the program, and only those"""
+
+    def __init__(self, used: set) -> None:
+        self.__used = set(used)
+        for name in used:
+            self.__used |= DEPENDENCIES.get(name, set())
+
+    def instructions(self):
+        result = list()
+        for name in sorted(self.__used):
+            result += [Instruction.parse(instr, label) for label, instr in ROUTINES[name]]
+        return result
+
+    def generate(self):
+        if not self.__used:
+            return Section()
+        return Section(['Runtime library'], self.instructions())
+
+    @staticmethod
+    def strength_reduce(op, constant: int):
+        """Replaces an operation with a constant right operand by a sequence of shifts and
+        additions when it is cheaper than calling the runtime. The sequence starts with the
+        left operand loaded in A; ADDA entries without operand add the left operand again.
+        Returns None when the runtime routine must be used."""
+        if isinstance(op, ast.Mult):
+            magnitude = abs(constant)
+            if magnitude == 0:
+                return [Instruction('LDWA', 0, 'i')]
+            if bin(magnitude).count('1') > 4:
+                return None
+            sequence = list()
+            for bit in bin(magnitude)[3:]:  # Horner's scheme on the bits after the leading one
+                sequence.append(Instruction('ASLA'))
+                if bit == '1':
+                    sequence.append(Instruction('ADDA'))
+            if constant < 0:
+                sequence.append(Instruction('NEGA'))
+            return sequence
+        if constant > 0 and constant & (constant - 1) == 0:  # power of two
+            if isinstance(op, ast.FloorDiv):
+                return [Instruction('ASRA') for _ in range(constant.bit_length() - 1)]  # arithmetic shifts round down
+            if isinstance(op, ast.Mod):
+                return [Instruction('ANDA', constant - 1, 'i')]
+        return None
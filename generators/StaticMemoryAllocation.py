@@ -1,22 +1,64 @@
 
+from .Program import Section
+from .Instruction import Instruction
+
 class StaticMemoryAllocation():
 
-    def __init__(self, global_vars: dict()) -> None:
+    def __init__(self, global_vars: dict(), array_modes=None, array_values=None) -> None:
         self.__global_vars = global_vars
+        self.__array_modes = array_modes if array_modes is not None else dict()  # packed arrays
+        self.__array_values = array_values if array_values is not None else dict()  # initialized arrays
         self.__symbol_table = dict()
 
     def generate(self):
-        print('; Allocating Global (static) memory')
+        section = Section(['Allocating Global (static) memory'])
         for n in self.__global_vars.keys():
             name = self.__get_name(n)
-            if name[-1] == '_':
-                print(f'{str(name + ":"):<9}\t.BLOCK {2 * self.__global_vars[n]}')  # reserving memory for array
+            if name[-1] == '_' and n in self.__array_values:
+                section.instructions += self.__array_data(n, name)  # array with its initial contents
+            elif name[-1] == '_':
+                section.instructions.append(Instruction('.BLOCK', self.__array_size(n), label=name))  # reserving memory for array
             elif self.__global_vars[n] is None:
-                print(f'{str(name + ":"):<9}\t.BLOCK 2')  # reserving memory for undefined variable
+                section.instructions.append(Instruction('.BLOCK', 2, label=name))  # reserving memory for undefined variable
             elif self.is_constant(n):
-                print(f'{str(name + ":"):<9}\t.EQUATE {self.__global_vars[n]}')  # reserving memory for constant
+                section.instructions.append(Instruction('.EQUATE', self.__global_vars[n], label=name))  # reserving memory for constant
             else:
-                print(f'{str(name + ":"):<9}\t.WORD {self.__global_vars[n]}')  # reserving memory for variable
+                section.instructions.append(Instruction('.WORD', self.__global_vars[n], label=name))  # reserving memory for variable
+        return section
+
+    def __array_size(self, name):
+        length = self.__global_vars[name]
+        match self.__array_modes.get(name):
+            case 'byte':
+                return length
+            case 'bit':
+                return (length + 7) // 8
+        return 2 * length
+
+    def __array_data(self, n, name):
+        """One .WORD (or .BYTE) per element, runs of zeros being reserved by a single .BLOCK"""
+        values = self.__array_values[n]
+        directive, size = '.WORD', 2
+        match self.__array_modes.get(n):
+            case 'byte':
+                directive, size = '.BYTE', 1
+            case 'bit':  # element i is bit i % 8 of byte i // 8
+                directive, size = '.BYTE', 1
+                values = [sum(bit << i for i, bit in enumerate(values[start:start + 8]))
+                          for start in range(0, len(values), 8)]
+        instructions = list()
+        zeros = 0
+        for value in values + [None]:
+            if value == 0:
+                zeros += 1
+                continue
+            if zeros:
+                instructions.append(Instruction('.BLOCK', zeros * size))
+                zeros = 0
+            if value is not None:
+                instructions.append(Instruction(directive, value))
+        instructions[0] = instructions[0].relabel(name)
+        return instructions
 
     def __get_name(self, name: str):
         if name not in self.__symbol_table.keys():
@@ -0,0 +1,255 @@
+import ast
+import operator
+
+BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+
+COMPARE = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+
+class ConstantFolding(ast.NodeTransformer):
+    """Folds constant expressions and propagates variables holding known constants
+    through straight-line code, before code generation.
+
+    Only operands that the code generators read as values are rewritten (binary
+    operations, comparisons and right hand sides of assignments): call arguments
+    and array indexes must stay variables."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.known = dict()  # variable -> value it holds at the current point
+        self.equates = dict()  # _UPPER constants, known everywhere
+        self.folded = 0
+        self.propagated = 0
+        self.removed_branches = 0
+
+    def visit_Module(self, node):
+        for s in node.body:
+            if isinstance(s, ast.Assign) and isinstance(s.targets[0], ast.Name) and self.is_constant(s.targets[0].id):
+                value = self.__fold(s.value)
+                if isinstance(value, ast.Constant):
+                    self.equates[s.targets[0].id] = value.value
+        self.known = dict(self.equates)
+        node.body = self.__block(node.body)
+        return node
+
+    def visit_FunctionDef(self, node):
+        # globals may have changed by the time the function is called: only equates are known
+        saved = self.known
+        self.known = dict(self.equates)
+        for arg in node.args.args:
+            self.known.pop(arg.arg, None)
+        node.body = self.__block(node.body)
+        self.known = saved
+        return node
+
+    ####
+    ## Statements
+    ####
+
+    def visit_Assign(self, node):
+        target = node.targets[0]
+        node.value = self.__fold(node.value)
+        if isinstance(node.value, ast.Name):
+            node.value = self.__propagate(node.value)
+        if isinstance(target, ast.Name) and not self.is_array(target.id):
+            if isinstance(node.value, ast.Constant) and isinstance(node.value.value, int):
+                self.known[target.id] = node.value.value
+            else:
+                self.known.pop(target.id, None)
+        return node
+
+    def visit_AugAssign(self, node):
+        if isinstance(node.target, ast.Name):
+            self.known.pop(node.target.id, None)
+        return node
+
+    def visit_While(self, node):
+        # anything assigned in the loop is unknown when the test is evaluated
+        for name in self.assigned(node.body):
+            self.known.pop(name, None)
+        node.test = self.__fold_test(node.test)
+        if self.__evaluate(node.test) is False:
+            self.removed_branches += 1
+            return []
+        node.body = self.__block(node.body)
+        for name in self.assigned(node.body):
+            self.known.pop(name, None)
+        return node
+
+    def visit_If(self, node):
+        node.test = self.__fold_test(node.test)
+        outcome = self.__evaluate(node.test)
+        if outcome is not None:
+            # the branch not taken can be dropped altogether
+            self.removed_branches += 1
+            return self.__block(node.body if outcome else node.orelse)
+        before = dict(self.known)
+        node.body = self.__block(node.body)
+        after_body = self.known
+        self.known = before
+        node.orelse = self.__block(node.orelse)
+        # only keep what both branches agree on
+        self.known = {name: value for name, value in self.known.items() if after_body.get(name) == value}
+        return node
+
+    def visit_Expr(self, node):
+        return node
+
+    def visit_Return(self, node):
+        return node
+
+    ####
+    ## Expressions
+    ####
+
+    def __fold(self, node):
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            operand = self.__fold(node.operand)
+            if isinstance(operand, ast.Constant) and isinstance(operand.value, int):
+                return self.__constant(-operand.value, node)
+            node.operand = operand
+            return node
+        if not isinstance(node, ast.BinOp) or isinstance(node.left, ast.List):
+            return node  # arrays initializers ([0] * n) are left as is
+        node.left = self.__propagate(self.__fold(node.left))
+        node.right = self.__propagate(self.__fold(node.right))
+        left, right, op = node.left, node.right, type(node.op)
+        if op not in BINARY:
+            return node
+        if self.__is_int(left) and self.__is_int(right):
+            if op in (ast.FloorDiv, ast.Mod) and right.value == 0:
+                return node
+            return self.__constant(BINARY[op](left.value, right.value), node)
+        # reassociating (x + c1) + c2 into x + (c1 + c2)
+        if op in (ast.Add, ast.Sub) and self.__is_int(right) and isinstance(left, ast.BinOp) \
+                and type(left.op) in (ast.Add, ast.Sub) and self.__is_int(left.right):
+            inner = left.right.value if isinstance(left.op, ast.Add) else -left.right.value
+            outer = right.value if op is ast.Add else -right.value
+            node.left, node.op = left.left, ast.Add()
+            node.right = self.__constant(inner + outer, right)
+            return self.__fold(node)
+        # identities
+        if op in (ast.Add, ast.Sub) and self.__is_int(right) and right.value == 0:
+            self.folded += 1
+            return left
+        if op is ast.Add and self.__is_int(left) and left.value == 0:
+            self.folded += 1
+            return right
+        if op is ast.Mult and self.__is_int(right) and right.value == 1:
+            self.folded += 1
+            return left
+        if op is ast.Mult and self.__is_int(left) and left.value == 1:
+            self.folded += 1
+            return right
+        return node
+
+    def __fold_test(self, node):
+        if isinstance(node, ast.Compare):
+            node.left = self.__propagate(self.__fold(node.left))
+            node.comparators = [self.__propagate(self.__fold(c)) for c in node.comparators]
+        elif isinstance(node, ast.Name):
+            return self.__propagate(node)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            node.operand = self.__fold_test(node.operand)
+        elif isinstance(node, ast.BoolOp):
+            # operands known not to decide (true ones in an and, false ones in an or) go
+            neutral = isinstance(node.op, ast.And)
+            values = [self.__fold_test(value) for value in node.values]
+            kept = [value for value in values if self.__evaluate(value) is not neutral]
+            self.folded += len(values) - len(kept)
+            if len(kept) == 1:
+                return kept[0]
+            node.values = kept or values
+        return node
+
+    def __evaluate(self, node):
+        """Outcome of a test when it is known at compile time, None otherwise"""
+        if isinstance(node, ast.Compare) and all(type(op) in COMPARE for op in node.ops):
+            operands = [node.left] + node.comparators
+            outcomes = [COMPARE[type(op)](left.value, right.value) if self.__is_int(left) and self.__is_int(right)
+                        else None for left, op, right in zip(operands, node.ops, operands[1:])]
+            return self.__all(outcomes)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            outcome = self.__evaluate(node.operand)
+            return None if outcome is None else not outcome
+        if isinstance(node, ast.BoolOp):
+            outcomes = [self.__evaluate(value) for value in node.values]
+            if isinstance(node.op, ast.And):
+                return self.__all(outcomes)
+            return True if True in outcomes else False if all(o is False for o in outcomes) else None
+        if self.__is_int(node):
+            return node.value != 0
+        return None
+
+    @staticmethod
+    def __all(outcomes):
+        return False if False in outcomes else True if all(o is True for o in outcomes) else None
+
+    ####
+    ## Helper functions
+    ####
+
+    def __block(self, statements):
+        result = list()
+        for s in statements:
+            visited = self.visit(s)
+            if isinstance(visited, list):
+                result.extend(visited)
+            elif visited is not None:
+                result.append(visited)
+        return result
+
+    def __propagate(self, node):
+        if isinstance(node, ast.Name) and node.id in self.known:
+            self.propagated += 1
+            return self.__constant(self.known[node.id], node, count=False)
+        return node
+
+    def __constant(self, value, node, count=True):
+        if count:
+            self.folded += 1
+        value = ((value + 0x8000) & 0xFFFF) - 0x8000  # 16 bits arithmetic, like Pep/9
+        return ast.copy_location(ast.Constant(value=value), node)
+
+    @staticmethod
+    def __is_int(node):
+        return isinstance(node, ast.Constant) and isinstance(node.value, int) and not isinstance(node.value, bool)
+
+    @staticmethod
+    def assigned(statements):
+        """Names of the variables assigned anywhere in a list of statements"""
+        names = set()
+        for s in statements:
+            for node in ast.walk(s):
+                if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+                    names.add(node.targets[0].id)
+                elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+                    names.add(node.target.id)
+        return names
+
+    @staticmethod
+    def is_constant(name: str):
+        if name[0] == '_' and name[1:].isupper():
+            return True
+        else:
+            return False
+
+    @staticmethod
+    def is_array(name: str):
+        if name[-1] == '_':
+            return True
+        else:
+            return False
@@ -0,0 +1,109 @@
+from generators.Instruction import Instruction
+
+BRANCHES = ('BR', 'BRLE', 'BRLT', 'BREQ', 'BRNE', 'BRGE', 'BRGT', 'BRV', 'BRC')
+# instructions after which execution never falls through
+TERMINATORS = ('BR', 'RET', 'STOP')
+
+
+class BasicBlock():
+    """A run of instructions only entered through its first one and only left through
+    its last one"""
+
+    def __init__(self, index: int, instructions: list[Instruction]) -> None:
+        self.index = index
+        self.instructions = instructions
+        self.successors = list()  # indexes of the blocks control may go to next
+        self.predecessors = list()
+
+    @property
+    def label(self):
+        return self.instructions[0].label
+
+    @property
+    def last(self):
+        return self.instructions[-1]
+
+    def falls_through(self):
+        return self.last.mnemonic not in TERMINATORS and not self.last.is_directive()
+
+
+class ControlFlowGraph():
+    """Basic blocks of a list of instructions (split at labels and after branches),
+    linked by the jumps and fall-throughs between them.
+
+    Branches through a table (indexed addressing) have unknown targets: every label
+    used as a data operand then counts as an entry point, as do blocks holding
+    directives, which are never executed as code."""
+
+    def __init__(self, instructions: list[Instruction], entry_points=()) -> None:
+        self.blocks = self.__split(instructions)
+        self.labels = {block.label: block.index for block in self.blocks if block.label is not None}
+        self.entry_points = set(entry_points)
+        self.__link()
+
+    @staticmethod
+    def is_jump(instruction):
+        """Branch with a known target"""
+        return instruction.mnemonic in BRANCHES and instruction.mode in (None, 'i')
+
+    def instructions(self):
+        result = list()
+        for block in self.blocks:
+            result += block.instructions
+        return result
+
+    def target(self, instruction):
+        """Block a jump goes to, None when it leaves the instructions"""
+        return self.labels.get(instruction.operand)
+
+    def roots(self):
+        roots = {0} if self.blocks else set()
+        roots |= {self.labels[label] for label in self.entry_points if label in self.labels}
+        indirect = any(block.last.mnemonic in BRANCHES and not self.is_jump(block.last) for block in self.blocks)
+        for block in self.blocks:
+            for instruction in block.instructions:
+                if instruction.is_directive():
+                    roots.add(block.index)
+                if indirect and instruction.mnemonic not in BRANCHES and instruction.operand in self.labels:
+                    roots.add(self.labels[instruction.operand])
+        return roots
+
+    def reachable(self):
+        """Indexes of the blocks control can reach from the roots"""
+        seen = set()
+        pending = list(self.roots())
+        while pending:
+            index = pending.pop()
+            if index not in seen:
+                seen.add(index)
+                pending += self.blocks[index].successors
+        return seen
+
+    ####
+    ## Helper functions
+    ####
+
+    @staticmethod
+    def __split(instructions):
+        blocks, current = list(), list()
+        for instruction in instructions:
+            if instruction.label is not None and current:
+                blocks.append(BasicBlock(len(blocks), current))
+                current = list()
+            current.append(instruction)
+            if instruction.mnemonic in BRANCHES or instruction.mnemonic in TERMINATORS:
+                blocks.append(BasicBlock(len(blocks), current))
+                current = list()
+        if current:
+            blocks.append(BasicBlock(len(blocks), current))
+        return blocks
+
+    def __link(self):
+        for block in self.blocks:
+            last = block.last
+            if self.is_jump(last) and self.target(last) is not None:
+                block.successors.append(self.target(last))
+            if block.falls_through() and block.index + 1 < len(self.blocks):
+                block.successors.append(block.index + 1)
+            for successor in block.successors:
+                self.blocks[successor].predecessors.append(block.index)
@@ -0,0 +1,79 @@
+from generators.Instruction import Instruction
+from .ControlFlowGraph import ControlFlowGraph
+
+
+class DeadCodeElimination():
+    """Removes the blocks control never reaches, the branches to the block that follows
+    anyway, and the NOP1 landing pads nobody jumps to, until nothing changes"""
+
+    def __init__(self, instructions: list[Instruction]) -> None:
+        self.instructions = list(instructions)
+        # the entry point is reached from outside of this list of instructions
+        self.entry_points = {instructions[0].label} if instructions else set()
+        self.unreachable = 0
+        self.branches = 0
+        self.labels = 0
+
+    def optimize(self):
+        changed = True
+        while changed:
+            changed = self.__remove_unreachable() | self.__remove_branches_to_next() | self.__remove_unused_labels()
+        return self.instructions
+
+    ####
+    ## Helper functions
+    ####
+
+    def __remove_unreachable(self):
+        cfg = ControlFlowGraph(self.instructions, self.entry_points)
+        reachable = cfg.reachable()
+        if len(reachable) == len(cfg.blocks):
+            return False
+        self.unreachable += len(cfg.blocks) - len(reachable)
+        cfg.blocks = [block for block in cfg.blocks if block.index in reachable]
+        self.instructions = cfg.instructions()
+        return True
+
+    def __remove_branches_to_next(self):
+        # a jump (conditional or not) to the next block goes there either way
+        cfg = ControlFlowGraph(self.instructions, self.entry_points)
+        renamed = dict()  # label of a removed jump -> label of the block it jumped to
+        removed = 0
+        for block in cfg.blocks[:-1]:
+            last = block.last
+            if cfg.is_jump(last) and cfg.target(last) == block.index + 1:
+                if last.label is not None:
+                    if last.label in self.entry_points:
+                        continue
+                    renamed[last.label] = last.operand
+                block.instructions.pop()
+                removed += 1
+        if not removed:
+            return False
+        self.branches += removed
+        # a block made only of the jump now is empty
+        cfg.blocks = [block for block in cfg.blocks if block.instructions]
+        self.instructions = [self.__rename(instruction, renamed) for instruction in cfg.instructions()]
+        return True
+
+    @staticmethod
+    def __rename(instruction, renamed):
+        operand = instruction.operand
+        while operand in renamed:
+            operand = renamed[operand]
+        if operand is instruction.operand:
+            return instruction
+        return Instruction(instruction.mnemonic, operand, instruction.mode, instruction.label)
+
+    def __remove_unused_labels(self):
+        referenced = {instruction.operand for instruction in self.instructions if instruction.operand is not None}
+        kept = list()
+        for instruction in self.instructions:
+            if instruction.mnemonic == 'NOP1' and (instruction.label is None or instruction.label not in referenced) \
+                    and instruction.label not in self.entry_points:
+                self.labels += 1
+                continue
+            kept.append(instruction)
+        changed = len(kept) != len(self.instructions)
+        self.instructions = kept
+        return changed
@@ -0,0 +1,153 @@
+from collections import deque
+from generators.Instruction import Instruction
+from .ControlFlowGraph import ControlFlowGraph
+from .LoadElimination import WRITES_A, WRITES_X
+from .PeepholeOptimizer import SETS_FLAGS
+
+# instructions setting N and Z otherwise than from the register they write
+OTHER_FLAGS = ('LDBA', 'LDBX', 'CPBA', 'CPBX', 'DECI', 'ADDSP', 'SUBSP', 'MOVAFLG', 'CALL', 'RET')
+# instructions setting both V and C, and those reading either of them
+SETS_VC = ('ADDA', 'ADDX', 'SUBA', 'SUBX', 'CPWA', 'CPWX', 'CPBA', 'CPBX', 'ASLA', 'ASLX',
+           'ADDSP', 'SUBSP', 'MOVAFLG')
+TESTS_VC = ('BRV', 'BRC', 'ROLA', 'ROLX', 'RORA', 'RORX', 'MOVFLGA')
+
+
+class FlagReuse():
+    """Removes the compares with zero (CPWA 0,i and CPWX 0,i) made while N and Z
+    already describe the register compared, on every path leading to them: right after
+    loading it, or after the arithmetic computing it (ADDA, SUBA, ...), the following
+    branch then tests the flags that instruction set. A rotated loop testing its
+    counter (test_N: CPWX 0,i / BRGT loop_N) thus tests the flags of the decrement at
+    the bottom of the loop, and those of the load before it.
+
+    N and Z are the same either way (the compare cannot overflow), but V and C are not:
+    the compare stays when they may be read before being set again (the code a
+    function returns to sets them before reading them)."""
+
+    def __init__(self, instructions: list[Instruction]) -> None:
+        self.instructions = list(instructions)
+        # the entry point is reached from outside of this list of instructions
+        self.entry_points = {instructions[0].label} if instructions else set()
+        self.compares = 0
+
+    def optimize(self):
+        cfg = ControlFlowGraph(self.instructions, self.entry_points)
+        entering, leaving = self.__analyze(cfg)
+        while self.__move(cfg, entering, leaving):
+            cfg = ControlFlowGraph(cfg.instructions(), self.entry_points)
+            entering, leaving = self.__analyze(cfg)
+        result = list()
+        for block in cfg.blocks:
+            state = entering[block.index]
+            instructions = block.instructions
+            for i, instruction in enumerate(instructions):
+                if self.__is_test(instruction) and instruction.mnemonic[-1] == state \
+                        and instruction.label not in self.entry_points and self.__vc_unused(cfg, block.index, i + 1):
+                    if instruction.label is not None:  # the label goes to the next instruction
+                        if i + 1 < len(instructions):
+                            instructions[i + 1] = instructions[i + 1].relabel(instruction.label)
+                        else:
+                            result.append(Instruction('NOP1', label=instruction.label))
+                    self.compares += 1
+                    continue
+                state = self.transfer(state, instruction)
+                result.append(instruction)
+        self.instructions = result
+        return self.instructions
+
+    @classmethod
+    def transfer(cls, state, instruction):
+        """Register ('A' or 'X') whose value N and Z describe after an instruction, None
+        when neither"""
+        mnemonic = instruction.mnemonic
+        if instruction.is_directive() or mnemonic in OTHER_FLAGS:
+            return None
+        if mnemonic in ('CPWA', 'CPWX'):
+            return mnemonic[-1] if cls.__is_test(instruction) else None
+        if mnemonic in SETS_FLAGS:
+            return 'A' if mnemonic in WRITES_A else 'X'
+        if mnemonic in WRITES_A and state == 'A' or mnemonic in WRITES_X and state == 'X':
+            return None  # the register changed, not the flags
+        return state
+
+    ####
+    ## Helper functions
+    ####
+
+    @staticmethod
+    def __is_test(instruction):
+        return instruction.mnemonic in ('CPWA', 'CPWX') and instruction.mode == 'i' \
+            and str(instruction.operand) == '0'
+
+    def __analyze(self, cfg):
+        """Register the flags describe when entering and leaving every block"""
+        roots = cfg.roots()
+        entering = dict()
+        leaving = dict()
+        pending = deque(block.index for block in cfg.blocks)
+        queued = set(pending)
+        while pending:
+            index = pending.popleft()
+            queued.discard(index)
+            block = cfg.blocks[index]
+            known = [leaving[p] for p in block.predecessors if p in leaving]
+            if index in roots or not known:
+                state = None
+            else:
+                state = known[0] if all(s == known[0] for s in known) else None
+            entering[index] = state
+            for instruction in block.instructions:
+                state = self.transfer(state, instruction)
+            if index not in leaving or leaving[index] != state:
+                leaving[index] = state
+                for successor in block.successors:
+                    if successor not in queued:
+                        pending.append(successor)
+                        queued.add(successor)
+        return entering, leaving
+
+    def __move(self, cfg, entering, leaving):
+        """Moves a compare starting a block onto the jumps into it coming from where the
+        flags do not describe the register, when they do on the other paths (typically
+        the jump into a rotated loop, leaving the jump back without a compare), True
+        once done"""
+        roots = cfg.roots()
+        for block in cfg.blocks:
+            compare = block.instructions[0]
+            if not self.__is_test(compare) or entering[block.index] is not None or block.index in roots:
+                continue
+            register = compare.mnemonic[-1]
+            missing = [p for p in block.predecessors if leaving.get(p) != register]
+            if len(missing) == len(block.predecessors) or block.index in missing \
+                    or not self.__vc_unused(cfg, block.index, 1):
+                continue
+            jumps = [cfg.blocks[p] for p in missing]
+            if all(jump.last.mnemonic == 'BR' and cfg.is_jump(jump.last) and jump.successors == [block.index]
+                   for jump in jumps):
+                for jump in jumps:
+                    jump.instructions[-1:] = [compare.relabel(jump.last.label), jump.last.relabel(None)]
+                return True
+        return False
+
+    @staticmethod
+    def __vc_unused(cfg, index, i):
+        """No path from an instruction reads V or C before setting both"""
+        pending, seen = [(index, i)], set()
+        while pending:
+            index, i = pending.pop()
+            block = cfg.blocks[index]
+            for instruction in block.instructions[i:]:
+                if instruction.mnemonic in TESTS_VC:
+                    return False
+                if instruction.mnemonic in SETS_VC or instruction.mnemonic in ('RET', 'STOP') \
+                        or instruction.is_directive():
+                    break
+                if instruction.mnemonic in ('BR', 'BRLE', 'BRLT', 'BREQ', 'BRNE', 'BRGE', 'BRGT') \
+                        and not cfg.is_jump(instruction):
+                    return False  # through a table
+            else:
+                for successor in block.successors:
+                    if successor not in seen:
+                        seen.add(successor)
+                        pending.append((successor, 0))
+        return True
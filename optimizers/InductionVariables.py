@@ -0,0 +1,239 @@
+import re
+from generators.Instruction import Instruction
+from .ControlFlowGraph import ControlFlowGraph, BRANCHES, TERMINATORS
+from .LoadElimination import WRITES_X
+from .PeepholeOptimizer import INDEXED_MODES
+
+# instructions reading the index register, besides the indexed addressing modes
+READS_X = ('STWX', 'STBX', 'CPWX', 'CPBX')
+
+
+class InductionVariables():
+    """Keeps the counter of a loop in the index register while the loop runs.
+
+    Loops are runs of instructions ending with a jump back to their first one, entered
+    either by falling into it or by a single jump (a conditional one goes through a
+    pre_N landing pad setting X up), and only left by falling out of that last jump. The
+    counter is a variable only written by increments (LDWA v / ADDA|SUBA step / STWA v),
+    and the loop must not use X for anything else:
+    - when the counter indexes an array (LDWX v / ASLX, or LDWX v alone for arrays of
+      bytes), X holds the byte offset 2*v (or v) for the whole loop: the index loads
+      disappear and every increment also steps X by 2*step (or step), v itself stays
+      up to date in memory
+    - otherwise, when v is only incremented and compared (LDWA v / CPWA bound), it
+      only lives in X: ADDX step / CPWX bound, stored back when leaving the loop and
+      around calls (functions may read and write global variables)"""
+
+    def __init__(self, instructions: list[Instruction]) -> None:
+        self.instructions = list(instructions)
+        self.resident = 0
+        self.scaled = 0
+        self.__tried = set()  # labels of the loops already looked at
+
+    def optimize(self):
+        while self.__optimize_loop():
+            pass
+        return self.instructions
+
+    ####
+    ## Helper functions
+    ####
+
+    def __optimize_loop(self):
+        """Transforms the innermost loop not looked at yet, False once there is none"""
+        positions = {instruction.label: i for i, instruction in enumerate(self.instructions)
+                     if instruction.label is not None}
+        loops = list()
+        for end, instruction in enumerate(self.instructions):
+            start = positions.get(instruction.operand)
+            if ControlFlowGraph.is_jump(instruction) and start is not None and start <= end \
+                    and instruction.operand not in self.__tried:
+                loops.append((end - start, start, end))
+        if not loops:
+            return False
+        _, start, end = min(loops)
+        self.__tried.add(self.instructions[start].label)
+        entry = self.__entry(start, end, positions)
+        if entry is None:
+            return True
+        candidates = list()  # variables stored by the loop
+        for instruction in self.instructions[start:end + 1]:
+            variable = (str(instruction.operand), instruction.mode)
+            if instruction.mnemonic == 'STWA' and instruction.mode in ('d', 's') \
+                    and not variable[0].isdigit() and variable not in candidates:
+                candidates.append(variable)
+        # the loop counter rather than an accumulator: the variable the loop compares
+        best, best_uses = None, None
+        for variable in candidates:
+            uses = self.__uses(start, end, variable)
+            if uses is not None and (best is None or self.__rank(uses) > self.__rank(best_uses)):
+                best, best_uses = variable, uses
+        if best is not None:
+            self.__rewrite(start, end, entry, best, best_uses)
+        return True
+
+    @staticmethod
+    def __rank(uses):
+        return bool(uses['indexes']), len(uses['compares'])
+
+    def __landing_pad(self, start):
+        number = re.fullmatch(r'\w+_(\d+)', self.instructions[start].label)
+        return f'pre_{number.group(1)}' if number is not None else None
+
+    def __entry(self, start, end, positions):
+        """Where the loop is entered from: the position of the jump into it, or its start
+        when entered by falling into it, None when that is not the only way in"""
+        labels = {instruction.label for instruction in self.instructions[start:end + 1] if instruction.label is not None}
+        jumps_in = [i for i, instruction in enumerate(self.instructions)
+                    if (i < start or i > end) and instruction.operand in labels]
+        before = self.instructions[start - 1] if start > 0 else None
+        falls_in = before is not None and before.mnemonic not in TERMINATORS and not before.is_directive()
+        if not jumps_in and falls_in:
+            return start
+        if len(jumps_in) != 1 or falls_in or not ControlFlowGraph.is_jump(self.instructions[jumps_in[0]]):
+            return None
+        if jumps_in[0] == start - 1 and before.mnemonic == 'BR':
+            return start - 1
+        if self.__landing_pad(start) is None or self.__landing_pad(start) in positions:
+            return None
+        return jumps_in[0]
+
+    def __uses(self, start, end, variable):
+        """How the loop uses a candidate counter: lists of the positions of its
+        increments, comparisons, index computations and calls, None when it cannot be
+        kept in X"""
+        operand, mode = variable
+        code = self.instructions
+        labels = {instruction.label for instruction in code[start:end + 1] if instruction.label is not None}
+        uses = {'increments': list(), 'compares': list(), 'indexes': list(), 'calls': list(), 'reads': 0,
+                'scales': set()}  # indexes: (position, instructions), scales: bytes per element
+        indexed = False  # X holds the index of the variable in the current straight-line code
+        i = start
+        while i <= end:
+            instruction = code[i]
+            following = code[i + 1:i + 3]
+            if instruction.label is not None:
+                indexed = False
+            if instruction.mnemonic in BRANCHES and (not ControlFlowGraph.is_jump(instruction)
+                                                     or instruction.operand not in labels):
+                return None  # leaving the loop, or jumping through a table
+            if instruction.mnemonic == 'RET' or instruction.is_directive():
+                return None
+            if mode == 's' and (instruction.mnemonic in ('CALL', 'ADDSP', 'SUBSP')
+                                or instruction.mode == 's' and str(instruction.operand).isdigit()):
+                return None  # the slot is not at the same place anymore
+            if self.__is(instruction, 'LDWX', variable):
+                length = 2 if len(following) and following[0].mnemonic == 'ASLX' and following[0].label is None else 1
+                uses['indexes'].append((i, length))
+                uses['scales'].add(length)
+                indexed = True
+                i += length
+                continue
+            if instruction.mnemonic in WRITES_X or instruction.mnemonic in READS_X:
+                return None
+            if instruction.mode in INDEXED_MODES and not indexed:
+                return None
+            if self.__is(instruction, 'LDWA', variable) and len(following) == 2 \
+                    and following[0].mnemonic in ('ADDA', 'SUBA') and following[0].label is None \
+                    and not self.__is(following[0], following[0].mnemonic, variable) \
+                    and following[0].mode not in INDEXED_MODES \
+                    and self.__is(following[1], 'STWA', variable) and following[1].label is None:
+                uses['increments'].append(i)
+                i += 3
+                continue
+            if self.__is(instruction, 'LDWA', variable) and len(following) and following[0].mnemonic == 'CPWA' \
+                    and following[0].label is None and not self.__is(following[0], 'CPWA', variable) \
+                    and following[0].mode not in INDEXED_MODES:
+                uses['compares'].append(i)
+                i += 2
+                continue
+            if instruction.mnemonic == 'CALL':
+                uses['calls'].append(i)
+                indexed = False
+            elif str(instruction.operand) == operand and instruction.mode == mode:
+                if instruction.mnemonic in ('STWA', 'STBA', 'DECI'):
+                    return None  # written by something else than an increment
+                uses['reads'] += 1
+            i += 1
+        if not uses['increments']:
+            return None
+        if uses['indexes']:
+            # X follows the variable, stepping twice as fast for words
+            steps = [code[i + 1] for i in uses['increments']]
+            if len(uses['scales']) > 1 or uses['scales'] == {2} and \
+                    any(step.mode != 'i' or not isinstance(step.operand, int) for step in steps):
+                return None
+            return uses
+        if uses['reads']:
+            return None
+        return uses
+
+    def __rewrite(self, start, end, entry, variable, uses):
+        operand, mode = variable
+        code = self.instructions
+        scaled = bool(uses['indexes'])
+        replaced = dict()  # position -> (number of instructions replaced, replacement)
+        if scaled:
+            index = [Instruction('LDWX', operand, mode)] + [Instruction('ASLX')] * (uses['scales'] == {2})
+            for i, length in uses['indexes']:
+                replaced[i] = (length, [])
+            for i in uses['increments']:
+                step = code[i + 1]
+                if uses['scales'] == {2}:
+                    x_step = Instruction(step.mnemonic[:-1] + 'X', 2 * step.operand, 'i')
+                else:
+                    x_step = Instruction(step.mnemonic[:-1] + 'X', step.operand, step.mode)
+                replaced[i] = (3, code[i:i + 3] + [x_step])
+            for i in uses['calls']:
+                replaced[i] = (1, [code[i]] + index)
+            preheader = list(index)
+            leaving = []
+            self.scaled += 1
+        else:
+            for i in uses['increments']:
+                step = code[i + 1]
+                replaced[i] = (3, [Instruction(step.mnemonic[:-1] + 'X', step.operand, step.mode)])
+            for i in uses['compares']:
+                bound = code[i + 1]
+                replaced[i] = (2, [Instruction('CPWX', bound.operand, bound.mode)])
+            for i in uses['calls']:
+                replaced[i] = (1, [Instruction('STWX', operand, mode), code[i].relabel(None),
+                                   Instruction('LDWX', operand, mode)])
+            preheader = [Instruction('LDWX', operand, mode)]
+            leaving = [Instruction('STWX', operand, mode)]
+            self.resident += 1
+        body = list()
+        i = start
+        while i <= end:
+            if i not in replaced:
+                body.append(code[i])
+                i += 1
+                continue
+            count, replacement = replaced[i]
+            label = code[i].label
+            if label is not None:  # the label stays on the first instruction of the replacement
+                if replacement:
+                    replacement = [replacement[0].relabel(label)] + replacement[1:]
+                else:
+                    replacement = [code[i + count].relabel(label)]
+                    count += 1
+            body += replacement
+            i += count
+        jump = code[entry]
+        if entry == start:
+            prefix = code[:start] + preheader
+        elif entry == start - 1 and jump.mnemonic == 'BR':  # the jump into the loop keeps its label
+            preheader[0] = preheader[0].relabel(jump.label)
+            prefix = code[:entry] + preheader + [jump.relabel(None)]
+        else:  # nothing falls into the loop: the landing pad goes just before it
+            pad = self.__landing_pad(start)
+            code = list(code)
+            code[entry] = Instruction(jump.mnemonic, pad, jump.mode, jump.label)
+            preheader[0] = preheader[0].relabel(pad)
+            prefix = code[:start] + preheader + [Instruction('BR', jump.operand)]
+        self.instructions = prefix + body + leaving + code[end + 1:]
+
+    @staticmethod
+    def __is(instruction, mnemonic, variable):
+        return instruction.mnemonic == mnemonic and str(instruction.operand) == variable[0] \
+            and instruction.mode == variable[1]
@@ -0,0 +1,176 @@
+import ast
+import copy
+import itertools
+
+# nodes that do not cost any instruction by themselves
+FREE = (ast.expr_context, ast.operator, ast.unaryop, ast.cmpop, ast.boolop, ast.arguments, ast.arg)
+
+
+class Inliner(ast.NodeTransformer):
+    """Replaces calls to small leaf functions by their body, before code generation.
+
+    A function is inlined when it calls no user function, only returns at its very end,
+    uses no array, and its size (AST nodes that cost instructions) is at most the
+    threshold. Calls are only inlined as statements (x = f(...) or f(...)), in the top
+    level program and in function bodies. Parameters and local variables of the inlined
+    body get fresh names of at most 8 characters (so __get_name keeps them as they are),
+    unused by the program even once truncated, and which no generated label can take.
+    A parameter the body does not assign becomes its argument when that is a variable,
+    or the value of an equate. Functions whose calls were all inlined are removed."""
+
+    def __init__(self, threshold: int) -> None:
+        super().__init__()
+        self.threshold = threshold
+        self.inlined = 0
+        self.removed = 0
+        self.__candidates = dict()  # function name -> FunctionDef
+        self.__names = set()  # every name of the program, as written and truncated
+        self.__equates = dict()  # _UPPER constant -> value
+        self.__ids = itertools.count()
+        self.__caller = None  # FunctionDef being transformed, None at the top level
+
+    def visit_Module(self, node):
+        functions = {s.name: s for s in node.body if isinstance(s, ast.FunctionDef)}
+        for n in ast.walk(node):
+            for name in (getattr(n, 'id', None), getattr(n, 'arg', None), getattr(n, 'name', None)):
+                if isinstance(name, str):
+                    self.__names |= {name, name[0:4] + name[-4:]}
+        for s in node.body:
+            if isinstance(s, ast.Assign) and isinstance(s.targets[0], ast.Name) and self.is_constant(s.targets[0].id) \
+                    and isinstance(s.value, ast.Constant):
+                self.__equates[s.targets[0].id] = s.value.value
+        self.__candidates = {name: f for name, f in functions.items() if self.__inlinable(f, functions)}
+        if not self.__candidates:
+            return node
+        for s in node.body:
+            if isinstance(s, ast.FunctionDef) and s.name not in self.__candidates:
+                self.__caller = s
+                s.body = self.__block(s.body)
+        self.__caller = None
+        node.body = self.__block(node.body)
+        called = {n.func.id for n in ast.walk(node) if isinstance(n, ast.Call) and isinstance(n.func, ast.Name)}
+        kept = [s for s in node.body if not isinstance(s, ast.FunctionDef) or s.name in called]
+        self.removed = len(node.body) - len(kept)
+        node.body = kept
+        return ast.fix_missing_locations(node)
+
+    ####
+    ## Helper functions
+    ####
+
+    def __inlinable(self, function, functions):
+        args = function.args
+        if args.vararg or args.kwarg or args.kwonlyargs or args.defaults or args.posonlyargs:
+            return False
+        size = 0
+        for n in ast.walk(function):
+            if isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id in functions:
+                return False  # not a leaf (nor recursive)
+            if isinstance(n, (ast.Subscript, ast.Global, ast.Nonlocal, ast.AugAssign)) \
+                    or isinstance(n, ast.FunctionDef) and n is not function:
+                return False
+            if isinstance(n, ast.Return) and n is not function.body[-1]:
+                return False
+            if not isinstance(n, FREE) and n is not function:
+                size += 1
+        return size <= self.threshold
+
+    def __block(self, statements):
+        result = list()
+        for s in statements:
+            call, target = None, None
+            if isinstance(s, ast.Assign) and isinstance(s.targets[0], ast.Name) and isinstance(s.value, ast.Call):
+                call, target = s.value, s.targets[0]
+            elif isinstance(s, ast.Expr) and isinstance(s.value, ast.Call):
+                call = s.value
+            if call is not None and self.__can_inline(call, target):
+                result += self.__inline(call, target)
+                continue
+            for field in ('body', 'orelse'):
+                if isinstance(s, (ast.While, ast.If)):
+                    setattr(s, field, self.__block(getattr(s, field)))
+            result.append(s)
+        return result
+
+    def __can_inline(self, call, target):
+        if not isinstance(call.func, ast.Name) or call.func.id not in self.__candidates:
+            return False
+        function = self.__candidates[call.func.id]
+        if len(call.args) != len(function.args.args) or call.keywords:
+            return False
+        returns = isinstance(function.body[-1], ast.Return) and function.body[-1].value is not None
+        if target is not None and not returns:
+            return False
+        if self.__caller is not None:
+            # the globals the function reads must not be hidden by the caller's locals
+            caller_locals = self.__locals(self.__caller)
+            if self.__globals(function) & caller_locals:
+                return False
+        return True
+
+    def __inline(self, call, target):
+        function = self.__candidates[call.func.id]
+        params = [arg.arg for arg in function.args.args]
+        assigned = self.__assigned(function)
+        renamed = {name: self.__fresh(name) for name in params + sorted(assigned - set(params))}
+        constants = dict()  # parameter -> value of the equate given as argument
+        statements = list()
+        for param, arg in zip(params, call.args):
+            if isinstance(arg, ast.Name) and param not in assigned and arg.id in self.__equates:
+                constants[param] = self.__equates[arg.id]
+            elif isinstance(arg, ast.Name) and param not in assigned and not self.is_constant(arg.id):
+                renamed[param] = arg.id  # the argument itself is used, it cannot change meanwhile
+            else:
+                statements.append(ast.Assign(targets=[ast.Name(id=renamed[param], ctx=ast.Store())], value=arg))
+        body = [Renamer(renamed, constants).visit(s) for s in copy.deepcopy(function.body)]
+        if body and isinstance(body[-1], ast.Return):
+            value = body.pop().value
+            if target is not None:
+                body.append(ast.Assign(targets=[target], value=value))
+        self.inlined += 1
+        return statements + body
+
+    def __fresh(self, name):
+        while True:
+            tag = f'_i{next(self.__ids)}'
+            candidate = name[:8 - len(tag)] + tag
+            if candidate not in self.__names:
+                self.__names.add(candidate)
+                return candidate
+
+    @staticmethod
+    def is_constant(name: str):
+        if name[0] == '_' and name[1:].isupper():
+            return True
+        else:
+            return False
+
+    @staticmethod
+    def __assigned(function):
+        return {n.targets[0].id for n in ast.walk(function)
+                if isinstance(n, ast.Assign) and isinstance(n.targets[0], ast.Name)}
+
+    @classmethod
+    def __locals(cls, function):
+        return cls.__assigned(function) | {arg.arg for arg in function.args.args}
+
+    @classmethod
+    def __globals(cls, function):
+        local = cls.__locals(function)
+        return {n.id for n in ast.walk(function) if isinstance(n, ast.Name) and n.id not in local}
+
+
+class Renamer(ast.NodeTransformer):
+    """Renames variables, or replaces them by constants"""
+
+    def __init__(self, renamed: dict, constants: dict = None) -> None:
+        super().__init__()
+        self.renamed = renamed
+        self.constants = constants or dict()
+
+    def visit_Name(self, node):
+        if node.id in self.constants:
+            return ast.copy_location(ast.Constant(self.constants[node.id]), node)
+        if node.id in self.renamed:
+            node.id = self.renamed[node.id]
+        return node
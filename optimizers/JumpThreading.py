@@ -0,0 +1,146 @@
+import re
+from generators.Instruction import Instruction
+from .ControlFlowGraph import ControlFlowGraph, TERMINATORS
+
+# branch taken exactly when the other one is not
+INVERSE = {'BRLE': 'BRGT', 'BRGT': 'BRLE', 'BRLT': 'BRGE', 'BRGE': 'BRLT', 'BREQ': 'BRNE', 'BRNE': 'BREQ'}
+
+
+class JumpThreading():
+    """Cuts down the branches taken at run time, until nothing changes:
+    - NOP1 landing pads are collapsed into the instruction they fall into
+    - a jump to an unconditional jump goes straight to its final target
+    - BRcc L1 / BR L2 / L1: becomes BRinv L2 / L1:
+    - while loops are rotated: the test moves to the bottom of the loop and branches
+      back to the body, so that an iteration takes one branch instead of two"""
+
+    def __init__(self, instructions: list[Instruction]) -> None:
+        self.instructions = list(instructions)
+        # the entry point is reached from outside of this list of instructions
+        self.entry_points = {instructions[0].label} if instructions else set()
+        self.collapsed = 0
+        self.threaded = 0
+        self.inverted = 0
+        self.rotated = 0
+
+    def optimize(self):
+        changed = True
+        while changed:
+            changed = self.__collapse_pads() | self.__thread() | self.__invert()
+            if not changed:
+                changed = self.__rotate_loop()
+        return self.instructions
+
+    ####
+    ## Helper functions
+    ####
+
+    def __collapse_pads(self):
+        renamed = dict()  # label of a removed landing pad -> label of the next instruction
+        kept = list()
+        for i, instruction in enumerate(self.instructions):
+            if instruction.mnemonic != 'NOP1' or instruction.label in self.entry_points \
+                    or i + 1 == len(self.instructions):
+                kept.append(instruction)
+                continue
+            following = self.instructions[i + 1]
+            if following.is_directive():
+                kept.append(instruction)
+                continue
+            if instruction.label is not None:
+                if following.label is None:
+                    self.instructions[i + 1] = following.relabel(instruction.label)
+                else:
+                    renamed[instruction.label] = following.label
+            self.collapsed += 1
+        if len(kept) == len(self.instructions):
+            return False
+        self.instructions = [self.__rename(instruction, renamed) for instruction in kept]
+        return True
+
+    def __thread(self):
+        by_label = {instruction.label: instruction for instruction in self.instructions if instruction.label is not None}
+        changed = False
+        for i, instruction in enumerate(self.instructions):
+            if not ControlFlowGraph.is_jump(instruction):
+                continue
+            target, seen = instruction.operand, {instruction.operand}
+            while target in by_label and by_label[target].mnemonic == 'BR' \
+                    and ControlFlowGraph.is_jump(by_label[target]) and by_label[target].operand not in seen:
+                target = by_label[target].operand
+                seen.add(target)
+            if target != instruction.operand:
+                self.instructions[i] = Instruction(instruction.mnemonic, target, instruction.mode, instruction.label)
+                self.threaded += 1
+                changed = True
+        return changed
+
+    def __invert(self):
+        changed = False
+        i = 0
+        while i + 2 < len(self.instructions):
+            branch, jump, following = self.instructions[i:i + 3]
+            if branch.mnemonic in INVERSE and ControlFlowGraph.is_jump(branch) and jump.label is None \
+                    and jump.mnemonic == 'BR' and ControlFlowGraph.is_jump(jump) \
+                    and following.label == branch.operand:
+                self.instructions[i:i + 2] = [Instruction(INVERSE[branch.mnemonic], jump.operand, jump.mode, branch.label)]
+                self.inverted += 1
+                changed = True
+            i += 1
+        return changed
+
+    def __rotate_loop(self):
+        """Rotates the first loop found, its test being a basic block labeled test_N (N
+        keeping the new body label unique) ending with a conditional branch to the
+        instruction following the jump back to the test"""
+        cfg = ControlFlowGraph(self.instructions)
+        referenced = {instruction.operand for instruction in self.instructions}
+        position = 0
+        positions = list()  # index of the first instruction of every block
+        for block in cfg.blocks:
+            positions.append(position)
+            position += len(block.instructions)
+        for test in cfg.blocks[:-1]:
+            last = test.last
+            number = re.fullmatch(r'\w+_(\d+)', test.label or '')
+            if number is None or last.mnemonic not in INVERSE or not cfg.is_jump(last) \
+                    or test.label in self.entry_points or len(test.instructions) == 1:
+                continue
+            start, end = positions[test.index], positions[test.index] + len(test.instructions)
+            for k in range(end, len(self.instructions) - 1):
+                back, after = self.instructions[k], self.instructions[k + 1]
+                if back.mnemonic == 'BR' and back.operand == test.label and cfg.is_jump(back) \
+                        and after.label == last.operand:
+                    break
+            else:
+                continue
+            if k == end or back.label in self.entry_points:
+                continue
+            body = self.instructions[end]
+            if body.label is None:
+                label = f'loop_{number.group(1)}'
+                if label in cfg.labels:
+                    continue
+                body = body.relabel(label)
+            condition = test.instructions[:-1] + [Instruction(INVERSE[last.mnemonic], body.label, last.mode)]
+            # jumps to the jump back now land on the test
+            renamed = {back.label: test.label} if back.label is not None and back.label in referenced else dict()
+            # entering the loop by falling into it now needs a jump to the test
+            before = self.instructions[start - 1] if start else None
+            entry = [Instruction('BR', test.label)] if before is None or not before.is_directive() \
+                and before.mnemonic not in TERMINATORS else []
+            self.instructions = self.instructions[:start] + entry + [body] \
+                + self.instructions[end + 1:k] + condition + self.instructions[k + 1:]
+            self.instructions = [self.__rename(instruction, renamed) for instruction in self.instructions]
+            self.rotated += 1
+            return True
+        return False
+
+    @staticmethod
+    def __rename(instruction, renamed):
+        operand = instruction.operand
+        while operand in renamed:
+            operand = renamed[operand]
+        if operand is instruction.operand:
+            return instruction
+        return Instruction(instruction.mnemonic, operand, instruction.mode, instruction.label)
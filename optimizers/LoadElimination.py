@@ -0,0 +1,245 @@
+from collections import deque
+from generators.Instruction import Instruction
+from .ControlFlowGraph import ControlFlowGraph, BRANCHES
+from .PeepholeOptimizer import SETS_FLAGS, TESTS_FLAGS
+
+WRITES_A = ('LDWA', 'LDBA', 'ADDA', 'SUBA', 'ANDA', 'ORA', 'NOTA', 'NEGA', 'ASLA', 'ASRA', 'ROLA', 'RORA',
+            'MOVSPA', 'MOVFLGA')
+WRITES_X = ('LDWX', 'LDBX', 'ADDX', 'SUBX', 'ANDX', 'ORX', 'NOTX', 'NEGX', 'ASLX', 'ASRX', 'ROLX', 'RORX')
+# instructions writing the memory word given as operand
+STORES = ('STWA', 'STWX', 'STBA', 'STBX', 'DECI')
+# the stack pointer moves: stack relative values are no longer the same
+MOVES_SP = ('ADDSP', 'SUBSP', 'CALL', 'RET')
+UNKNOWN = (None, None)
+# instructions leaving the accumulator alone
+KEEPS_A = WRITES_X + BRANCHES + ('STWX', 'STBX', 'DECI', 'CPWX', 'CPBX', 'DECO', 'HEXO', 'STRO', 'NOP1')
+
+
+class LoadElimination():
+    """Tracks what the accumulator and the index register hold (a memory word, a
+    constant, or either of them shifted left) across basic blocks, and removes the
+    LDWA, LDWX and LDWX/ASLX pairs loading what the register already holds.
+
+    A value is (mode, operand) for a word read with direct, stack relative or immediate
+    addressing, and ('asl', value) once shifted. Stack relative words are only told
+    apart by name when no other stack word was written in between, as equates and
+    numeric offsets may point to the same slot.
+
+    A load the accumulator holds on every path into a block but one, typically a loop
+    reloading at its top what it stored at its bottom, is first moved onto that last
+    path when it ends with a jump: the loop then only loads once, before it starts."""
+
+    def __init__(self, instructions: list[Instruction]) -> None:
+        self.instructions = list(instructions)
+        # the entry point is reached from outside of this list of instructions
+        self.entry_points = {instructions[0].label} if instructions else set()
+        self.loads = 0
+        self.shifts = 0
+        self.reads = 0  # memory reads saved (loads that were not immediate)
+        self.hoisted = 0  # loads moved onto the only path missing them
+
+    def optimize(self):
+        cfg = ControlFlowGraph(self.instructions, self.entry_points)
+        entering, leaving = self.__analyze(cfg)
+        while self.__hoist(cfg, entering, leaving):
+            cfg = ControlFlowGraph(cfg.instructions(), self.entry_points)
+            entering, leaving = self.__analyze(cfg)
+        states = entering
+        result = list()
+        for block in cfg.blocks:
+            state = states[block.index]
+            instructions = block.instructions
+            i = 0
+            while i < len(instructions):
+                instruction = instructions[i]
+                removed = self.__redundant(state, instructions, i)
+                if removed and self.__flags_unused(cfg, block.index, i + removed):
+                    if instruction.label is not None:  # the label goes to the next instruction
+                        if i + removed < len(instructions):
+                            instructions[i + removed] = instructions[i + removed].relabel(instruction.label)
+                        else:
+                            result.append(Instruction('NOP1', label=instruction.label))
+                    self.loads += 1
+                    self.shifts += removed - 1
+                    self.reads += instruction.mode != 'i'
+                    i += removed
+                    continue
+                state = self.transfer(state, instruction)
+                result.append(instruction)
+                i += 1
+        self.instructions = result
+        return self.instructions
+
+    @staticmethod
+    def value(instruction):
+        """Value an instruction reads, None when it is not tracked"""
+        if instruction.mode in ('i', 'd', 's'):
+            return (instruction.mode, str(instruction.operand))
+        return None
+
+    @classmethod
+    def transfer(cls, state, instruction):
+        """Contents of (A, X) after an instruction"""
+        a, x = state
+        mnemonic = instruction.mnemonic
+        if mnemonic == 'CALL':
+            return UNKNOWN
+        if mnemonic in STORES:
+            a, x = cls.__clobber(a, instruction), cls.__clobber(x, instruction)
+            if mnemonic == 'STWA' and instruction.mode in ('d', 's'):
+                a = cls.value(instruction)
+            elif mnemonic == 'STWX' and instruction.mode in ('d', 's'):
+                x = cls.value(instruction)
+        if mnemonic in MOVES_SP:
+            a, x = cls.__forget_stack(a), cls.__forget_stack(x)
+        if mnemonic in WRITES_A:
+            a = cls.value(instruction) if mnemonic == 'LDWA' else ('asl', a) if mnemonic == 'ASLA' and a else None
+        if mnemonic in WRITES_X:
+            x = cls.value(instruction) if mnemonic == 'LDWX' else ('asl', x) if mnemonic == 'ASLX' and x else None
+        return a, x
+
+    ####
+    ## Helper functions
+    ####
+
+    def __analyze(self, cfg):
+        """State of the registers when entering every block"""
+        roots = cfg.roots()
+        entering = dict()
+        leaving = dict()
+        pending = deque(block.index for block in cfg.blocks)
+        queued = set(pending)
+        while pending:
+            index = pending.popleft()
+            queued.discard(index)
+            block = cfg.blocks[index]
+            known = [leaving[p] for p in block.predecessors if p in leaving]
+            if index in roots or not known:
+                state = UNKNOWN
+            else:
+                state = tuple(values[0] if all(v == values[0] for v in values) else None
+                              for values in zip(*known))
+            entering[index] = state
+            for instruction in block.instructions:
+                state = self.transfer(state, instruction)
+            if leaving.get(index) != state:
+                leaving[index] = state
+                for successor in block.successors:
+                    if successor not in queued:
+                        pending.append(successor)
+                        queued.add(successor)
+        return entering, leaving
+
+    def __anticipates(self, cfg, index, value):
+        """Every path from the start of a block loads a value into the accumulator before
+        anything reads or writes it, or changes the value"""
+        pending, seen = [index], set()
+        while pending:
+            block = cfg.blocks[pending.pop()]
+            if block.index in seen:
+                return False  # looping without loading it
+            seen.add(block.index)
+            for instruction in block.instructions:
+                if self.__is_load(instruction, value):
+                    break
+                if instruction.mnemonic not in KEEPS_A or instruction.is_directive() \
+                        or self.transfer((value, None), instruction)[0] != value:
+                    return False
+            else:
+                if not block.successors:
+                    return False
+                pending += block.successors
+        return True
+
+    def __hoist(self, cfg, entering, leaving):
+        """Loads a value on the one jump into a block missing it, when every path from
+        that block loads it anyway, True once done"""
+        roots = cfg.roots()
+        for block in cfg.blocks:
+            if entering[block.index][0] is not None or block.index in roots or len(block.predecessors) < 2:
+                continue
+            values = [leaving.get(p, UNKNOWN)[0] for p in block.predecessors]
+            for value in set(values) - {None}:
+                missing = [p for p, v in zip(block.predecessors, values) if v != value]
+                jump = cfg.blocks[missing[0]]
+                if value[0] != 'asl' and len(missing) == 1 and jump.last.mnemonic == 'BR' \
+                        and cfg.is_jump(jump.last) and jump.successors == [block.index] \
+                        and self.__flags_set(block) and self.__anticipates(cfg, block.index, value):
+                    break
+            else:
+                continue
+            load = Instruction('LDWA', value[1] if not value[1].lstrip('-').isdigit() else int(value[1]),
+                               value[0], jump.last.label)
+            jump.instructions[-1:] = [load, jump.last.relabel(None)]
+            self.hoisted += 1
+            return True
+        return False
+
+    @classmethod
+    def __is_load(cls, instruction, value):
+        return instruction.mnemonic == 'LDWA' and cls.value(instruction) == value
+
+    @staticmethod
+    def __flags_set(block):
+        """The block sets the flags before testing them"""
+        for instruction in block.instructions:
+            if instruction.mnemonic in TESTS_FLAGS:
+                return False
+            if instruction.mnemonic in SETS_FLAGS:
+                return True
+        return False
+
+    def __redundant(self, state, instructions, i):
+        """Number of instructions (the load, and its shift) that can go, 0 if none"""
+        instruction = instructions[i]
+        value = self.value(instruction)
+        if value is None or instruction.label in self.entry_points:
+            return 0
+        if instruction.mnemonic == 'LDWA' and state[0] == value:
+            return 1
+        if instruction.mnemonic == 'LDWX':
+            if state[1] == value:
+                return 1
+            following = instructions[i + 1] if i + 1 < len(instructions) else None
+            if state[1] == ('asl', value) and following is not None and following.mnemonic == 'ASLX' \
+                    and following.label is None:
+                return 2
+        return 0
+
+    def __flags_unused(self, cfg, index, i):
+        """The flags set by the removed instructions are not tested afterwards, following
+        the fall-through path (other paths set their own flags)"""
+        for block in cfg.blocks[index:]:
+            for instruction in block.instructions[i:]:
+                if instruction.mnemonic in TESTS_FLAGS:
+                    return False
+                if instruction.mnemonic in SETS_FLAGS or instruction.mnemonic == 'STOP':
+                    return True
+                if instruction.mnemonic in ('BR', 'CALL', 'RET') or instruction.is_directive():
+                    return False
+            i = 0
+        return False
+
+    @classmethod
+    def __clobber(cls, value, store):
+        """Forgets a value read from the memory an instruction writes"""
+        if value is None:
+            return None
+        if value[0] == 'asl':
+            return None if cls.__clobber(value[1], store) is None else value
+        if value[0] == 'i':
+            return value
+        if store.mnemonic in ('STWA', 'STWX', 'DECI') and store.mode == value[0] == 'd' \
+                and not str(store.operand).isdigit():
+            return None if str(store.operand) == value[1] else value
+        if store.mode in ('d', 's') and store.mode != value[0]:  # globals are not on the stack
+            return value
+        return None
+
+    @classmethod
+    def __forget_stack(cls, value):
+        if value is None:
+            return None
+        if value[0] == 'asl':
+            return None if cls.__forget_stack(value[1]) is None else value
+        return None if value[0] == 's' else value
@@ -0,0 +1,151 @@
+import ast
+import copy
+import itertools
+
+# operations computed before the loop even when it does not run: they always terminate
+# (division by zero included) and have no side effect
+SPECULATED = (ast.Add, ast.Sub, ast.Mult, ast.FloorDiv, ast.Mod)
+
+
+class LoopInvariants(ast.NodeTransformer):
+    """Moves the computations whose operands do not change in a while loop out of it,
+    before code generation.
+
+    The value of an assignment in the loop (a binary operation, or a call to a pure
+    function) is invariant when it only reads constants and variables the loop never
+    assigns (arrays excepted: their elements may change). It is computed once, into a
+    fresh variable, in a preheader right before the loop, and the assignment reads
+    that variable instead. The same value computed several times shares its variable.
+    Functions never assign global variables, so calls in the loop do not matter.
+
+    Operations are computed even when the loop does not run. Calls are only hoisted
+    when every iteration makes them (neither nested in a branch or a loop, nor after a
+    statement that may leave the loop), the preheader then going under an if
+    repeating the test of the loop: a call may not return for arguments the loop
+    would never have used.
+
+    A function is pure when it only reads its parameters, its local variables and
+    equates, and only calls pure functions (no input, print, exit or array access).
+
+    Loops are handled outermost first: inner loops then hoist what only the outer one
+    changes."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.hoisted = 0
+        self.loops = 0
+        self.__names = set()  # every name of the program, as written and truncated
+        self.__ids = itertools.count()
+        self.__pure = set()  # names of the pure functions
+
+    def visit_Module(self, node):
+        for n in ast.walk(node):
+            for name in (getattr(n, 'id', None), getattr(n, 'arg', None), getattr(n, 'name', None)):
+                if isinstance(name, str):
+                    self.__names |= {name, name[0:4] + name[-4:]}
+        self.__pure = self.__pure_functions(node)
+        for s in node.body:
+            if isinstance(s, ast.FunctionDef):
+                s.body = self.__block(s.body)
+        node.body = self.__block(node.body)
+        return ast.fix_missing_locations(node)
+
+    ####
+    ## Helper functions
+    ####
+
+    def __block(self, statements):
+        result = list()
+        for s in statements:
+            if isinstance(s, ast.While):
+                result += self.__loop(s)
+                continue
+            if isinstance(s, ast.If):
+                s.body, s.orelse = self.__block(s.body), self.__block(s.orelse)
+            result.append(s)
+        return result
+
+    def __loop(self, loop):
+        """The loop, preceded by its preheader when it has invariants"""
+        assigned = {n.id for n in ast.walk(loop) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+        hoisted = dict()  # dump of an invariant value -> (its variable, the value)
+        guarded = False
+        for s, every_iteration in self.__assignments(loop.body, True):
+            value = s.value
+            if not self.__invariant(value, assigned) or isinstance(value, ast.Call) and not every_iteration:
+                continue
+            key = ast.dump(value)
+            if key not in hoisted:
+                target = s.targets[0]
+                hoisted[key] = (self.__fresh(target.id if isinstance(target, ast.Name) else 'inv'), value)
+            guarded |= isinstance(value, ast.Call)
+            s.value = ast.Name(id=hoisted[key][0], ctx=ast.Load())
+        loop.body = self.__block(loop.body)
+        if not hoisted:
+            return [loop]
+        self.loops += 1
+        self.hoisted += len(hoisted)
+        preheader = [ast.Assign(targets=[ast.Name(id=name, ctx=ast.Store())], value=value)
+                     for name, value in hoisted.values()]
+        if guarded:
+            return [ast.If(test=copy.deepcopy(loop.test), body=preheader + [loop], orelse=[])]
+        return preheader + [loop]
+
+    @classmethod
+    def __assignments(cls, statements, every_iteration):
+        """Assignments of the statements (nested ones included), each with whether it
+        runs on every iteration of the loop they are in"""
+        for s in statements:
+            if isinstance(s, ast.Assign):
+                yield s, every_iteration
+            elif isinstance(s, (ast.If, ast.While)):
+                yield from cls.__assignments(s.body, False)
+                yield from cls.__assignments(s.orelse, False)
+            if any(isinstance(n, (ast.Return, ast.Break, ast.Continue))
+                   or isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id == 'exit'
+                   for n in ast.walk(s)):
+                every_iteration = False  # the statements that follow may not run
+
+    def __invariant(self, value, assigned):
+        def unchanged(node):
+            if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+                return unchanged(node.operand)
+            if isinstance(node, ast.Constant):
+                return True
+            return isinstance(node, ast.Name) and node.id not in assigned and node.id[-1] != '_'
+        if isinstance(value, ast.BinOp):
+            return type(value.op) in SPECULATED and unchanged(value.left) and unchanged(value.right)
+        if isinstance(value, ast.Call):
+            return isinstance(value.func, ast.Name) and value.func.id in self.__pure and not value.keywords \
+                and all(unchanged(arg) for arg in value.args)
+        return False
+
+    @staticmethod
+    def __pure_functions(node):
+        functions = {s.name: s for s in node.body if isinstance(s, ast.FunctionDef)}
+        pure = set(functions)
+        changed = True
+        while changed:  # a function calling an impure one is not pure either
+            changed = False
+            for name in sorted(pure):
+                function = functions[name]
+                known = {arg.arg for arg in function.args.args} \
+                    | {n.id for n in ast.walk(function) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+                called = {id(n.func) for n in ast.walk(function) if isinstance(n, ast.Call)}
+                for n in ast.walk(function):
+                    if isinstance(n, ast.Call) and (not isinstance(n.func, ast.Name) or n.func.id not in pure) \
+                            or isinstance(n, (ast.Subscript, ast.Global, ast.Nonlocal)) \
+                            or isinstance(n, ast.Name) and id(n) not in called and n.id not in known \
+                            and not (n.id[0] == '_' and n.id[1:].isupper()):
+                        pure.discard(name)
+                        changed = True
+                        break
+        return pure
+
+    def __fresh(self, name):
+        while True:
+            tag = f'_h{next(self.__ids)}'
+            candidate = name[:8 - len(tag)] + tag
+            if candidate not in self.__names:
+                self.__names.add(candidate)
+                return candidate
@@ -0,0 +1,173 @@
+import ast
+import copy
+import itertools
+from .Inliner import FREE
+
+# direction in which the counter goes for the loop to end
+DIRECTIONS = {ast.Lt: 1, ast.LtE: 1, ast.Gt: -1, ast.GtE: -1}
+WORD_MIN, WORD_MAX = -32768, 32767
+
+
+class LoopUnrolling(ast.NodeTransformer):
+    """Replicates the bodies of counting loops, before code generation, so that the
+    test and the jump back only run once every few iterations.
+
+    A counting loop is an innermost loop comparing its counter with a bound (i < n or i <= n, i > n or
+    i >= n counting down), its body ending with the only assignment to the counter, a
+    constant step (i = i + c, i = i - c counting down), and never assigning the bound.
+    The counter must hold a constant before the loop (assigned in the same block or
+    in an enclosing one), so that its trip count can be bounded:
+    - with a constant bound, the trip count is known: when every iteration fits in the
+      budget, the loop is replaced by as many copies of its body; otherwise the main
+      loop runs the iterations by groups of factor, the remaining ones following it
+      as straight code
+    - otherwise, the main loop runs while a whole group of iterations remains
+      (i < n - (factor - 1) * c), followed by the original loop for the remaining
+      ones. An if repeating the test skips the main loop when the original one would
+      not run at all: the bound is then past the counter, and the limit cannot wrap
+      around.
+
+    The factor is lowered until the copies of the body (in AST nodes that cost
+    instructions) fit in the budget."""
+
+    def __init__(self, factor: int, budget: int) -> None:
+        super().__init__()
+        self.factor = factor
+        self.budget = budget
+        self.unrolled = 0
+        self.removed = 0  # loops replaced by copies of their body
+        self.__names = set()  # every name of the program, as written and truncated
+        self.__ids = itertools.count()
+
+    def visit_Module(self, node):
+        for n in ast.walk(node):
+            for name in (getattr(n, 'id', None), getattr(n, 'arg', None), getattr(n, 'name', None)):
+                if isinstance(name, str):
+                    self.__names |= {name, name[0:4] + name[-4:]}
+        for s in node.body:
+            if isinstance(s, ast.FunctionDef):
+                s.body = self.__block(s.body, dict())
+        node.body = self.__block(node.body, dict())
+        return ast.fix_missing_locations(node)
+
+    ####
+    ## Helper functions
+    ####
+
+    def __block(self, statements, known):
+        known = dict(known)  # variable -> constant it holds at this point
+        result = list()
+        for s in statements:
+            if isinstance(s, ast.While):
+                s.body = self.__block(s.body, dict())
+                unrolled = self.__unroll(s, known)
+                result += unrolled if unrolled is not None else [s]
+            else:
+                if isinstance(s, ast.If):
+                    s.body, s.orelse = self.__block(s.body, known), self.__block(s.orelse, known)
+                result.append(s)
+            for name in self.__assigned([s]):
+                known.pop(name, None)
+            if isinstance(s, ast.Assign) and isinstance(s.targets[0], ast.Name) \
+                    and isinstance(s.value, ast.Constant) and type(s.value.value) is int:
+                known[s.targets[0].id] = s.value.value
+        return result
+
+    def __unroll(self, loop, known):
+        """Statements replacing the loop, None when it is left as it is"""
+        shape = self.__counting(loop)
+        if shape is None or shape[0] not in known:
+            return None
+        counter, bound, op, step = shape
+        start = known[counter]
+        body = loop.body
+        size = sum(1 for s in body for n in ast.walk(s) if not isinstance(n, FREE))
+        trips = None
+        if isinstance(bound, ast.Constant):
+            trips = self.__trips(start, bound.value, op, step)
+            if trips is None:
+                return None
+            if trips * size <= self.budget:
+                self.removed += 1
+                return self.__copies(body, trips)
+        factor = self.factor
+        while factor > 1 and factor * size > self.budget:
+            factor -= 1
+        if factor < 2:
+            return None
+        if trips is not None:  # more than factor iterations, or they would all fit
+            self.unrolled += 1
+            limit = start + (trips - trips % factor) * step
+            test = ast.Compare(left=ast.Name(id=counter, ctx=ast.Load()),
+                               ops=[ast.Lt() if DIRECTIONS[op] > 0 else ast.Gt()], comparators=[ast.Constant(value=limit)])
+            main = ast.While(test=test, body=self.__copies(body, factor), orelse=[])
+            return [main] + self.__copies(body, trips % factor)
+        if not WORD_MIN <= start - (factor - 1) * step <= WORD_MAX:
+            return None  # the limit could wrap around even though the loop runs
+        self.unrolled += 1
+        limit = self.__fresh('lim')
+        limit_value = ast.BinOp(left=copy.deepcopy(bound), op=ast.Sub(), right=ast.Constant(value=(factor - 1) * step))
+        main = ast.While(test=ast.Compare(left=ast.Name(id=counter, ctx=ast.Load()), ops=[op()],
+                                          comparators=[ast.Name(id=limit, ctx=ast.Load())]),
+                         body=self.__copies(body, factor), orelse=[])
+        guard = ast.If(test=copy.deepcopy(loop.test),
+                       body=[ast.Assign(targets=[ast.Name(id=limit, ctx=ast.Store())], value=limit_value), main],
+                       orelse=[])
+        return [guard, loop]
+
+    def __counting(self, loop):
+        """(counter, bound, comparison, step) of a counting loop, None for another one"""
+        test = loop.test
+        if loop.orelse or not isinstance(test, ast.Compare) or len(test.ops) != 1 \
+                or type(test.ops[0]) not in DIRECTIONS or not isinstance(test.left, ast.Name):
+            return None
+        counter, bound = test.left.id, test.comparators[0]
+        if not (isinstance(bound, ast.Name) and bound.id != counter and bound.id[-1] != '_'
+                or isinstance(bound, ast.Constant) and type(bound.value) is int):
+            return None
+        last = loop.body[-1]
+        if not isinstance(last, ast.Assign) or not isinstance(last.targets[0], ast.Name) \
+                or last.targets[0].id != counter or not isinstance(last.value, ast.BinOp):
+            return None
+        value = last.value
+        if isinstance(value.op, ast.Add) and isinstance(value.left, ast.Constant):
+            value = ast.BinOp(left=value.right, op=value.op, right=value.left)
+        if not isinstance(value.op, (ast.Add, ast.Sub)) or not isinstance(value.left, ast.Name) \
+                or value.left.id != counter or not isinstance(value.right, ast.Constant) \
+                or type(value.right.value) is not int:
+            return None
+        step = value.right.value if isinstance(value.op, ast.Add) else -value.right.value
+        if step * DIRECTIONS[type(test.ops[0])] <= 0:
+            return None
+        if counter in self.__assigned(loop.body[:-1]) \
+                or isinstance(bound, ast.Name) and bound.id in self.__assigned(loop.body) \
+                or any(isinstance(n, (ast.While, ast.Break, ast.Continue, ast.FunctionDef))
+                       for s in loop.body for n in ast.walk(s)):
+            return None  # only innermost loops: the test of an outer one costs little next to its body
+        return counter, bound, type(test.ops[0]), step
+
+    @staticmethod
+    def __trips(start, bound, op, step):
+        """Iterations of the loop, None when the counter would not stay a word"""
+        distance, stride = (bound - start) * DIRECTIONS[op], abs(step)
+        if op in (ast.LtE, ast.GtE):
+            trips = distance // stride + 1 if distance >= 0 else 0
+        else:
+            trips = (distance + stride - 1) // stride if distance > 0 else 0
+        return trips if WORD_MIN <= start + trips * step <= WORD_MAX else None
+
+    @staticmethod
+    def __copies(body, count):
+        return [copy.deepcopy(s) for _ in range(count) for s in body]
+
+    @staticmethod
+    def __assigned(statements):
+        return {n.id for s in statements for n in ast.walk(s) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+
+    def __fresh(self, name):
+        while True:
+            tag = f'_u{next(self.__ids)}'
+            candidate = name[:8 - len(tag)] + tag
+            if candidate not in self.__names:
+                self.__names.add(candidate)
+                return candidate
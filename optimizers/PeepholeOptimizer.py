@@ -0,0 +1,206 @@
+import re
+from collections import Counter
+from generators.Instruction import Instruction
+
+# Instructions setting both N and Z, making any previous flags irrelevant
+SETS_FLAGS = ('LDWA', 'LDWX', 'ADDA', 'ADDX', 'SUBA', 'SUBX', 'CPWA', 'CPWX',
+              'ANDA', 'ANDX', 'ORA', 'ORX', 'NOTA', 'NOTX', 'NEGA', 'NEGX', 'ASLA', 'ASLX', 'ASRA', 'ASRX')
+TESTS_FLAGS = ('BRLE', 'BRLT', 'BREQ', 'BRNE', 'BRGE', 'BRGT', 'BRV', 'BRC', 'ROLA', 'ROLX', 'RORA', 'RORX', 'MOVFLGA')
+DIRECT_MODES = ('d', 's', 'x', 'sx')
+INDEXED_MODES = ('x', 'sx', 'sfx')
+
+
+class Rule():
+    """A window of instructions to look for, and what to replace it with.
+
+    Patterns are (label, instruction) pairs: a label of None only matches an unlabeled
+    instruction, '*' matches any label and '{name}' binds the label to a name. An
+    instruction is a mnemonic followed by a literal operand (with its addressing mode),
+    by '{name}' binding the operand, or by nothing. '{name}' alone binds the whole
+    instruction (never a directive), and alternatives are separated by '|'. Names bound
+    twice must match the same text. Replacements use the same names, plus '{first}' for
+    the first instruction of the window, whose label goes to a replacement labeled '*'."""
+
+    def __init__(self, name, pattern, replacement, guard=None) -> None:
+        self.name = name
+        self.pattern = [(label, self.__compile(instr)) for label, instr in pattern]
+        self.replacement = [(label, instr, self.__binder(instr)) for label, instr in replacement]
+        self.guard = guard  # extra condition: guard(optimizer, bindings, index after the window)
+        # mnemonics the window can start with, None when the first instruction is a wildcard
+        starts = [mnemonic for mnemonic, _ in self.pattern[0][1]]
+        self.first = None if None in starts else set(starts)
+
+    @staticmethod
+    def __binder(template):
+        return template[1:-1] if re.fullmatch(r'\{\w+\}', template) else None
+
+    @classmethod
+    def __compile(cls, template):
+        alternatives = list()
+        for alternative in template.split('|'):
+            if cls.__binder(alternative) is not None:
+                alternatives.append((None, cls.__binder(alternative)))
+            else:
+                parts = alternative.split(None, 1)
+                alternatives.append((parts[0], parts[1] if len(parts) > 1 else None))
+        return alternatives
+
+    def match(self, instructions, start):
+        if start + len(self.pattern) > len(instructions):
+            return None
+        bindings = dict()
+        for (label_pattern, alternatives), instruction in zip(self.pattern, instructions[start:start + len(self.pattern)]):
+            label = instruction.label
+            if label_pattern is None and label is not None:
+                return None
+            if label_pattern not in (None, '*'):
+                name = label_pattern[1:-1]
+                if label is None or bindings.get(name, label) != label:
+                    return None
+                bindings[name] = label
+            for mnemonic, argument in alternatives:
+                if mnemonic is None:  # the whole instruction
+                    if instruction.is_directive():
+                        continue
+                    bindings[argument] = instruction
+                    break
+                if instruction.mnemonic != mnemonic:
+                    continue
+                actual = instruction.argument()
+                if argument is None or actual is None:
+                    if argument is actual:
+                        break
+                    continue
+                name = self.__binder(argument)
+                if name is None:
+                    if argument == actual:
+                        break
+                    continue
+                if bindings.get(name, actual) == actual:
+                    bindings[name] = actual
+                    break
+            else:
+                return None
+        return bindings
+
+    def rewrite(self, bindings, label):
+        result = list()
+        for i, (label_template, instr, binder) in enumerate(self.replacement):
+            if i == 0 and label_template == '*':
+                new_label = label
+            elif label_template in (None, '*'):
+                new_label = None
+            else:
+                new_label = label_template.format(**bindings)
+            if binder is not None:
+                result.append(bindings[binder].relabel(new_label))
+            else:
+                result.append(Instruction.parse(instr.format(**bindings), new_label))
+        return result
+
+
+####
+## Guards
+####
+
+def flags_unused(optimizer, bindings, end):
+    """The flags set by a removed instruction are not tested afterwards, in the
+    straight-line code that follows (the code after a jump, a call or a return is not
+    what runs next)"""
+    for instruction in optimizer.instructions[end:]:
+        if instruction.label is not None or instruction.mnemonic in TESTS_FLAGS:
+            return False
+        if instruction.mnemonic in SETS_FLAGS or instruction.mnemonic == 'STOP':
+            return True
+        if instruction.mnemonic in ('BR', 'CALL', 'RET') or instruction.is_directive():
+            return False
+    return False
+
+def not_indexed(optimizer, bindings, end):
+    """The second load does not read the index register being overwritten"""
+    return bindings['y'].rsplit(',', 1)[-1] not in INDEXED_MODES
+
+def same_address(optimizer, bindings, end):
+    """Both instructions access the same memory word (no pointer involved)"""
+    return bindings['x'].rsplit(',', 1)[-1] in DIRECT_MODES
+
+def unused_label(optimizer, bindings, end):
+    return bindings['l'] not in optimizer.referenced and bindings['l'] not in optimizer.entry_points
+
+
+RULES = [
+    # code following an unconditional jump is dead unless it is labeled
+    Rule('unreachable', [('*', 'BR {t}|STOP|RET'), (None, '{dead}')], [('*', '{first}')]),
+    # jumping to the next instruction
+    Rule('branch_to_next', [(None, 'BR {t}'), ('{t}', '{next}')], [('{t}', '{next}')]),
+    # reloading the value that was just stored
+    Rule('store_load', [('*', 'STWA {x}'), (None, 'LDWA {x}')], [('*', 'STWA {x}')],
+         lambda o, b, e: same_address(o, b, e) and flags_unused(o, b, e)),
+    Rule('store_load', [('*', 'STWX {x}'), (None, 'LDWX {x}')], [('*', 'STWX {x}')],
+         lambda o, b, e: same_address(o, b, e) and flags_unused(o, b, e)),
+    # storing the value that was just loaded
+    Rule('load_store', [('*', 'LDWA {x}'), (None, 'STWA {x}')], [('*', 'LDWA {x}')], same_address),
+    Rule('load_store', [('*', 'LDWX {x}'), (None, 'STWX {x}')], [('*', 'LDWX {x}')], same_address),
+    # a load overwritten by the next one
+    Rule('dead_load', [('*', 'LDWA {x}'), (None, 'LDWA {y}')], [('*', 'LDWA {y}')], not_indexed),
+    Rule('dead_load', [('*', 'LDWX {x}'), (None, 'LDWX {y}')], [('*', 'LDWX {y}')], not_indexed),
+    # moving the label of a NOP1 landing pad onto the next instruction
+    Rule('nop_label', [('{l}', 'NOP1'), (None, '{next}')], [('{l}', '{next}')]),
+    # NOP1 landing pads that nobody jumps to
+    Rule('unused_label', [('{l}', 'NOP1|NOP0')], [], unused_label),
+    Rule('empty_stack_adjust', [(None, 'ADDSP 0,i|SUBSP 0,i')], []),
+]
+
+
+class PeepholeOptimizer():
+    """Rewrites windows of consecutive instructions until no rule applies anymore"""
+
+    def __init__(self, instructions: list[Instruction], rules=RULES) -> None:
+        self.instructions = list(instructions)
+        self.rules = rules
+        self.hits = Counter()
+        # the entry point is reached from outside of this list of instructions
+        self.entry_points = {instructions[0].label} if instructions else set()
+        self.referenced = set()
+
+    def optimize(self):
+        changed = True
+        while changed:
+            changed = False
+            self.referenced = self.__referenced_labels()
+            i = 0
+            while i < len(self.instructions):
+                if self.__apply(i):
+                    changed = True
+                    i = max(i - 2, 0)  # the rewrite may enable a match just before
+                else:
+                    i += 1
+        return self.instructions
+
+    ####
+    ## Helper functions
+    ####
+
+    def __apply(self, i):
+        mnemonic = self.instructions[i].mnemonic
+        for rule in self.rules:
+            if rule.first is not None and mnemonic not in rule.first:
+                continue
+            bindings = rule.match(self.instructions, i)
+            if bindings is None:
+                continue
+            end = i + len(rule.pattern)
+            if rule.guard is not None and not rule.guard(self, bindings, end):
+                continue
+            bindings['first'] = self.instructions[i]
+            self.instructions[i:end] = rule.rewrite(bindings, self.instructions[i].label)
+            self.hits[rule.name] += 1
+            return True
+        return False
+
+    def __referenced_labels(self):
+        referenced = set()
+        for instruction in self.instructions:
+            if instruction.operand is not None:
+                referenced.add(str(instruction.operand))
+        return referenced
@@ -0,0 +1,225 @@
+import ast
+import copy
+
+# the condition of the loop is the opposite of the one leading to the base case
+NEGATED = {ast.Lt: ast.GtE, ast.GtE: ast.Lt, ast.Gt: ast.LtE, ast.LtE: ast.Gt, ast.Eq: ast.NotEq, ast.NotEq: ast.Eq}
+# operations folding the results of the recursive calls, with their identity
+ACCUMULATED = {ast.Add: 0, ast.Mult: 1}
+
+
+class TailRecursion(ast.NodeTransformer):
+    """Turns recursive functions into while loops, so that they run in constant stack.
+
+    The function body must end with an if statement (statements after an if whose
+    branch returns move into its other branch), one branch of which (the base case)
+    does not call the function, the other one ending with the only recursive call:
+    - return f(...), or r = f(...) / return r: a tail call, the parameters take the
+      values of the arguments and the loop goes on
+    - r = f(...) / s = r OP e / return s, or r = f(...) / return r OP e, OP being + or *:
+      the result is folded into an accumulator (acc = acc OP e) while going down,
+      and the base case returns acc OP its value (nothing else may return then)
+
+    The statements before the if run before every test of the loop."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.converted = 0
+        self.accumulated = 0
+        self.__names = set()  # every name of the program, as written and truncated
+
+    def visit_Module(self, node):
+        for n in ast.walk(node):
+            for name in (getattr(n, 'id', None), getattr(n, 'arg', None), getattr(n, 'name', None)):
+                if isinstance(name, str):
+                    self.__names |= {name, name[0:4] + name[-4:]}
+        for s in node.body:
+            if isinstance(s, ast.FunctionDef):
+                body = self.__convert(s)
+                if body is not None:
+                    s.body = body
+                    self.converted += 1
+        return ast.fix_missing_locations(node)
+
+    ####
+    ## Helper functions
+    ####
+
+    def __convert(self, function):
+        """Body of the function as a loop, None when it does not have the right shape"""
+        name = function.name
+        params = [arg.arg for arg in function.args.args]
+        body = self.__normalize(copy.deepcopy(function.body))
+        if not body or not isinstance(body[-1], ast.If) or any(self.__calls(s, name) for s in body[:-1]):
+            return None
+        prefix, branch = body[:-1], body[-1]
+        test = branch.test
+        if not isinstance(test, ast.Compare) or len(test.ops) != 1 or type(test.ops[0]) not in NEGATED:
+            return None
+        if not any(self.__calls(s, name) for s in branch.body):
+            base, recursive = branch.body, branch.orelse
+            condition = ast.Compare(left=test.left, ops=[NEGATED[type(test.ops[0])]()], comparators=test.comparators)
+        else:
+            base, recursive, condition = branch.orelse, branch.body, test
+        if any(self.__calls(s, name) for s in base):
+            return None
+        tail = self.__tail(recursive, name)
+        if tail is None:
+            return None
+        count, call, operation, operand = tail
+        if isinstance(recursive[-1], ast.Expr) and any(isinstance(n, ast.Return) and n.value is not None
+                                                       for n in ast.walk(function)):
+            return None  # the result of the call is lost
+        if len(call.args) != len(params) or call.keywords \
+                or any(self.__calls(s, name) for s in recursive[:-count]) \
+                or any(self.__calls(arg, name) for arg in call.args):
+            return None
+        loop = recursive[:-count]
+        result = list()
+        if operation is not None:
+            if any(isinstance(n, ast.Return) for s in prefix + loop for n in ast.walk(s)):
+                return None  # returning on the way down, without the accumulated value
+            accumulator = self.__fresh('acc')
+            result.append(self.__assign(accumulator, ast.Constant(value=ACCUMULATED[type(operation)])))
+            loop.append(self.__assign(accumulator, ast.BinOp(left=ast.Name(id=accumulator, ctx=ast.Load()),
+                                                             op=operation, right=operand)))
+            base = self.__returning(base, accumulator, operation)
+            if base is None:
+                return None
+            self.accumulated += 1
+        loop += self.__rebind(params, call.args)
+        loop += copy.deepcopy(prefix)  # the test sees what the next call would have computed first
+        return result + prefix + [ast.While(test=condition, body=loop, orelse=[])] + base
+
+    def __normalize(self, statements):
+        """Moves the statements following an if with a returning branch into its
+        other branch"""
+        for i, s in enumerate(statements):
+            if isinstance(s, ast.If):
+                s.body, s.orelse = self.__normalize(s.body), self.__normalize(s.orelse)
+                rest = statements[i + 1:]
+                if rest:
+                    if self.__returns(s.body) and not self.__returns(s.orelse):
+                        s.orelse = self.__normalize(s.orelse + rest)
+                    elif self.__returns(s.orelse) and not self.__returns(s.body):
+                        s.body = self.__normalize(s.body + rest)
+                    elif not self.__returns(s.body):
+                        continue
+                    return statements[:i + 1]
+        return statements
+
+    @classmethod
+    def __returns(cls, statements):
+        """Every path through the statements ends with a return"""
+        if not statements:
+            return False
+        last = statements[-1]
+        if isinstance(last, ast.Return):
+            return True
+        return isinstance(last, ast.If) and cls.__returns(last.body) and cls.__returns(last.orelse)
+
+    @staticmethod
+    def __calls(node, name):
+        return any(isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id == name
+                   for n in ast.walk(node))
+
+    @classmethod
+    def __tail(cls, statements, name):
+        """How the statements end with the recursive call: (number of statements making
+        it up, the call, the accumulating operation and its other operand, or None, None
+        for a tail call), None when they do not"""
+        def is_call(node):
+            return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == name
+
+        def is_name(node, variable):
+            return isinstance(node, ast.Name) and node.id == variable
+
+        def folded(node, variable):  # variable OP e or e OP variable
+            if not isinstance(node, ast.BinOp) or type(node.op) not in ACCUMULATED:
+                return None
+            for mine, other in ((node.left, node.right), (node.right, node.left)):
+                if is_name(mine, variable) and isinstance(other, (ast.Name, ast.Constant)) \
+                        and not is_name(other, variable):
+                    return node.op, other
+            return None
+
+        last = statements[-1] if statements else None
+        if isinstance(last, ast.Return) and is_call(last.value):
+            return 1, last.value, None, None
+        if isinstance(last, ast.Expr) and is_call(last.value):
+            return 1, last.value, None, None
+        if len(statements) < 2 or not isinstance(last, ast.Return) or last.value is None:
+            return None
+        call = statements[-2]
+        if isinstance(call, ast.Assign) and isinstance(call.targets[0], ast.Name) and is_call(call.value):
+            variable = call.targets[0].id
+            if is_name(last.value, variable):
+                return 2, call.value, None, None
+            if folded(last.value, variable) is not None:
+                return (2, call.value) + folded(last.value, variable)
+        if len(statements) < 3:
+            return None
+        call, combine = statements[-3], statements[-2]
+        if isinstance(call, ast.Assign) and isinstance(call.targets[0], ast.Name) and is_call(call.value) \
+                and isinstance(combine, ast.Assign) and isinstance(combine.targets[0], ast.Name) \
+                and is_name(last.value, combine.targets[0].id) \
+                and folded(combine.value, call.targets[0].id) is not None \
+                and not is_name(folded(combine.value, call.targets[0].id)[1], combine.targets[0].id):
+            return (3, call.value) + folded(combine.value, call.targets[0].id)
+        return None
+
+    def __rebind(self, params, args):
+        """Assignments giving the parameters the values of the arguments, all of them
+        computed from the former values: a parameter a later argument reads only
+        changes once every argument is computed"""
+        statements, delayed = list(), list()
+        for i, (param, arg) in enumerate(zip(params, args)):
+            if isinstance(arg, ast.Name) and arg.id == param:
+                continue
+            read_later = any(isinstance(n, ast.Name) and n.id == param for later in args[i + 1:] for n in ast.walk(later))
+            if read_later:
+                temporary = self.__fresh(param[:6] + '_t')
+                statements.append(self.__assign(temporary, arg))
+                delayed.append(self.__assign(param, ast.Name(id=temporary, ctx=ast.Load())))
+            else:
+                statements.append(self.__assign(param, arg))
+        return statements + delayed
+
+    def __returning(self, statements, accumulator, operation, top=True):
+        """The base case returning its value folded into the accumulator, None when a
+        path falls off its end or its value is not a variable or a constant"""
+        if top and not self.__returns(statements):
+            return None
+        result = list()
+        for s in statements:
+            if isinstance(s, ast.Return):
+                value = s.value
+                if isinstance(value, ast.Constant) and value.value == ACCUMULATED[type(operation)]:
+                    result.append(ast.Return(value=ast.Name(id=accumulator, ctx=ast.Load())))
+                    continue
+                if not isinstance(value, (ast.Name, ast.Constant)):
+                    return None
+                result.append(self.__assign(accumulator, ast.BinOp(left=ast.Name(id=accumulator, ctx=ast.Load()),
+                                                                   op=operation, right=value)))
+                result.append(ast.Return(value=ast.Name(id=accumulator, ctx=ast.Load())))
+            elif isinstance(s, ast.If):
+                s.body = self.__returning(s.body, accumulator, operation, False)
+                s.orelse = self.__returning(s.orelse, accumulator, operation, False)
+                if s.body is None or s.orelse is None:
+                    return None
+                result.append(s)
+            elif any(isinstance(n, ast.Return) for n in ast.walk(s)):
+                return None  # returning from a loop
+            else:
+                result.append(s)
+        return result
+
+    def __fresh(self, name):
+        candidate, n = name, 1
+        while candidate in self.__names:
+            candidate, n = f'{name}{n}', n + 1
+        self.__names.add(candidate)
+        return candidate
+
+    @staticmethod
+    def __assign(name, value):
+        return ast.Assign(targets=[ast.Name(id=name, ctx=ast.Store())], value=value)
@@ -0,0 +1,36 @@
+import argparse
+from translator import compile_source, DEFAULT_OPTIONS
+from simulator.Assembler import Assembler
+from simulator.Simulator import Simulator
+from simulator.ThreadedSimulator import ThreadedSimulator
+
+ENGINES = {'fast': ThreadedSimulator, 'reference': Simulator}
+
+
+def main():
+    input_file, inputs, max_steps, engine = process_cli()
+    with open(input_file) as f:
+        source = f.read()
+    sim = run(input_file, source, inputs, max_steps, ENGINES[engine])
+    print(' '.join(sim.output))
+    print(sim.stats.report())
+
+def process_cli():
+    """Process Command Line Interface options"""
+    parser = argparse.ArgumentParser(description='Compiles a program and runs it on a Pep/9 simulator')
+    parser.add_argument('-f', help='filename to compile and run (.py)')
+    parser.add_argument('--input', nargs='*', type=int, default=[], help='values read by DECI, in order')
+    parser.add_argument('--max-steps', type=int, default=10_000_000)
+    parser.add_argument('--engine', choices=ENGINES.keys(), default='fast',
+                        help='pre-decoded threaded engine (fast) or instruction by instruction decoding (reference)')
+    args = vars(parser.parse_args())
+    return args['f'], args['input'], args['max_steps'], args['engine']
+
+def run(input_file, source, inputs, max_steps=10_000_000, engine=ThreadedSimulator, options=DEFAULT_OPTIONS):
+    program = Assembler(compile_source(source, input_file, options).assembly()).assemble()
+    sim = engine(program, inputs, max_steps)
+    sim.run()
+    return sim
+
+if __name__ == '__main__':
+    main()
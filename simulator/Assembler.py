@@ -0,0 +1,148 @@
+from . import Pep9
+
+LabeledInstruction = tuple[str, str]
+
+
+class AssembledProgram():
+    """Object code of a Pep/9 program, along with its symbol table"""
+
+    def __init__(self, code: bytearray, symbols: dict, listing: list) -> None:
+        self.code = code
+        self.symbols = symbols
+        # (address, mnemonic, operand, mode) for every instruction, in program order
+        self.listing = listing
+
+
+class Assembler():
+    """Two passes assembler turning (label, instruction) lists into Pep/9 object code"""
+
+    def __init__(self, instructions: list[LabeledInstruction]) -> None:
+        self.__instructions = instructions
+        self.__symbols = dict()
+
+    def assemble(self):
+        lines = [(label, *self.split(instr)) for label, instr in self.__instructions]
+        self.__define_symbols(lines)
+        code = bytearray()
+        listing = list()
+        for _, mnemonic, argument in lines:
+            if mnemonic == '.END':
+                break
+            if mnemonic[0] == '.':
+                code += self.__directive(mnemonic, argument)
+                continue
+            operand, mode = self.__operand(mnemonic, argument)
+            listing.append((len(code), mnemonic, operand, mode))
+            if Pep9.is_unary(mnemonic):
+                code.append(Pep9.encode(mnemonic, None))
+            else:
+                code.append(Pep9.encode(mnemonic, mode))
+                code += operand.to_bytes(2, 'big')
+        if len(code) > Pep9.MEMORY_SIZE:
+            raise ValueError(f'Program too large: {len(code)} bytes')
+        return AssembledProgram(code, dict(self.__symbols), listing)
+
+    ####
+    ## Helper functions
+    ####
+
+    def __define_symbols(self, lines):
+        address = 0
+        for label, mnemonic, argument in lines:
+            if mnemonic == '.END':
+                break
+            if label is not None:
+                if label in self.__symbols:
+                    raise ValueError(f'Duplicate symbol: {label}')
+                if mnemonic == '.EQUATE':
+                    self.__symbols[label] = self.__value(argument) & 0xFFFF
+                else:
+                    self.__symbols[label] = address
+            address += self.__size(mnemonic, argument)
+
+    def __size(self, mnemonic, argument):
+        match mnemonic:
+            case '.EQUATE':
+                return 0
+            case '.BLOCK':
+                return self.__value(argument)
+            case '.WORD' | '.ADDRSS':
+                return 2
+            case '.BYTE':
+                return 1
+            case '.ASCII':
+                return len(self.__string(argument))
+            case _:
+                return 1 if Pep9.is_unary(mnemonic) else 3
+
+    def __directive(self, mnemonic, argument):
+        match mnemonic:
+            case '.EQUATE':
+                return b''
+            case '.BLOCK':
+                return bytes(self.__value(argument))
+            case '.WORD' | '.ADDRSS':
+                return (self.__value(argument) & 0xFFFF).to_bytes(2, 'big')
+            case '.BYTE':
+                return bytes([self.__value(argument) & 0xFF])
+            case '.ASCII':
+                return self.__string(argument)
+            case _:
+                raise ValueError(f'Unknown directive: {mnemonic}')
+
+    def __operand(self, mnemonic, argument):
+        if Pep9.is_unary(mnemonic):
+            if argument:
+                raise ValueError(f'Unary instruction {mnemonic} takes no operand')
+            return 0, None
+        if not argument:
+            raise ValueError(f'Missing operand for {mnemonic}')
+        if ',' in argument:
+            value, mode = argument.rsplit(',', 1)
+            mode = mode.strip().lower()
+        elif mnemonic in Pep9.BRANCHES:
+            value, mode = argument, 'i'  # branches and CALL default to immediate
+        else:
+            raise ValueError(f'Missing addressing mode: {mnemonic} {argument}')
+        return self.__value(value.strip()) & 0xFFFF, mode
+
+    def __value(self, token):
+        if token in self.__symbols:
+            return self.__symbols[token]
+        if len(token) == 3 and token[0] == token[2] == "'":
+            return ord(token[1])
+        try:
+            return int(token, 0)
+        except ValueError:
+            raise ValueError(f'Undefined symbol: {token}') from None
+
+    @staticmethod
+    def __string(argument):
+        text = argument.strip()[1:-1]  # removing the double quotes
+        return text.encode('latin-1').decode('unicode_escape').encode('latin-1')
+
+    @staticmethod
+    def split(instruction: str):
+        """Splits an instruction into its mnemonic and its (raw) argument"""
+        parts = instruction.split(None, 1)
+        mnemonic = parts[0].upper()
+        argument = parts[1].strip() if len(parts) > 1 else ''
+        if mnemonic != '.ASCII':
+            argument = argument.replace(' ', '')
+        return mnemonic, argument
+
+
+def parse_listing(text: str) -> list[LabeledInstruction]:
+    """Turns a printed assembly listing back into (label, instruction) tuples"""
+    instructions = list()
+    for line in text.splitlines():
+        if '"' not in line:
+            line = line.split(';', 1)[0]
+        if not line.strip():
+            continue
+        label = None
+        head, sep, tail = line.partition(':')
+        if sep and head.strip() and not head[0].isspace() and '"' not in head:
+            label, line = head.strip(), tail
+        instructions.append((label, line.strip()))
+    return instructions
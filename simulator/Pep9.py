@@ -0,0 +1,106 @@
+MEMORY_SIZE = 0x10000
+INITIAL_SP = 0xFB8F  # where the Pep/9 operating system leaves the user stack
+
+# Addressing modes, in the order of their 'aaa' field encoding
+MODES = ('i', 'd', 'n', 's', 'sf', 'x', 'sx', 'sfx')
+MODE_BITS = {mode: bits for bits, mode in enumerate(MODES)}
+
+# Unary instructions (1 byte): mnemonic -> opcode
+UNARY = {
+    'STOP': 0x00,
+    'RET': 0x01,
+    'RETTR': 0x02,
+    'MOVSPA': 0x03,
+    'MOVFLGA': 0x04,
+    'MOVAFLG': 0x05,
+    'NOTA': 0x06, 'NOTX': 0x07,
+    'NEGA': 0x08, 'NEGX': 0x09,
+    'ASLA': 0x0A, 'ASLX': 0x0B,
+    'ASRA': 0x0C, 'ASRX': 0x0D,
+    'ROLA': 0x0E, 'ROLX': 0x0F,
+    'RORA': 0x10, 'RORX': 0x11,
+    'NOP0': 0x26,
+    'NOP1': 0x27,
+}
+
+# Branches and CALL only have 'i' and 'x' modes (1 bit 'a' field)
+BRANCHES = {
+    'BR': 0x12,
+    'BRLE': 0x14,
+    'BRLT': 0x16,
+    'BREQ': 0x18,
+    'BRNE': 0x1A,
+    'BRGE': 0x1C,
+    'BRGT': 0x1E,
+    'BRV': 0x20,
+    'BRC': 0x22,
+    'CALL': 0x24,
+}
+
+# Non-unary instructions with a 3 bits 'aaa' addressing field
+NONUNARY = {
+    'NOP': 0x28,
+    'DECI': 0x30,
+    'DECO': 0x38,
+    'HEXO': 0x40,
+    'STRO': 0x48,
+    'ADDSP': 0x50,
+    'SUBSP': 0x58,
+    'ADDA': 0x60, 'ADDX': 0x68,
+    'SUBA': 0x70, 'SUBX': 0x78,
+    'ANDA': 0x80, 'ANDX': 0x88,
+    'ORA': 0x90, 'ORX': 0x98,
+    'CPWA': 0xA0, 'CPWX': 0xA8,
+    'CPBA': 0xB0, 'CPBX': 0xB8,
+    'LDWA': 0xC0, 'LDWX': 0xC8,
+    'LDBA': 0xD0, 'LDBX': 0xD8,
+    'STWA': 0xE0, 'STWX': 0xE8,
+    'STBA': 0xF0, 'STBX': 0xF8,
+}
+
+# Instructions that are implemented as traps to the operating system in Pep/9
+TRAPS = {'NOP0', 'NOP1', 'NOP', 'DECI', 'DECO', 'HEXO', 'STRO'}
+
+# Instructions whose operand is a destination address (immediate mode is illegal)
+STORES = {'DECI', 'STWA', 'STWX', 'STBA', 'STBX'}
+
+# Estimated cost model (Pep/9 does not define cycle counts at the ISA level):
+# one cycle per byte fetched (instruction or data), one for the ALU, and a
+# flat overhead for traps, which go through the operating system
+ALU_CYCLES = 1
+TRAP_CYCLES = 20
+
+
+def decode_table():
+    """Builds the opcode byte -> (mnemonic, addressing mode) table"""
+    table = [None] * 256
+    for mnemonic, opcode in UNARY.items():
+        table[opcode] = (mnemonic, None)
+    for mnemonic, opcode in BRANCHES.items():
+        table[opcode] = (mnemonic, 'i')
+        table[opcode + 1] = (mnemonic, 'x')
+    for mnemonic, opcode in NONUNARY.items():
+        for mode, bits in MODE_BITS.items():
+            table[opcode + bits] = (mnemonic, mode)
+    return table
+
+
+def encode(mnemonic: str, mode: str):
+    """Returns the opcode byte of an instruction used with a given addressing mode"""
+    if mnemonic in UNARY:
+        return UNARY[mnemonic]
+    if mnemonic in BRANCHES:
+        if mode not in ('i', 'x'):
+            raise ValueError(f'Illegal addressing mode for {mnemonic}: {mode}')
+        return BRANCHES[mnemonic] + (1 if mode == 'x' else 0)
+    if mnemonic in NONUNARY:
+        if mode not in MODE_BITS:
+            raise ValueError(f'Illegal addressing mode for {mnemonic}: {mode}')
+        if mode == 'i' and mnemonic in STORES:
+            raise ValueError(f'Immediate addressing is illegal for {mnemonic}')
+        return NONUNARY[mnemonic] + MODE_BITS[mode]
+    raise ValueError(f'Unknown mnemonic: {mnemonic}')
+
+
+def is_unary(mnemonic: str):
+    return mnemonic in UNARY
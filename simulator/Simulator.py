@@ -0,0 +1,331 @@
+from . import Pep9
+from .Assembler import AssembledProgram
+
+
+class ExecutionStats():
+    """Counters gathered while running a program"""
+
+    def __init__(self) -> None:
+        self.instructions = 0
+        self.cycles = 0
+        self.reads = 0
+        self.writes = 0
+        self.stack_high_water = 0  # deepest stack usage, in bytes
+
+    def report(self):
+        return '\n'.join([
+            f'; Executed instructions: {self.instructions}',
+            f'; Estimated cycles:      {self.cycles}',
+            f'; Memory reads:          {self.reads}',
+            f'; Memory writes:         {self.writes}',
+            f'; Stack high-water mark: {self.stack_high_water} bytes',
+        ])
+
+
+class Simulator():
+    """Reference Pep/9 interpreter: fetches and decodes every instruction from memory"""
+
+    DECODE = Pep9.decode_table()
+
+    def __init__(self, program: AssembledProgram, inputs=(), max_steps=10_000_000) -> None:
+        self.memory = bytearray(Pep9.MEMORY_SIZE)
+        self.memory[0:len(program.code)] = program.code
+        self.symbols = program.symbols
+        self.inputs = iter(inputs)
+        self.max_steps = max_steps
+        self.output = list()
+        self.stats = ExecutionStats()
+        self.a = 0
+        self.x = 0
+        self.sp = Pep9.INITIAL_SP
+        self.pc = 0
+        self.n = self.z = self.v = self.c = False
+        self.halted = False
+
+    def run(self):
+        while not self.halted:
+            if self.stats.instructions >= self.max_steps:
+                raise RuntimeError(f'Step limit reached ({self.max_steps} instructions)')
+            self.step()
+        return self.stats
+
+    def step(self):
+        pc = self.pc
+        decoded = self.DECODE[self.memory[pc]]
+        if decoded is None:
+            raise RuntimeError(f'Illegal opcode {self.memory[pc]:#04x} at {pc:#06x}')
+        mnemonic, mode = decoded
+        if mode is None:
+            spec = 0
+            self.pc = (pc + 1) & 0xFFFF
+            self.stats.cycles += 1
+        else:
+            spec = (self.memory[(pc + 1) & 0xFFFF] << 8) | self.memory[(pc + 2) & 0xFFFF]
+            self.pc = (pc + 3) & 0xFFFF
+            self.stats.cycles += 3
+        self.stats.instructions += 1
+        self.stats.cycles += Pep9.ALU_CYCLES
+        if mnemonic in Pep9.TRAPS:
+            self.stats.cycles += Pep9.TRAP_CYCLES
+        self.__execute(mnemonic, spec, mode)
+
+    ####
+    ## Instruction semantics
+    ####
+
+    def __execute(self, mnemonic, spec, mode):
+        match mnemonic:
+            case 'STOP':
+                self.halted = True
+            case 'NOP0' | 'NOP1' | 'NOP':
+                pass
+            case 'LDWA':
+                self.a = self.__word_operand(spec, mode)
+                self.__set_nz(self.a)
+            case 'LDWX':
+                self.x = self.__word_operand(spec, mode)
+                self.__set_nz(self.x)
+            case 'LDBA':
+                self.a = (self.a & 0xFF00) | self.__byte_operand(spec, mode)
+                self.n, self.z = False, (self.a & 0xFF) == 0
+            case 'LDBX':
+                self.x = (self.x & 0xFF00) | self.__byte_operand(spec, mode)
+                self.n, self.z = False, (self.x & 0xFF) == 0
+            case 'STWA':
+                self.__write_word(self.__address(spec, mode), self.a)
+            case 'STWX':
+                self.__write_word(self.__address(spec, mode), self.x)
+            case 'STBA':
+                self.__write_byte(self.__address(spec, mode), self.a & 0xFF)
+            case 'STBX':
+                self.__write_byte(self.__address(spec, mode), self.x & 0xFF)
+            case 'ADDA':
+                self.a = self.__add(self.a, self.__word_operand(spec, mode))
+            case 'ADDX':
+                self.x = self.__add(self.x, self.__word_operand(spec, mode))
+            case 'SUBA':
+                self.a = self.__add(self.a, ~self.__word_operand(spec, mode) & 0xFFFF, 1)
+            case 'SUBX':
+                self.x = self.__add(self.x, ~self.__word_operand(spec, mode) & 0xFFFF, 1)
+            case 'CPWA':
+                self.__add(self.a, ~self.__word_operand(spec, mode) & 0xFFFF, 1)
+                self.n = self.n != self.v
+            case 'CPWX':
+                self.__add(self.x, ~self.__word_operand(spec, mode) & 0xFFFF, 1)
+                self.n = self.n != self.v
+            case 'CPBA':
+                result = ((self.a & 0xFF) - self.__byte_operand(spec, mode)) & 0xFF
+                self.n, self.z, self.v, self.c = bool(result & 0x80), result == 0, False, False
+            case 'CPBX':
+                result = ((self.x & 0xFF) - self.__byte_operand(spec, mode)) & 0xFF
+                self.n, self.z, self.v, self.c = bool(result & 0x80), result == 0, False, False
+            case 'ANDA':
+                self.a &= self.__word_operand(spec, mode)
+                self.__set_nz(self.a)
+            case 'ANDX':
+                self.x &= self.__word_operand(spec, mode)
+                self.__set_nz(self.x)
+            case 'ORA':
+                self.a |= self.__word_operand(spec, mode)
+                self.__set_nz(self.a)
+            case 'ORX':
+                self.x |= self.__word_operand(spec, mode)
+                self.__set_nz(self.x)
+            case 'NOTA':
+                self.a = ~self.a & 0xFFFF
+                self.__set_nz(self.a)
+            case 'NOTX':
+                self.x = ~self.x & 0xFFFF
+                self.__set_nz(self.x)
+            case 'NEGA':
+                self.v = self.a == 0x8000
+                self.a = -self.a & 0xFFFF
+                self.__set_nz(self.a)
+            case 'NEGX':
+                self.v = self.x == 0x8000
+                self.x = -self.x & 0xFFFF
+                self.__set_nz(self.x)
+            case 'ASLA':
+                self.a = self.__shift_left(self.a)
+            case 'ASLX':
+                self.x = self.__shift_left(self.x)
+            case 'ASRA':
+                self.a = self.__shift_right(self.a)
+            case 'ASRX':
+                self.x = self.__shift_right(self.x)
+            case 'ROLA':
+                self.a = self.__rotate_left(self.a)
+            case 'ROLX':
+                self.x = self.__rotate_left(self.x)
+            case 'RORA':
+                self.a = self.__rotate_right(self.a)
+            case 'RORX':
+                self.x = self.__rotate_right(self.x)
+            case 'MOVSPA':
+                self.a = self.sp
+            case 'MOVFLGA':
+                self.a = (self.n << 3) | (self.z << 2) | (self.v << 1) | self.c
+            case 'MOVAFLG':
+                self.n, self.z, self.v, self.c = (bool(self.a & bit) for bit in (8, 4, 2, 1))
+            case 'ADDSP':
+                self.sp = self.__add(self.sp, self.__word_operand(spec, mode))
+            case 'SUBSP':
+                self.sp = self.__add(self.sp, ~self.__word_operand(spec, mode) & 0xFFFF, 1)
+                self.__track_stack()
+            case 'BR' | 'BRLE' | 'BRLT' | 'BREQ' | 'BRNE' | 'BRGE' | 'BRGT' | 'BRV' | 'BRC':
+                if self.__condition(mnemonic):
+                    self.pc = self.__branch_target(spec, mode)
+            case 'CALL':
+                target = self.__branch_target(spec, mode)
+                self.sp = (self.sp - 2) & 0xFFFF
+                self.__track_stack()
+                self.__write_word(self.sp, self.pc)
+                self.pc = target
+            case 'RET':
+                self.pc = self.__read_word(self.sp)
+                self.sp = (self.sp + 2) & 0xFFFF
+            case 'DECI':
+                try:
+                    value = int(next(self.inputs))
+                except StopIteration:
+                    raise RuntimeError('DECI: no more input available') from None
+                self.v = not -32768 <= value <= 32767
+                value &= 0xFFFF
+                self.__write_word(self.__address(spec, mode), value)
+                self.__set_nz(value)
+            case 'DECO':
+                self.output.append(str(self.signed(self.__word_operand(spec, mode))))
+            case 'HEXO':
+                self.output.append(f'{self.__word_operand(spec, mode):04X}')
+            case 'STRO':
+                address = self.__address(spec, mode)
+                chars = list()
+                while (byte := self.__read_byte(address)) != 0:
+                    chars.append(chr(byte))
+                    address = (address + 1) & 0xFFFF
+                self.output.append(''.join(chars))
+            case _:
+                raise RuntimeError(f'Unsupported instruction: {mnemonic}')
+
+    def __condition(self, mnemonic):
+        match mnemonic:
+            case 'BR':
+                return True
+            case 'BRLE':
+                return self.n or self.z
+            case 'BRLT':
+                return self.n
+            case 'BREQ':
+                return self.z
+            case 'BRNE':
+                return not self.z
+            case 'BRGE':
+                return not self.n
+            case 'BRGT':
+                return not self.n and not self.z
+            case 'BRV':
+                return self.v
+            case 'BRC':
+                return self.c
+
+    def __branch_target(self, spec, mode):
+        if mode == 'x':
+            return self.__read_word((spec + self.x) & 0xFFFF)
+        return spec
+
+    ####
+    ## Helper functions
+    ####
+
+    def __address(self, spec, mode):
+        match mode:
+            case 'd':
+                address = spec
+            case 'n':
+                address = self.__read_word(spec)
+            case 's':
+                address = self.sp + spec
+            case 'sf':
+                address = self.__read_word((self.sp + spec) & 0xFFFF)
+            case 'x':
+                address = spec + self.x
+            case 'sx':
+                address = self.sp + spec + self.x
+            case 'sfx':
+                address = self.__read_word((self.sp + spec) & 0xFFFF) + self.x
+            case _:
+                raise RuntimeError(f'Illegal addressing mode for a memory operand: {mode}')
+        return address & 0xFFFF
+
+    def __word_operand(self, spec, mode):
+        if mode == 'i':
+            return spec
+        return self.__read_word(self.__address(spec, mode))
+
+    def __byte_operand(self, spec, mode):
+        if mode == 'i':
+            return spec & 0xFF
+        return self.__read_byte(self.__address(spec, mode))
+
+    def __read_word(self, address):
+        self.stats.reads += 1
+        self.stats.cycles += 2
+        return (self.memory[address] << 8) | self.memory[(address + 1) & 0xFFFF]
+
+    def __read_byte(self, address):
+        self.stats.reads += 1
+        self.stats.cycles += 1
+        return self.memory[address]
+
+    def __write_word(self, address, value):
+        self.stats.writes += 1
+        self.stats.cycles += 2
+        self.memory[address] = value >> 8
+        self.memory[(address + 1) & 0xFFFF] = value & 0xFF
+
+    def __write_byte(self, address, value):
+        self.stats.writes += 1
+        self.stats.cycles += 1
+        self.memory[address] = value
+
+    def __add(self, left, right, carry=0):
+        total = left + right + carry
+        result = total & 0xFFFF
+        self.c = total > 0xFFFF
+        self.v = bool((left ^ result) & (right ^ result) & 0x8000)
+        self.__set_nz(result)
+        return result
+
+    def __shift_left(self, value):
+        result = (value << 1) & 0xFFFF
+        self.c = bool(value & 0x8000)
+        self.v = bool((value ^ result) & 0x8000)
+        self.__set_nz(result)
+        return result
+
+    def __shift_right(self, value):
+        result = (value >> 1) | (value & 0x8000)
+        self.c = bool(value & 1)
+        self.__set_nz(result)
+        return result
+
+    def __rotate_left(self, value):
+        result = ((value << 1) & 0xFFFF) | self.c
+        self.c = bool(value & 0x8000)
+        return result
+
+    def __rotate_right(self, value):
+        result = (value >> 1) | (self.c << 15)
+        self.c = bool(value & 1)
+        return result
+
+    def __set_nz(self, value):
+        self.n = bool(value & 0x8000)
+        self.z = value == 0
+
+    def __track_stack(self):
+        self.stats.stack_high_water = max(self.stats.stack_high_water, Pep9.INITIAL_SP - self.sp)
+
+    @staticmethod
+    def signed(value):
+        return value - 0x10000 if value & 0x8000 else value
@@ -0,0 +1,369 @@
+import re
+from . import Pep9
+from .Assembler import AssembledProgram
+from .Simulator import ExecutionStats
+
+# Indexes of the registers in the state list shared by all the decoded instructions
+A, X, SP, N, Z, V, C, LOW = range(8)
+INDEXES = {'A': A, 'X': X, 'SP': SP, 'N': N, 'Z': Z, 'V': V, 'C': C, 'LOW': LOW}
+# Local variables holding the registers while a block runs
+LOCALS = {'A': 'ra', 'X': 'rx', 'SP': 'rsp', 'N': 'fn', 'Z': 'fz', 'V': 'fv', 'C': 'fc', 'LOW': 'low'}
+FLAGS = ('N', 'Z', 'V', 'C')
+
+REGISTER = re.compile(r'r\[(A|X|SP|N|Z|V|C|LOW)\]')
+REGISTER_UPDATE = re.compile(r'r\[(A|X|SP|N|Z|V|C|LOW)\] = ')
+FLAG_UPDATE = re.compile(r'^r\[(N|Z|V|C)\] = ')
+FLAG_READ = re.compile(r'r\[(N|Z|V|C)\]')
+
+# Effective address computation, for modes that need more than the operand specifier
+ADDRESS = {
+    'n': 'ea = m[spec] << 8 | m[spec + 1 & 0xFFFF]',
+    's': 'ea = r[SP] + spec & 0xFFFF',
+    'sf': 't = r[SP] + spec & 0xFFFF\nea = m[t] << 8 | m[t + 1 & 0xFFFF]',
+    'x': 'ea = spec + r[X] & 0xFFFF',
+    'sx': 'ea = r[SP] + spec + r[X] & 0xFFFF',
+    'sfx': 't = r[SP] + spec & 0xFFFF\nea = (m[t] << 8 | m[t + 1 & 0xFFFF]) + r[X] & 0xFFFF',
+}
+
+CONDITIONS = {
+    'BRLE': 'r[N] or r[Z]',
+    'BRLT': 'r[N]',
+    'BREQ': 'r[Z]',
+    'BRNE': 'not r[Z]',
+    'BRGE': 'not r[N]',
+    'BRGT': 'not r[N] and not r[Z]',
+    'BRV': 'r[V]',
+    'BRC': 'r[C]',
+}
+
+SET_NZ = 'r[N] = v >> 15\nr[Z] = v == 0'
+
+# Body of the decoded instruction for every family of mnemonics. Placeholders are
+# replaced by the register ({reg}), the operand value ({word}, {byte}) or address ({ea})
+TEMPLATES = {
+    'LDW': 'v = {word}\nr[{reg}] = v\n' + SET_NZ,
+    'LDB': 'v = r[{reg}] & 0xFF00 | {byte}\nr[{reg}] = v\nr[N] = 0\nr[Z] = not v & 0xFF',
+    'STW': 'v = r[{reg}]\nm[{ea}] = v >> 8\nm[{ea} + 1 & 0xFFFF] = v & 0xFF',
+    'STB': 'm[{ea}] = r[{reg}] & 0xFF',
+    'ADD': 'left = r[{reg}]\nright = {word}\nt = left + right\nv = t & 0xFFFF\n'
+           'r[C] = t >> 16\nr[V] = (left ^ v) & (right ^ v) & 0x8000 != 0\nr[{reg}] = v\n' + SET_NZ,
+    'SUB': 'left = r[{reg}]\nright = ~{word} & 0xFFFF\nt = left + right + 1\nv = t & 0xFFFF\n'
+           'r[C] = t >> 16\nr[V] = (left ^ v) & (right ^ v) & 0x8000 != 0\nr[{reg}] = v\n' + SET_NZ,
+    'CPW': 'left = r[{reg}]\nright = ~{word} & 0xFFFF\nt = left + right + 1\nv = t & 0xFFFF\n'
+           'overflow = (left ^ v) & (right ^ v) & 0x8000 != 0\n'
+           'r[C] = t >> 16\nr[V] = overflow\nr[N] = (v >> 15) ^ overflow\nr[Z] = v == 0',
+    'CPB': 'v = (r[{reg}] & 0xFF) - {byte} & 0xFF\nr[N] = v >> 7\nr[Z] = v == 0\nr[V] = 0\nr[C] = 0',
+    'AND': 'v = r[{reg}] & {word}\nr[{reg}] = v\n' + SET_NZ,
+    'OR': 'v = r[{reg}] | {word}\nr[{reg}] = v\n' + SET_NZ,
+    'NOT': 'v = ~r[{reg}] & 0xFFFF\nr[{reg}] = v\n' + SET_NZ,
+    'NEG': 'r[V] = r[{reg}] == 0x8000\nv = -r[{reg}] & 0xFFFF\nr[{reg}] = v\n' + SET_NZ,
+    'ASL': 'old = r[{reg}]\nv = old << 1 & 0xFFFF\nr[C] = old >> 15\nr[V] = (old ^ v) >> 15\n'
+           'r[{reg}] = v\n' + SET_NZ,
+    'ASR': 'old = r[{reg}]\nv = old >> 1 | old & 0x8000\nr[C] = old & 1\nr[{reg}] = v\n' + SET_NZ,
+    'ROL': 'old = r[{reg}]\nr[{reg}] = old << 1 & 0xFFFF | r[C]\nr[C] = old >> 15',
+    'ROR': 'old = r[{reg}]\nr[{reg}] = old >> 1 | r[C] << 15\nr[C] = old & 1',
+    'MOVSPA': 'r[A] = r[SP]',
+    'MOVFLGA': 'r[A] = int(r[N]) << 3 | int(r[Z]) << 2 | int(r[V]) << 1 | int(r[C])',
+    'MOVAFLG': 'v = r[A]\nr[N] = v >> 3 & 1\nr[Z] = v >> 2 & 1\nr[V] = v >> 1 & 1\nr[C] = v & 1',
+    'STOP': 'return -1',
+    'NOP': '',
+    'BR': 'return {target}',
+    'CALL': 'target = {target}\nsp = r[SP] - 2 & 0xFFFF\nr[SP] = sp\n'
+            'if sp < r[LOW]: r[LOW] = sp\nm[sp] = nxt >> 8\nm[sp + 1 & 0xFFFF] = nxt & 0xFF\nreturn target',
+    'RET': 'sp = r[SP]\nr[SP] = sp + 2 & 0xFFFF\nreturn m[sp] << 8 | m[sp + 1 & 0xFFFF]',
+    'DECI': 'value = io.next_input()\nr[V] = not -32768 <= value <= 32767\nv = value & 0xFFFF\n'
+            'm[{ea}] = v >> 8\nm[{ea} + 1 & 0xFFFF] = v & 0xFF\n' + SET_NZ,
+    'DECO': 'v = {word}\nio.output.append(str(v - 0x10000 if v & 0x8000 else v))',
+    'HEXO': "io.output.append('%04X' % {word})",
+    'STRO': 'io.output.append(io.read_string({ea}))',
+}
+
+FAMILIES = {
+    'LDWA': ('LDW', 'A'), 'LDWX': ('LDW', 'X'),
+    'LDBA': ('LDB', 'A'), 'LDBX': ('LDB', 'X'),
+    'STWA': ('STW', 'A'), 'STWX': ('STW', 'X'),
+    'STBA': ('STB', 'A'), 'STBX': ('STB', 'X'),
+    'ADDA': ('ADD', 'A'), 'ADDX': ('ADD', 'X'), 'ADDSP': ('ADD', 'SP'),
+    'SUBA': ('SUB', 'A'), 'SUBX': ('SUB', 'X'), 'SUBSP': ('SUB', 'SP'),
+    'CPWA': ('CPW', 'A'), 'CPWX': ('CPW', 'X'),
+    'CPBA': ('CPB', 'A'), 'CPBX': ('CPB', 'X'),
+    'ANDA': ('AND', 'A'), 'ANDX': ('AND', 'X'),
+    'ORA': ('OR', 'A'), 'ORX': ('OR', 'X'),
+    'NOTA': ('NOT', 'A'), 'NOTX': ('NOT', 'X'),
+    'NEGA': ('NEG', 'A'), 'NEGX': ('NEG', 'X'),
+    'ASLA': ('ASL', 'A'), 'ASLX': ('ASL', 'X'),
+    'ASRA': ('ASR', 'A'), 'ASRX': ('ASR', 'X'),
+    'ROLA': ('ROL', 'A'), 'ROLX': ('ROL', 'X'),
+    'RORA': ('ROR', 'A'), 'RORX': ('ROR', 'X'),
+    'NOP0': ('NOP', None), 'NOP1': ('NOP', None), 'NOP': ('NOP', None),
+    **{mnemonic: ('BR', None) for mnemonic in CONDITIONS},
+}
+
+# Instructions ending a straight-line run of code
+CONTROL = set(Pep9.BRANCHES) | {'STOP', 'RET'}
+
+WORD_READS = {'LDW', 'ADD', 'SUB', 'CPW', 'AND', 'OR', 'DECO', 'HEXO'}
+BYTE_READS = {'LDB', 'CPB'}
+
+
+class ThreadedSimulator():
+    """Fast Pep/9 interpreter: instructions are decoded once, with their operands and
+    addressing modes resolved, into Python code. Straight-line runs of instructions are
+    fused into a single closure returning the address of the next one to execute, and
+    the closures are dispatched through a table indexed by address.
+
+    Code is decoded the first time it is reached, so it must not modify itself."""
+
+    DECODE = Pep9.decode_table()
+    MAX_BLOCK = 64  # instructions fused in a single closure
+    MAX_PROGRAMS = 64  # programs whose decoded blocks are kept for the next runs, more than the samples
+    __compiled = dict()  # object code -> {entry address: (closure factory, costs)}, oldest first
+
+    def __init__(self, program: AssembledProgram, inputs=(), max_steps=10_000_000) -> None:
+        self.memory = bytearray(Pep9.MEMORY_SIZE)
+        self.memory[0:len(program.code)] = program.code
+        self.symbols = program.symbols
+        self.inputs = iter(inputs)
+        self.max_steps = max_steps
+        self.output = list()
+        self.stats = ExecutionStats()
+        self.registers = [0, 0, Pep9.INITIAL_SP, 0, False, False, 0, Pep9.INITIAL_SP]
+        self.pc = 0
+        self.halted = False
+        self.__blocks = dict()  # entry address -> [closure, number of instructions, executions]
+        self.__costs = dict()  # entry address -> (instructions, cycles, reads, writes)
+        # blocks are compiled once for all the runs of the same program
+        self.__factories = self.__programs(bytes(program.code))
+        self.__extra = [0, 0]  # cycles and reads only known at run time
+
+    @property
+    def a(self):
+        return self.registers[A]
+
+    @property
+    def x(self):
+        return self.registers[X]
+
+    @property
+    def sp(self):
+        return self.registers[SP]
+
+    def run(self):
+        blocks = self.__blocks
+        pc = self.pc
+        steps = 0
+        limit = self.max_steps
+        try:
+            while pc >= 0:
+                if steps >= limit:
+                    raise RuntimeError(f'Step limit reached ({limit} instructions)')
+                try:
+                    block = blocks[pc]
+                except KeyError:  # first time this address is reached
+                    block = blocks[pc] = self.__block(pc)
+                block[2] += 1
+                steps += block[1]
+                pc = block[0]()
+        finally:
+            self.__account()
+        self.halted = True
+        return self.stats
+
+    def next_input(self):
+        try:
+            return int(next(self.inputs))
+        except StopIteration:
+            raise RuntimeError('DECI: no more input available') from None
+
+    def read_string(self, address):
+        chars = list()
+        while True:
+            self.__extra[0] += 1
+            self.__extra[1] += 1
+            byte = self.memory[address]
+            if byte == 0:
+                return ''.join(chars)
+            chars.append(chr(byte))
+            address = (address + 1) & 0xFFFF
+
+    ####
+    ## Decoding
+    ####
+
+    @classmethod
+    def __programs(cls, code):
+        """Blocks decoded for an object code, shared by its runs: only the programs run
+        last are kept"""
+        factories = cls.__compiled.pop(code, None)
+        if factories is None:
+            factories = dict()
+            while len(cls.__compiled) >= cls.MAX_PROGRAMS:
+                del cls.__compiled[next(iter(cls.__compiled))]
+        cls.__compiled[code] = factories  # most recently used last
+        return factories
+
+    def __block(self, entry):
+        if entry not in self.__factories:
+            self.__factories[entry] = self.__decode_block(entry)
+        make, cost = self.__factories[entry]
+        self.__costs[entry] = cost
+        return [make(self.registers, self.memory, self, self.__extra), cost[0], 0]
+
+    def __decode_block(self, entry):
+        instructions = list()
+        cost = [0, 0, 0, 0]
+        address = entry
+        visited = {entry}
+        while True:
+            decoded = self.DECODE[self.memory[address]]
+            supported = decoded is not None and FAMILIES.get(decoded[0], decoded)[0] in TEMPLATES
+            if not supported or cost[0] == self.MAX_BLOCK:
+                if cost[0] == 0:
+                    raise RuntimeError(f'Illegal instruction {self.memory[address]:#04x} at {address:#06x}')
+                instructions.append([f'return {address}'])  # the next block starts here
+                break
+            mnemonic, mode = decoded
+            spec = 0
+            if mode is not None:
+                spec = (self.memory[(address + 1) & 0xFFFF] << 8) | self.memory[(address + 2) & 0xFFFF]
+            nxt = (address + (1 if mode is None else 3)) & 0xFFFF
+            instructions.append(self.__instruction(mnemonic, mode, spec, nxt))
+            cost[0] += 1
+            for i, value in enumerate(self.__static_cost(mnemonic, mode), 1):
+                cost[i] += value
+            if mnemonic == 'BR' and mode == 'i' and spec not in visited and cost[0] < self.MAX_BLOCK:
+                # following unconditional jumps, so that a loop body and its test run as one block
+                instructions[-1] = []
+                address = spec
+            elif mnemonic in CONTROL:
+                break
+            else:
+                address = nxt
+            visited.add(address)
+        source = self.__localize(self.__drop_dead_flags(instructions))
+        source = 'def make(r, m, io, extra):\n    def block():\n' + source + '    return block\n'
+        namespace = dict()
+        exec(compile(source, f'<pep9 block {entry:#06x}>', 'exec'), namespace)
+        return namespace['make'], tuple(cost)
+
+    @staticmethod
+    def __drop_dead_flags(instructions):
+        """Removes the flag updates overwritten in the block before being tested"""
+        live = set(FLAGS)  # any flag can be tested after the block
+        kept = list()
+        for lines in reversed(instructions):
+            written, read, body = set(), set(), list()
+            for line in lines:
+                update = FLAG_UPDATE.match(line)
+                if update:
+                    written.add(update.group(1))
+                    if update.group(1) not in live:
+                        continue
+                else:
+                    read.update(FLAG_READ.findall(line))
+                body.append(line)
+            live = (live - written) | read
+            kept.append(body)
+        kept.reverse()
+        return [line for lines in kept for line in lines]
+
+    @staticmethod
+    def __localize(lines):
+        """Keeps registers in local variables for the duration of the block"""
+        loaded, written = set(), set()
+        for line in lines:
+            update = REGISTER_UPDATE.match(line)
+            reads = REGISTER.findall(line[update.end():] if update else line)
+            loaded.update(name for name in reads if name not in written)
+            if update:
+                written.add(update.group(1))
+        assigned = {name for line in lines for name in REGISTER_UPDATE.findall(line)}
+        # registers read before being written need to be loaded from the state list
+        source = [f'{LOCALS[name]} = r[{INDEXES[name]}]' for name in sorted(loaded)]
+        for line in lines:
+            if line.lstrip().startswith('return'):
+                indent = line[:len(line) - len(line.lstrip())]
+                source += [f'{indent}r[{INDEXES[name]}] = {LOCALS[name]}' for name in sorted(assigned)]
+            source.append(REGISTER.sub(lambda match: LOCALS[match.group(1)], line))
+        return ''.join(f'        {line}\n' for line in source)
+
+    @staticmethod
+    def __instruction(mnemonic, mode, spec, nxt):
+        """Python statements executing one instruction, with its operand resolved"""
+        family, reg = FAMILIES.get(mnemonic, (mnemonic, None))
+        prelude = ''
+        if mnemonic in Pep9.BRANCHES:
+            if mode == 'x':
+                # indirect jumps read their target from a table in memory (counted when taken)
+                prelude = 't = spec + r[X] & 0xFFFF\nextra[0] += 2\nextra[1] += 1\n'
+                target = '(m[t] << 8 | m[t + 1 & 0xFFFF])'
+            else:
+                target = 'spec'
+            body = TEMPLATES[family].format(target=target)
+            if mnemonic in CONDITIONS and mode == 'x':
+                prelude = f'if not ({CONDITIONS[mnemonic]}):\n    return nxt\n' + prelude
+            elif mnemonic in CONDITIONS:
+                body = f'return spec if {CONDITIONS[mnemonic]} else nxt'
+        else:
+            if mode in ADDRESS and family != 'NOP':
+                prelude = ADDRESS[mode] + '\n'
+            ea = 'spec' if mode == 'd' else 'ea'
+            if mode == 'i':
+                word, byte = 'spec', '(spec & 0xFF)'
+            elif mode == 'd':
+                word, byte = '(m[spec] << 8 | m[spec + 1 & 0xFFFF])', 'm[spec]'
+            else:
+                word, byte = '(m[ea] << 8 | m[ea + 1 & 0xFFFF])', 'm[ea]'
+            body = TEMPLATES[family].format(reg=reg, word=word, byte=byte, ea=ea)
+            if family == 'SUB' and reg == 'SP':
+                body += '\nif v < r[LOW]: r[LOW] = v'
+        source = re.sub(r'\bspec\b', str(spec), prelude + body)
+        return [line for line in re.sub(r'\bnxt\b', str(nxt), source).split('\n') if line]
+
+    ####
+    ## Accounting (same cost model as the reference Simulator)
+    ####
+
+    @staticmethod
+    def __static_cost(mnemonic, mode):
+        family, _ = FAMILIES.get(mnemonic, (mnemonic, None))
+        cycles = (1 if Pep9.is_unary(mnemonic) else 3) + Pep9.ALU_CYCLES
+        reads = writes = 0
+        if mnemonic in Pep9.TRAPS:
+            cycles += Pep9.TRAP_CYCLES
+        if mnemonic in Pep9.BRANCHES:
+            if mnemonic == 'CALL':
+                writes += 1
+                cycles += 2
+            return cycles, reads, writes
+        if mode in ('n', 'sf', 'sfx'):  # reading the pointer
+            reads += 1
+            cycles += 2
+        if mode != 'i' and (family in WORD_READS or mnemonic in ('ADDSP', 'SUBSP')):
+            reads += 1
+            cycles += 2
+        elif mode != 'i' and family in BYTE_READS:
+            reads += 1
+            cycles += 1
+        elif family in ('STW', 'DECI'):
+            writes += 1
+            cycles += 2
+        elif family == 'STB':
+            writes += 1
+            cycles += 1
+        elif family == 'RET':
+            reads += 1
+            cycles += 2
+        return cycles, reads, writes
+
+    def __account(self):
+        stats = self.stats
+        for entry, (instructions, cycles, reads, writes) in self.__costs.items():
+            executed = self.__blocks[entry][2]
+            stats.instructions += executed * instructions
+            stats.cycles += executed * cycles
+            stats.reads += executed * reads
+            stats.writes += executed * writes
+        stats.cycles += self.__extra[0]
+        stats.reads += self.__extra[1]
+        stats.stack_high_water = max(0, Pep9.INITIAL_SP - self.registers[LOW])
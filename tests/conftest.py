@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the compiler is imported from the root of the repository, as the scripts do
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -0,0 +1,62 @@
+"""Compiling programs, running them on the simulators and telling what CPython prints"""
+from generators.Instruction import Instruction
+from simulator.Assembler import Assembler
+from simulator.Simulator import Simulator
+from simulator.ThreadedSimulator import ThreadedSimulator
+from translator import compile_source, DEFAULT_OPTIONS
+
+PASSES = [name for name, value in DEFAULT_OPTIONS.items() if value is True and name != 'stats']
+OPTIONS = {
+    'default': DEFAULT_OPTIONS,
+    'unoptimized': dict(DEFAULT_OPTIONS, inline_threshold=0, **{name: False for name in PASSES}),
+    'extra': dict(DEFAULT_OPTIONS, unroll_factor=4, memoize=64, bit_arrays=True),
+    # every pass, on functions that are called rather than inlined
+    'calls': dict(DEFAULT_OPTIONS, inline_threshold=0),
+}
+ENGINES = [Simulator, ThreadedSimulator]
+
+
+def expected(source, inputs=()):
+    """Values printed by CPython, reduced to 16 bits as DECO prints them"""
+    values = iter(inputs)
+    output = list()
+    printed = lambda *args: output.extend(str((value + 0x8000 & 0xFFFF) - 0x8000) for value in args)
+    try:
+        exec(compile(source, '<expected>', 'exec'), {'input': lambda: str(next(values)), 'print': printed})
+    except SystemExit:  # exit() stops the Pep/9 program too
+        pass
+    return output
+
+def assemble(*lines):
+    """Object code of assembly lines, written 'label: instruction' when labeled"""
+    return Assembler([(i.label, i.text()) for i in instructions(*lines)]).assemble()
+
+def simulate(source, inputs=(), options=DEFAULT_OPTIONS, engine=Simulator):
+    """Simulator that ran the compiled program"""
+    program = Assembler(compile_source(source, '<test>', options).assembly()).assemble()
+    sim = engine(program, inputs)
+    sim.run()
+    return sim
+
+def check(source, inputs=(), options=OPTIONS):
+    """The program prints what CPython prints, with every set of options and on both engines"""
+    output = expected(source, inputs)
+    for name, values in options.items():
+        for engine in ENGINES:
+            assert simulate(source, inputs, values, engine).output == output, f'{name} options, {engine.__name__}'
+
+def instructions(*lines):
+    """Instructions of assembly lines, written 'label: instruction' when labeled, with
+    numbers as operands as the generators write them"""
+    result = list()
+    for line in lines:
+        label, _, text = line.rpartition(': ') if ': ' in line else ('', '', line)
+        instruction = Instruction.parse(text, label or None)
+        if isinstance(instruction.operand, str) and instruction.operand.lstrip('-').isdigit():
+            instruction = Instruction(instruction.mnemonic, int(instruction.operand), instruction.mode, instruction.label)
+        result.append(instruction)
+    return result
+
+def listing(instructions):
+    """Assembly lines of instructions, as instructions() reads them"""
+    return [f'{i.label}: {i.text()}' if i.label else i.text() for i in instructions]
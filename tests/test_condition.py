@@ -0,0 +1,34 @@
+import ast
+import itertools
+
+import pytest
+
+from visitors.Condition import Condition
+
+
+def steps(test, when=False):
+    """Steps of a condition jumping to 'out', operands written as in the source"""
+    ids = itertools.count()
+    condition = Condition(ast.parse(test, mode='eval').body, 'out', lambda: next(ids), when)
+    return [step if isinstance(step, str) else f'{ast.unparse(step[0])} {step[2]} {ast.unparse(step[1])} {step[3]}'
+            for step in condition.steps]
+
+def test_comparisons():
+    assert steps('a < b') == ['a BRGE b out']
+    assert steps('a < b', when=True) == ['a BRLT b out']
+    # a variable alone holds when it is not 0
+    assert steps('a') == ['a BREQ 0 out']
+    # every comparison of a chain must hold
+    assert steps('a < b <= c') == ['a BRGE b out', 'b BRGT c out']
+    assert steps('a < b <= c', when=True) == ['a BRGE b and_0', 'b BRLE c out', 'and_0']
+
+def test_short_circuit():
+    assert steps('a < b and c != 0') == ['a BRGE b out', 'c BREQ 0 out']
+    # the first operand holding skips the others
+    assert steps('a < b or c != 0') == ['a BRLT b or_0', 'c BREQ 0 out', 'or_0']
+    assert steps('not (a < b or c)') == ['a BRLT b out', 'c BRNE 0 out']
+    assert steps('(a or b) and not c') == ['a BRNE 0 or_0', 'b BREQ 0 out', 'or_0', 'c BRNE 0 out']
+
+def test_unsupported():
+    with pytest.raises(ValueError):
+        steps('a + 1')
@@ -0,0 +1,33 @@
+import ast
+
+import pytest
+
+from generators.StaticMemoryAllocation import StaticMemoryAllocation
+from helpers import listing
+from visitors.SymbolTable import SymbolTable
+
+
+def data(global_vars, array_modes=None, array_values=None):
+    return listing(StaticMemoryAllocation(global_vars, array_modes, array_values).generate().instructions)
+
+def test_variables():
+    assert data({'_K': 3, 'a': None, 'b': 5, 'arr_': 4}) == ['_K: .EQUATE 3', 'a: .BLOCK 2', 'b: .WORD 5', 'arr_: .BLOCK 8']
+
+def test_initialized_arrays():
+    # runs of zeros are reserved at once
+    assert data({'w_': 5}, array_values={'w_': [1, 0, 0, -2, 0]}) == ['w_: .WORD 1', '.BLOCK 4', '.WORD -2', '.BLOCK 2']
+    assert data({'y_': 4}, {'y_': 'byte'}, {'y_': [0, 0, 7, 255]}) == ['y_: .BLOCK 2', '.BYTE 7', '.BYTE 255']
+    # element i is bit i % 8 of byte i // 8
+    assert data({'f_': 10}, {'f_': 'bit'}, {'f_': [1, 0, 0, 1, 0, 0, 0, 0, 0, 1]}) == ['f_: .BYTE 9', '.BYTE 2']
+
+def test_initializers():
+    table = SymbolTable()
+    table.visit(ast.parse('a_ = [3, -1, 0]\nb_ = [2] * 3\nc_ = [0] * 4'))
+    assert table.array_values == {'a_': [3, -1, 0], 'b_': [2, 2, 2]}
+    assert (table.results['a_'], table.results['b_'], table.results['c_']) == (3, 3, 4)
+
+@pytest.mark.parametrize('source', ['n = 3\na_ = [0] * n', 'n = 3\na_ = [n, 1]', 'a_ = [1, 2] * 3',
+                                    'i = 0\nwhile i < 2:\n    a_ = [1] * 2\n    i = i + 1'])
+def test_unsupported_initializers(source):
+    with pytest.raises(ValueError):
+        SymbolTable().visit(ast.parse(source))
@@ -0,0 +1,36 @@
+from helpers import instructions, listing
+from optimizers.ControlFlowGraph import ControlFlowGraph
+from optimizers.DeadCodeElimination import DeadCodeElimination
+
+
+def optimized(*lines):
+    return listing(DeadCodeElimination(instructions(*lines)).optimize())
+
+def test_blocks():
+    cfg = ControlFlowGraph(instructions('start: LDWA a,d', 'BREQ skip', 'ADDA 1,i', 'skip: STWA a,d', 'STOP'))
+    assert [len(block.instructions) for block in cfg.blocks] == [2, 1, 2]
+    assert [block.successors for block in cfg.blocks] == [[2, 1], [2], []]
+    assert [block.predecessors for block in cfg.blocks] == [[], [0], [0, 1]]
+    assert cfg.reachable() == {0, 1, 2}
+
+def test_roots():
+    # through a table, any label used as data may be jumped to, and data is never executed
+    cfg = ControlFlowGraph(instructions('start: LDWX 0,i', 'BR table,x', 'one: STOP', 'two: STOP',
+                                        'table: .ADDRSS one', '.ADDRSS two'))
+    assert cfg.roots() == {0, 1, 2, 3}
+    cfg = ControlFlowGraph(instructions('start: BR two', 'one: STOP', 'two: STOP'), entry_points={'one'})
+    assert cfg.roots() == {0, 1}
+
+def test_unreachable():
+    assert optimized('start: LDWA 0,i', 'BR end', 'LDWA 1,i', 'dead: LDWA 2,i', 'end: STOP') == \
+        ['start: LDWA 0,i', 'end: STOP']
+    # blocks only reached from unreachable ones go too
+    assert optimized('start: STOP', 'a: BR b', 'b: BR a') == ['start: STOP']
+
+def test_branches_to_next():
+    assert optimized('start: LDWA 0,i', 'BRNE next', 'next: NOP1', 'STOP') == ['start: LDWA 0,i', 'STOP']
+    # jumps to a removed labeled jump go where it went
+    assert optimized('start: LDWA 0,i', 'BREQ hop', 'STOP', 'hop: BR end', 'end: STOP') == \
+        ['start: LDWA 0,i', 'BREQ end', 'STOP', 'end: STOP']
+    # the entry point stays
+    assert optimized('start: BR next', 'next: STOP') == ['start: BR next', 'next: STOP']
@@ -0,0 +1,41 @@
+import ast
+import io
+
+from generators.Emitter import Emitter
+from translator import compile_source, process, DEFAULT_OPTIONS
+
+SOURCE = '''
+def twice(v):
+    w = v + v
+    return w
+
+a = int(input())
+b = twice(a)
+c = a * b
+print(c)
+'''
+OPTIONS = dict(DEFAULT_OPTIONS, inline_threshold=0)  # twice stays a function
+
+
+def test_compile_source(capsys):
+    program = compile_source(SOURCE, 'twice.py', OPTIONS)
+    assert capsys.readouterr().out == ''  # nothing printed
+    assert program.name == 'twice.py'
+    assert list(program.functions) == ['twice']
+    # the data section, the functions, the runtime library, then the top level code
+    sections = program.sections()
+    assert sections[1] is program.data and sections[-2:] == [program.runtime, program.top_level]
+    assert program.runtime.instructions[0].label == 'rt_mul'
+    assert program.top_level.instructions[-1].mnemonic == '.END'
+
+def test_emitter(capsys):
+    program = compile_source(SOURCE, 'twice.py', OPTIONS)
+    stream = io.StringIO()
+    Emitter(stream).emit(program)
+    text = stream.getvalue()
+    # every instruction on its own line, after its label, comments first
+    lines = [line for line in text.splitlines() if not line.startswith(';')]
+    assert [(label.strip().rstrip(':') or None, instr.strip()) for label, instr in
+            (line.split('\t', 1) if not line.startswith('\t') else ('', line) for line in lines)] == program.assembly()
+    process('twice.py', ast.parse(SOURCE), OPTIONS)
+    assert capsys.readouterr().out == text
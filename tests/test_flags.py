@@ -0,0 +1,33 @@
+from helpers import instructions, listing
+from optimizers.FlagReuse import FlagReuse
+
+
+def optimized(*lines):
+    return listing(FlagReuse(instructions(*lines)).optimize())
+
+def test_after_load():
+    assert optimized('start: LDWA a,d', 'CPWA 0,i', 'BREQ end', 'STWA b,d', 'end: STOP') == \
+        ['start: LDWA a,d', 'BREQ end', 'STWA b,d', 'end: STOP']
+    # a store leaves the flags alone
+    assert optimized('start: SUBA 1,i', 'STWA a,d', 'CPWA 0,i', 'BRGT start', 'STOP') == \
+        ['start: SUBA 1,i', 'STWA a,d', 'BRGT start', 'STOP']
+
+def test_kept():
+    lines = [
+        # the flags describe the other register, or a byte
+        ['start: LDWA a,d', 'LDWX b,d', 'CPWA 0,i', 'BREQ end', 'end: STOP'],
+        ['start: LDBA a,d', 'CPWA 0,i', 'BREQ end', 'end: STOP'],
+        # C is read afterwards
+        ['start: LDWA a,d', 'CPWA 0,i', 'BRC end', 'end: STOP'],
+        # not on every path
+        ['start: LDWA a,d', 'BREQ next', 'LDWX b,d', 'next: CPWA 0,i', 'BRLT end', 'end: STOP'],
+    ]
+    for lines in lines:
+        assert optimized(*lines) == lines
+
+def test_moved():
+    # the compare starting a rotated loop goes onto the jump into it
+    assert optimized('start: DECI n,d', 'LDWX n,d', 'LDWA 0,i', 'BR test_1',
+                     'loop_1: SUBX 1,i', 'test_1: CPWX 0,i', 'BRGT loop_1', 'STOP') == \
+        ['start: DECI n,d', 'LDWX n,d', 'LDWA 0,i', 'CPWX 0,i', 'BR test_1',
+         'loop_1: SUBX 1,i', 'test_1: BRGT loop_1', 'STOP']
@@ -0,0 +1,48 @@
+import ast
+
+import pytest
+
+from helpers import check
+from optimizers.ConstantFolding import ConstantFolding
+from translator import compile_source, DEFAULT_OPTIONS
+
+
+def folded(source):
+    return ast.unparse(ConstantFolding().visit(ast.parse(source)))
+
+def test_fold_and_propagate():
+    assert folded('x = 3 + 4 * 2') == 'x = 11'
+    assert folded('a = 5\nb = a - 1\nc = b * a') == 'a = 5\nb = 4\nc = 20'
+    assert folded('x = 200 * 200') == 'x = -25536'  # 16 bits, like Pep/9
+    assert folded('y = -(2 + 3)') == 'y = -5'
+
+def test_identities():
+    assert folded('y = x + 1 + 2') == 'y = x + 3'
+    assert folded('y = x * 1\nz = 0 + x') == 'y = x\nz = x'
+    assert folded('y = x // 0') == 'y = x // 0'  # left for the program to fail
+
+def test_branches():
+    assert folded('a = 1\nif a < 2:\n    x = 1\nelse:\n    x = 2') == 'a = 1\nx = 1'
+    assert folded('a = 1\nwhile a > 2:\n    b = a - 1') == 'a = 1'
+    # the test of a loop sees the values of later iterations
+    assert folded('i = 0\nwhile i < 3:\n    i = i + 1') == 'i = 0\nwhile i < 3:\n    i = i + 1'
+    # branches disagreeing leave the variable unknown
+    assert folded('a = input()\nx = 1\nif a < 2:\n    x = 2\ny = x + 1') == \
+        'a = input()\nx = 1\nif a < 2:\n    x = 2\ny = x + 1'
+
+def test_scopes():
+    # globals may have changed when a function runs, equates cannot
+    source = '_K = 3\ng = 4\ndef f(p):\n    x = g + _K\n    return x'
+    assert folded(source).endswith('x = g + 3\n    return x')
+    assert folded('a = 5\nprint(a)') == 'a = 5\nprint(a)'  # call arguments stay variables
+
+def test_unsupported_negation():
+    with pytest.raises(ValueError, match='unary minus'):
+        compile_source('a = 1\nb = int(input())\nc = -(a + b)\nprint(c)')
+    with pytest.raises(ValueError, match='unary minus'):
+        compile_source('def f(p):\n    q = -(p + 1)\n    return q\nx = f(2)\nprint(x)',
+                       options=dict(DEFAULT_OPTIONS, inline_threshold=0))
+
+def test_negative_operands():
+    # negative constants are folded, but must compile without folding too
+    check('a = int(input())\nb = a - -3\nprint(b)\nwhile a > -2:\n    a = a - 1\nprint(a)', [1])
@@ -0,0 +1,57 @@
+from helpers import check, instructions, listing
+from optimizers.InductionVariables import InductionVariables
+from test_samples import PROGRAMS
+from translator import DEFAULT_OPTIONS
+
+
+def optimized(*lines):
+    return listing(InductionVariables(instructions(*lines)).optimize())
+
+def test_resident():
+    # the counter only lives in X while the loop runs, and is stored when leaving it
+    assert optimized('start: LDWA 0,i', 'STWA i,d',
+                     'loop_1: LDWA i,d', 'ADDA 1,i', 'STWA i,d', 'LDWA i,d', 'CPWA 5,i', 'BRLT loop_1',
+                     'STOP') == \
+        ['start: LDWA 0,i', 'STWA i,d', 'LDWX i,d',
+         'loop_1: ADDX 1,i', 'CPWX 5,i', 'BRLT loop_1',
+         'STWX i,d', 'STOP']
+    # and around calls, as functions may use it
+    assert optimized('start: LDWA 0,i', 'STWA i,d',
+                     'loop_1: CALL f', 'LDWA i,d', 'ADDA 1,i', 'STWA i,d', 'LDWA i,d', 'CPWA 5,i',
+                     'BRLT loop_1', 'STOP') == \
+        ['start: LDWA 0,i', 'STWA i,d', 'LDWX i,d',
+         'loop_1: STWX i,d', 'CALL f', 'LDWX i,d', 'ADDX 1,i', 'CPWX 5,i', 'BRLT loop_1',
+         'STWX i,d', 'STOP']
+
+def test_scaled():
+    # X holds the byte offset of the element, stepping by two
+    assert optimized('start: LDWA 0,i', 'STWA i,d',
+                     'loop_1: LDWX i,d', 'ASLX', 'LDWA 0,i', 'STWA v_,x',
+                     'LDWA i,d', 'ADDA 1,i', 'STWA i,d', 'CPWA 5,i', 'BRLT loop_1',
+                     'STOP') == \
+        ['start: LDWA 0,i', 'STWA i,d', 'LDWX i,d', 'ASLX',
+         'loop_1: LDWA 0,i', 'STWA v_,x',
+         'LDWA i,d', 'ADDA 1,i', 'STWA i,d', 'ADDX 2,i', 'CPWA 5,i', 'BRLT loop_1',
+         'STOP']
+
+def test_entered_by_a_jump():
+    # a conditional jump into the loop goes through a landing pad setting X up
+    assert optimized('start: DECI i,d', 'LDWA i,d', 'BRLT test_1', 'STOP',
+                     'test_1: LDWA i,d', 'ADDA 1,i', 'STWA i,d', 'LDWA i,d', 'CPWA 0,i', 'BRLT test_1',
+                     'STOP') == \
+        ['start: DECI i,d', 'LDWA i,d', 'BRLT pre_1', 'STOP',
+         'pre_1: LDWX i,d', 'BR test_1',
+         'test_1: ADDX 1,i', 'CPWX 0,i', 'BRLT test_1',
+         'STWX i,d', 'STOP']
+
+def test_unchanged():
+    # X is used for something else, the counter is read, the loop is left by a branch
+    for body in (['LDWX 3,i', 'STWX j,d'], ['LDWA i,d', 'STWA j,d'], ['BREQ out']):
+        lines = ['start: LDWA 0,i', 'STWA i,d',
+                 'loop_1: LDWA i,d', 'ADDA 1,i', 'STWA i,d', *body, 'LDWA i,d', 'CPWA 5,i', 'BRLT loop_1',
+                 'out: STOP']
+        assert optimized(*lines) == lines
+
+def test_calls():
+    # not inlined, the function reads the counter stored around its call
+    check(*PROGRAMS['counters'], options={'calls': dict(DEFAULT_OPTIONS, inline_threshold=0)})
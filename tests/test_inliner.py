@@ -0,0 +1,50 @@
+import ast
+
+from helpers import check
+from optimizers.Inliner import Inliner
+from translator import DEFAULT_OPTIONS
+
+
+def inlined(source, threshold=20):
+    return ast.unparse(Inliner(threshold).visit(ast.parse(source)))
+
+def test_arguments():
+    # variables are used as they are, computed arguments go in a fresh variable
+    assert inlined('def f(p):\n    return p + 1\nb = 2\nc = f(b)\nd = f(b * 2)') == \
+        'b = 2\nc = b + 1\np_i1 = b * 2\nd = p_i1 + 1'
+    # a parameter the body assigns is a copy of the argument
+    assert inlined('def f(p):\n    p = p + 1\n    return p\nb = 2\nc = f(b)') == \
+        'b = 2\np_i0 = b\np_i0 = p_i0 + 1\nc = p_i0'
+
+def test_equate_arguments():
+    # equates are replaced by their value rather than used as variables
+    assert inlined('_K = 3\ndef f(p, q):\n    return p\nb = 1\nc = f(_K, b)') == '_K = 3\nb = 1\nc = 3'
+
+def test_not_inlined():
+    # too large, returning early, calling a user function
+    assert inlined('def f(p):\n    return p\nc = f(1)', threshold=1) == 'def f(p):\n    return p\nc = f(1)'
+    source = 'def f(p):\n    if p:\n        return 1\n    return 2\nc = f(1)'
+    assert inlined(source) == ast.unparse(ast.parse(source))
+    source = 'def g(p):\n    return p\ndef f(p):\n    x = g(p)\n    return x\nc = f(1)'
+    assert 'def f' in inlined(source)
+
+def test_equate_copied():
+    # the equate is copied into a variable, also when not inlined nor folded
+    source = '''
+_K = 3
+
+def f0(p, q):
+    return p
+
+b = int(input())
+c = f0(_K, b)
+print(c)
+if b > 0:
+    c = f0(_K, b)
+    print(c)
+d = _K
+print(d)
+'''
+    options = {'no folding': dict(DEFAULT_OPTIONS, fold_constants=False),
+               'no inlining': dict(DEFAULT_OPTIONS, fold_constants=False, inline_threshold=0)}
+    check(source, [5], options)
@@ -0,0 +1,25 @@
+import pytest
+
+from generators.Instruction import Instruction
+
+
+@pytest.mark.parametrize('text', ['STOP', 'LDWA 3,i', 'STWA x,d', 'LDWX arr_,x', 'ADDA v,sfx', 'BR loop',
+                                  '.BLOCK 2', '.WORD -4', '.ASCII "a, b\\x00"', '.EQUATE 6'])
+def test_round_trip(text):
+    assert Instruction.parse(text).text() == text
+
+def test_fields():
+    instruction = Instruction.parse('CPWA  limit , s', 'test_3')
+    assert (instruction.label, instruction.mnemonic, instruction.operand, instruction.mode) == \
+        ('test_3', 'CPWA', 'limit', 's')
+    assert instruction.argument() == 'limit,s'
+    assert Instruction.parse('.ASCII "1,2"').operand == '"1,2"'  # no addressing mode in a string
+    assert Instruction('NEGA').argument() is None
+    assert Instruction.parse('.WORD 5').is_directive() and not instruction.is_directive()
+
+def test_relabel():
+    instruction = Instruction('LDWA', 0, 'i', 'old')
+    moved = instruction.relabel('new')
+    assert (moved.label, moved.text()) == ('new', 'LDWA 0,i')
+    assert instruction.label == 'old'  # instructions are shared, never changed in place
+    assert not hasattr(instruction, '__dict__')  # slots only
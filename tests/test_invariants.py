@@ -0,0 +1,32 @@
+import ast
+
+from optimizers.LoopInvariants import LoopInvariants
+
+SQUARE = 'def sq(v):\n    w = v * v\n    return w\n'
+
+
+def hoisted(source):
+    return ast.unparse(LoopInvariants().visit(ast.parse(source)))
+
+def test_operations():
+    # computed once before the loop, even when it does not run, and shared
+    assert hoisted('i = 0\nwhile i < n:\n    a = b * c\n    d = b * c\n    i = i + a + d') == \
+        'i = 0\na_h0 = b * c\nwhile i < n:\n    a = a_h0\n    d = a_h0\n    i = i + a + d'
+
+def test_calls():
+    # under the test of the loop: a call may not return for arguments the loop never uses
+    assert hoisted(SQUARE + 'i = 0\nwhile i < n:\n    a = sq(b)\n    i = i + a') == \
+        SQUARE.rstrip() + '\ni = 0\nif i < n:\n    a_h0 = sq(b)\n    while i < n:\n        a = a_h0\n        i = i + a'
+    # not made on every iteration
+    source = SQUARE + 'i = 0\nwhile i < n:\n    if i > 3:\n        a = sq(b)\n    i = i + 1'
+    assert hoisted(source) == ast.unparse(ast.parse(source))
+    # not pure
+    source = 'def f(v):\n    print(v)\n    return v\ni = 0\nwhile i < n:\n    a = f(b)\n    i = i + 1'
+    assert hoisted(source) == ast.unparse(ast.parse(source))
+
+def test_not_invariant():
+    # assigned by the loop, or array elements
+    source = 'i = 0\nwhile i < n:\n    a = b * i\n    c = x_[0] + b\n    i = i + 1'
+    assert hoisted(source) == ast.unparse(ast.parse(source))
+    source = 'i = 0\nwhile i < n:\n    a = b + 1\n    b = i\n    i = i + 1'
+    assert hoisted(source) == ast.unparse(ast.parse(source))
@@ -0,0 +1,40 @@
+import ast
+
+from visitors.Liveness import Liveness
+from visitors.SymbolTable import SymbolTable
+
+
+def liveness(source, **options):
+    return Liveness(ast.parse(source).body[0], **options)
+
+def frame(source):
+    table = SymbolTable(share_slots=True)
+    table.visit(ast.parse(source))
+    return table.functions['f'].results
+
+def test_interference():
+    live = liveness('def f(v):\n    a = v + 1\n    b = a + 1\n    c = b + a\n    return c')
+    assert live.interferes('a', 'b') and live.interferes('b', 'a')
+    assert not live.interferes('a', 'c') and not live.interferes('b', 'c')
+    # what the epilogue reads is live at every return
+    live = liveness('def f(v):\n    a = v\n    if a < 0:\n        return 0\n    b = 1\n    return b', leaving=['a'])
+    assert live.interferes('b', 'a')
+
+def test_loops():
+    # carried to the next iteration: live across the whole body
+    live = liveness('def f(n):\n    p = 0\n    i = 0\n    while i < n:\n        t = i + p\n'
+                    '        print(t)\n        i = i + 1\n    return t')
+    assert live.interferes('t', 'p') and live.interferes('t', 'i')
+    # assigned while the other one is still to be read
+    live = liveness('def f(n):\n    p = 0\n    while n > 0:\n        t = n + p\n        p = n\n'
+                    '        print(t)\n        n = n - 1\n    return p')
+    assert live.interferes('t', 'p') and live.interferes('t', 'n')
+    # read after the loop
+    live = liveness('def f(n):\n    s = n\n    while n > 0:\n        t = n - 1\n        n = t\n    return s')
+    assert live.interferes('t', 's')
+
+def test_shared_slots():
+    assert frame('def f(v):\n    a = v + 1\n    b = a + 1\n    c = b + 1\n    return c') == \
+        {'a': 0, 'b': 0, 'c': 0, 'vN': 4, 'fRet': 6}
+    assert frame('def f(v):\n    a = v + 1\n    b = a + 1\n    c = b + a\n    return c') == \
+        {'a': 0, 'b': 2, 'c': 0, 'vN': 6, 'fRet': 8}
@@ -0,0 +1,41 @@
+from helpers import instructions, listing
+from optimizers.LoadElimination import LoadElimination
+
+
+def optimized(*lines):
+    return listing(LoadElimination(instructions(*lines)).optimize())
+
+def test_stored_value():
+    assert optimized('start: LDWA a,d', 'STWA b,d', 'LDWA b,d', 'STWA c,d', 'STOP') == \
+        ['start: LDWA a,d', 'STWA b,d', 'STWA c,d', 'STOP']
+    # the load stays when the flags it sets are tested
+    assert optimized('start: LDWA a,d', 'STWA b,d', 'LDWA b,d', 'BREQ end', 'STWA c,d', 'end: STOP') == \
+        ['start: LDWA a,d', 'STWA b,d', 'LDWA b,d', 'BREQ end', 'STWA c,d', 'end: STOP']
+
+def test_clobbered():
+    # the index register overwrote the word, a call may change anything
+    assert optimized('start: LDWA a,d', 'STWX a,d', 'LDWA a,d', 'STWA b,d', 'STOP') == \
+        ['start: LDWA a,d', 'STWX a,d', 'LDWA a,d', 'STWA b,d', 'STOP']
+    assert optimized('start: LDWA a,d', 'CALL f', 'LDWA a,d', 'STWA b,d', 'STOP') == \
+        ['start: LDWA a,d', 'CALL f', 'LDWA a,d', 'STWA b,d', 'STOP']
+    # stack words are forgotten when the stack pointer moves
+    assert optimized('start: LDWA x,s', 'SUBSP 2,i', 'LDWA x,s', 'STWA b,d', 'STOP') == \
+        ['start: LDWA x,s', 'SUBSP 2,i', 'LDWA x,s', 'STWA b,d', 'STOP']
+
+def test_shifted_index():
+    assert optimized('start: LDWX i,d', 'ASLX', 'LDWA v_,x', 'LDWX i,d', 'ASLX', 'STWA w_,x', 'STOP') == \
+        ['start: LDWX i,d', 'ASLX', 'LDWA v_,x', 'STWA w_,x', 'STOP']
+
+def test_hoist():
+    # the loop reloads what its body stored: the load moves onto the jump into the loop
+    assert optimized('start: DECI i,d', 'BR test',
+                     'body: ADDA 1,i', 'STWA i,d',
+                     'test: LDWA i,d', 'CPWA 5,i', 'BRLT body', 'STOP') == \
+        ['start: DECI i,d', 'LDWA i,d', 'BR test',
+         'body: ADDA 1,i', 'STWA i,d',
+         'test: CPWA 5,i', 'BRLT body', 'STOP']
+    # not when a path from the loop test does not load the value
+    assert optimized('start: DECI i,d', 'BR test',
+                     'body: ADDA 1,i', 'STWA i,d',
+                     'test: LDWX 0,i', 'STWX j,d', 'BRLT body', 'LDWA i,d', 'STOP')[:2] == \
+        ['start: DECI i,d', 'BR test']
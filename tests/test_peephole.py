@@ -0,0 +1,37 @@
+from helpers import instructions, listing
+from optimizers.PeepholeOptimizer import PeepholeOptimizer
+
+
+def optimized(*lines):
+    return listing(PeepholeOptimizer(instructions('start: NOP1', *lines)).optimize())
+
+def test_store_load():
+    assert optimized('STWA x,d', 'LDWA x,d', 'LDWX y,d', 'STOP') == ['start: STWA x,d', 'LDWX y,d', 'STOP']
+    assert optimized('STWX x,s', 'LDWX x,s', 'STOP') == ['start: STWX x,s', 'STOP']
+    # the flags of the load are tested, or the word may be elsewhere
+    assert optimized('STWA x,d', 'LDWA x,d', 'BREQ start') == ['start: STWA x,d', 'LDWA x,d', 'BREQ start']
+    assert optimized('STWA x,n', 'LDWA x,n', 'STOP') == ['start: STWA x,n', 'LDWA x,n', 'STOP']
+
+def test_flags_tested_after_a_jump():
+    # the flags may be tested wherever a jump, call or return leads
+    for jump in ('BR start', 'CALL f', 'RET'):
+        assert optimized('STWA x,d', 'LDWA x,d', jump, 'LDWA 0,i', 'STOP')[:3] == ['start: STWA x,d', 'LDWA x,d', jump]
+    assert optimized('STWA x,d', 'LDWA x,d', 'l: STOP') == ['start: STWA x,d', 'LDWA x,d', 'l: STOP']
+
+def test_load_store():
+    assert optimized('LDWA x,s', 'STWA x,s', 'STOP') == ['start: LDWA x,s', 'STOP']
+    assert optimized('LDWA x,sf', 'STWA x,sf', 'STOP') == ['start: LDWA x,sf', 'STWA x,sf', 'STOP']
+
+def test_dead_load():
+    assert optimized('LDWA x,d', 'LDWA y,d', 'STOP') == ['start: LDWA y,d', 'STOP']
+    assert optimized('LDWX x,d', 'LDWX 2,i', 'STOP') == ['start: LDWX 2,i', 'STOP']
+    # the second load reads the index register the first one set
+    for mode in ('x', 'sx', 'sfx'):
+        assert optimized('LDWX i,d', f'LDWX a,{mode}', 'STOP') == ['start: LDWX i,d', f'LDWX a,{mode}', 'STOP']
+        assert optimized('LDWA i,d', f'LDWA a,{mode}', 'STOP') == ['start: LDWA i,d', f'LDWA a,{mode}', 'STOP']
+
+def test_branches_and_labels():
+    assert optimized('LDWA 2,i', 'BR next', 'LDWA 1,i', 'next: STOP') == ['start: LDWA 2,i', 'next: STOP']
+    assert optimized('BR next', 'l: LDWA 1,i', 'next: STOP') == ['start: BR next', 'l: LDWA 1,i', 'next: STOP']
+    assert optimized('LDWA 1,i', 'ADDSP 0,i', 'skip: NOP1', 'BR skip', 'done: NOP0') == \
+        ['start: LDWA 1,i', 'skip: BR skip']
@@ -0,0 +1,34 @@
+import ast
+
+import pytest
+
+from visitors.RangeLoops import RangeLoops
+
+
+def lowered(source):
+    return ast.unparse(RangeLoops().visit(ast.parse(source)))
+
+def test_counting():
+    assert lowered('for i in range(5):\n    print(i)') == 'i = 0\nwhile i < 5:\n    print(i)\n    i = i + 1'
+    assert lowered('for i in range(n, 0, -2):\n    print(i)') == 'i = n\nwhile i > 0:\n    print(i)\n    i = i - 2'
+    # the else part runs once the loop is done
+    assert lowered('for i in range(3):\n    a = 1\nelse:\n    a = 2') == 'i = 0\nwhile i < 3:\n    a = 1\n    i = i + 1\na = 2'
+
+def test_stop_evaluated_once():
+    assert lowered('for i in range(a, n + 1):\n    print(i)') == \
+        'stop_r0 = n + 1\ni = a\nwhile i < stop_r0:\n    print(i)\n    i = i + 1'
+    assert lowered('for i in range(n):\n    n = n - 1') == \
+        'stop_r0 = n\ni = 0\nwhile i < stop_r0:\n    n = n - 1\n    i = i + 1'
+
+def test_hidden_counter():
+    # the body assigns the variable, or it is read after the loop
+    assert lowered('for i in range(3):\n    i = i * 2\n    print(i)') == \
+        'i_r0 = 0\nwhile i_r0 < 3:\n    i = i_r0\n    i = i * 2\n    print(i)\n    i_r0 = i_r0 + 1'
+    assert lowered('for i in range(3):\n    print(i)\nprint(i)') == \
+        'i_r0 = 0\nwhile i_r0 < 3:\n    i = i_r0\n    print(i)\n    i_r0 = i_r0 + 1\nprint(i)'
+
+@pytest.mark.parametrize('source', ['for x in values_:\n    print(x)', 'for i in range(0, 5, s):\n    print(i)',
+                                    'for i in range(0, 5, 0):\n    print(i)'])
+def test_unsupported(source):
+    with pytest.raises(ValueError):
+        lowered(source)
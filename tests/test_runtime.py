@@ -0,0 +1,65 @@
+import ast
+
+import pytest
+
+from generators.RuntimeLibrary import RuntimeLibrary
+from helpers import check
+
+OPERATIONS = '''
+a = int(input())
+b = int(input())
+c = a * b
+print(c)
+d = a // b
+print(d)
+e = a % b
+print(e)
+'''
+
+CONSTANTS = '''
+a = int(input())
+b = a * 10
+print(b)
+b = a * -3
+print(b)
+b = a * 0
+print(b)
+b = a * 255
+print(b)
+b = a // 8
+print(b)
+b = a % 8
+print(b)
+b = a // 3
+print(b)
+b = a % -3
+print(b)
+'''
+
+
+@pytest.mark.parametrize('a, b', [(47, 6), (-47, 6), (47, -6), (-47, -6), (0, 5), (6, 47), (181, 181),
+                                  (32767, 1), (-32768, 1), (-32768, -1), (300, 300)])
+def test_operations(a, b):
+    check(OPERATIONS, [a, b])
+
+@pytest.mark.parametrize('a', [0, 1, 37, -37, 3276, -3276, -1])
+def test_constant_operands(a):
+    check(CONSTANTS, [a])
+
+def test_strength_reduction():
+    def reduced(op, constant):
+        sequence = RuntimeLibrary.strength_reduce(op, constant)
+        return None if sequence is None else [i.text() for i in sequence]
+    assert reduced(ast.Mult(), 10) == ['ASLA', 'ASLA', 'ADDA', 'ASLA']
+    assert reduced(ast.Mult(), -2) == ['ASLA', 'NEGA']
+    assert reduced(ast.Mult(), 255) is None  # too many bits set
+    assert reduced(ast.FloorDiv(), 8) == ['ASRA'] * 3
+    assert reduced(ast.Mod(), 8) == ['ANDA 7,i']
+    assert reduced(ast.FloorDiv(), 3) is None
+    assert reduced(ast.Mod(), -4) is None
+
+def test_only_used_routines():
+    labels = {i.label for i in RuntimeLibrary({'rt_mod'}).instructions()}
+    assert {'rt_mod', 'rt_div'} <= labels  # the remainder comes from the division
+    assert 'rt_mul' not in labels
+    assert not RuntimeLibrary(set()).generate().instructions
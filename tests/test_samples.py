@@ -0,0 +1,494 @@
+"""Compiles programs, runs them on both simulators and checks that they print what
+CPython prints"""
+import os
+
+import pytest
+
+from benchmarks.samples import SAMPLES
+from helpers import ENGINES, OPTIONS, expected, simulate
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+# source and values read by every program
+PROGRAMS = {
+    'echo': ('''
+n = int(input())
+while n != 0:
+    print(n)
+    n = int(input())
+''', [5, -7, 32767, -32768, 0]),
+    # following links: each index is loaded from the element the previous one selects
+    'follow_links': ('''
+next_ = [2, 0, 3, 1]
+i = int(input())
+n = 0
+while n < 6:
+    i = next_[i]
+    print(i)
+    n = n + 1
+''', [1]),
+    # unary minus, on constants, equates, variables, parameters and array elements
+    'negate': ('''
+_K = 7
+
+def negate(v):
+    w = -v
+    return w
+
+values_ = [4, 8, 15]
+i = int(input())
+x = -values_[i]
+print(x)
+y = -_K
+print(y)
+z = negate(x)
+print(z)
+values_[0] = -values_[i]
+print(values_[0])
+''', [2]),
+    # storing computed values into array elements: the value goes in A, and calls to the
+    # runtime use X, before the index of the element is loaded
+    'store_quotient': ('''
+values_ = [0] * 4
+a = int(input())
+b = int(input())
+i = 1
+values_[i] = a // b
+values_[2] = a % b
+i = 3
+values_[i] = a * b
+i = 0
+while i < 4:
+    print(values_[i])
+    i = i + 1
+''', [47, 6]),
+    # functions with the same parameter names, a constant assigned first in a loop
+    'same_names': ('''
+def double(v):
+    w = v + v
+    return w
+
+def halve(v):
+    w = v // 2
+    return w
+
+n = int(input())
+i = 0
+while i < n:
+    k = 5
+    k = k + i
+    a = double(k)
+    b = halve(k)
+    print(a)
+    print(b)
+    i = i + 1
+''', [3]),
+    # returns in the middle of a function: the code after them is only reached by a jump
+    'early_returns': ('''
+def sign(v):
+    if v < 0:
+        return -1
+    if v == 0:
+        return 0
+    return 1
+
+n = int(input())
+while n != 99:
+    s = sign(n)
+    print(s)
+    n = int(input())
+''', [5, 0, -3, 99]),
+    # if/elif chains inside a loop: every branch ends with a jump past the chain
+    'classify': ('''
+n = int(input())
+while n != 0:
+    if n < -100:
+        c = -2
+    elif n < 0:
+        c = -1
+    elif n == 0:
+        c = 0
+    elif n < 100:
+        c = 1
+    else:
+        c = 2
+    print(c)
+    n = int(input())
+''', [-500, -5, 7, 250, 99, 100, 0]),
+    # the loop test reloads what the body stored, the loop may not run at all
+    'step_up': ('''
+n = int(input())
+while n != 0:
+    i = 0
+    while i < n:
+        i = i + 3
+    print(i)
+    n = int(input())
+''', [10, -4, 3, 0]),
+    # loop counters indexing arrays, or only counting around a call reading them
+    'counters': ('''
+def twice(v):
+    w = v + i
+    return w
+
+values_ = [0] * 6
+i = 0
+while i < 6:
+    values_[i] = i + i
+    i = i + 1
+n = int(input())
+i = 0
+while i < n:
+    r = twice(n)
+    print(r)
+    i = i + 2
+print(i)
+i = 5
+while i >= 0:
+    print(values_[i])
+    i = i - 1
+''', [5]),
+    # results of calls stored into array elements, arguments computed with the runtime
+    'store_call': ('''
+def gcd(a, b):
+    while b != 0:
+        t = a % b
+        a = b
+        b = t
+    return a
+
+def scaled(a, b):
+    g = gcd(a * 3, b // 2)
+    return g
+
+values_ = [0] * 3
+a = int(input())
+b = int(input())
+i = 1
+values_[i] = gcd(a, b)
+values_[2] = scaled(a, b)
+i = 0
+values_[i] = gcd(b, 10)
+while i < 3:
+    print(values_[i])
+    i = i + 1
+''', [84, 36]),
+    # a recursive function returning from a loop on the way down, not through its base case
+    'return_in_loop': ('''
+def f(n):
+    if n <= 0:
+        return 0
+    i = 0
+    while i < 1:
+        if n == 5:
+            return 100
+        i = i + 1
+    r = f(n - 1)
+    return r + n
+
+k = int(input())
+y = f(k)
+print(y)
+y = f(3)
+print(y)
+''', [7]),
+    # memoized with the extra options: arguments past the table, negative, results of 0
+    'memoized': ('''
+def count(n):
+    if n <= 1:
+        return n
+    a = count(n // 2)
+    b = count(n // 3)
+    c = a + b
+    return c
+
+n = int(input())
+while n != 999:
+    r = count(n)
+    print(r)
+    n = int(input())
+''', [200, 10, 0, -3, 1, 63, 64, 999]),
+    # locals of a function sharing stack slots, some of them carried across iterations
+    'shared_slots': ('''
+def fib(n):
+    a = 0
+    b = 1
+    i = 0
+    while i < n:
+        t = a + b
+        a = b
+        b = t
+        i = i + 1
+    d = a - 1
+    e = d + d
+    return e
+
+n = int(input())
+while n >= 0:
+    f = fib(n)
+    print(f)
+    n = n - 3
+''', [11]),
+    # arrays of bits and bytes (printing an element would keep it a word), elements copied
+    # from a byte array and within a word array
+    'packed': ('''
+seen_ = [0] * 20
+small_ = [0] * 6
+copy_ = [0] * 6
+n = int(input())
+i = 0
+while i < 6:
+    small_[i] = 250
+    seen_[n] = 1
+    n = n + 7
+    if n >= 20:
+        n = n - 20
+    i = i + 1
+i = 0
+j = 5
+while i < 6:
+    copy_[i] = small_[j]
+    small_[j] = 3
+    j = j - 1
+    i = i + 1
+copy_[0] = copy_[5]
+i = 0
+while i < 20:
+    if seen_[i] == 1:
+        print(i)
+    i = i + 1
+i = 0
+while i < 6:
+    v = small_[i]
+    print(v)
+    print(copy_[i])
+    i = i + 1
+''', [3]),
+    # arrays initialized in the data section: words, runs of zeros, bytes and bits
+    'tables': ('''
+_N = 10
+words_ = [-5, 0, 0, 300, 0, 7]
+days_ = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+flags_ = [1, 0, 0, 1, 0, 0, 0, 0, 0, 1]
+twos_ = [2] * 3
+i = 0
+while i < 6:
+    print(words_[i])
+    i = i + 1
+m = int(input())
+d = days_[m]
+print(d)
+i = 0
+while i < _N:
+    if flags_[i] == 1:
+        print(i)
+    i = i + 1
+twos_[1] = 5
+t = twos_[1]
+print(t)
+print(twos_[2])
+''', [1]),
+    # dense if/elif chains, at the top level and in a function, on values below, inside
+    # (gaps included) and above their range
+    'dispatch': ('''
+def score(v):
+    if v == -2:
+        s = 20
+    elif v == -1:
+        s = 10
+    elif v == 0:
+        s = 0
+    elif v == 2:
+        s = 5
+    else:
+        s = 99
+    return s
+
+n = int(input())
+while n != 100:
+    if n == 3:
+        c = 30
+    elif n == 4:
+        c = 40
+    elif n == 5:
+        c = 50
+    elif n == 3:
+        c = 33
+    elif n == 6:
+        c = 60
+    elif n > 50:
+        c = 1
+    else:
+        c = 0
+    print(c)
+    s = score(n)
+    print(s)
+    n = int(input())
+''', [3, 4, 5, 6, 7, 2, -2, -1, 0, 1, -3, -32768, 60, 100]),
+    # invariants of nested loops, and a call that never returns for the arguments of a
+    # loop that does not run
+    'invariants': ('''
+def steps(v):
+    c = 0
+    while v != 0:
+        v = v - 2
+        c = c + 1
+    return c
+
+n = int(input())
+b = int(input())
+i = 0
+while i < n:
+    j = 0
+    while j < 3:
+        k = i * 4
+        m = b + 1
+        t = k + m
+        print(t)
+        j = j + 1
+    i = i + 1
+n = int(input())
+b = int(input())
+while n != 0:
+    i = 0
+    while i < n:
+        s = steps(b)
+        print(s)
+        i = i + s
+    n = int(input())
+    b = int(input())
+''', [2, 6, -1, -1, 0, 0]),
+    # counting loops unrolled with the extra options: constant and variable bounds, every
+    # number of remaining iterations, counting down, in a function
+    'unrolled': ('''
+def total(n):
+    t = 0
+    i = 1
+    while i <= n:
+        t = t + i
+        i = i + 1
+    return t
+
+s = 0
+i = 0
+while i < 10:
+    s = s + i
+    i = i + 1
+print(s)
+i = 20
+while i > 0:
+    s = s - i
+    i = i - 3
+print(s)
+print(i)
+n = int(input())
+while n >= 0:
+    i = 0
+    c = 0
+    while i < n:
+        c = c + 2
+        i = i + 1
+    print(c)
+    t = total(n)
+    print(t)
+    n = int(input())
+''', [0, 1, 2, 3, 4, 5, 9, -1]),
+    # tests against zero right after loading or computing the value compared
+    'zero_tests': ('''
+a = int(input())
+b = int(input())
+while a != 0:
+    d = a - b
+    if d < 0:
+        c = -1
+    elif d == 0:
+        c = 0
+    else:
+        c = 1
+    print(c)
+    n = a
+    while n > 0:
+        n = n - b
+    print(n)
+    if n >= 0:
+        print(a)
+    a = int(input())
+    b = int(input())
+''', [5, 2, 3, 3, 2, 7, -4, 1, 0, 0]),
+    # and, or, not and chained comparisons, in ifs and loops, at the top level and in a
+    # function
+    'conditions': ('''
+def between(v, w):
+    r = 0
+    if 0 <= v < w and not v == 3:
+        r = 1
+    return r
+
+a = int(input())
+while not (a == 99 or a < -50):
+    b = int(input())
+    if a > 0 and b > 0 or a < 0 and b < 0:
+        print(a)
+    if not a or b:
+        print(b)
+    i = 10
+    if a < b <= 10:
+        print(i)
+    i = 0
+    while i < a and i < b:
+        i = i + 1
+    print(i)
+    r = between(a, b)
+    print(r)
+    a = int(input())
+''', [3, 5, -2, -7, 0, 4, 6, 2, 3, 11, 0, 0, -60]),
+    # for loops over ranges: counting down, empty, a bound the body changes, the variable
+    # assigned by the body and read after the loop, nested, in a function
+    'ranges': ('''
+def squares(n):
+    t = 0
+    for k in range(1, n + 1):
+        q = k * k
+        t = t + q
+    return t
+
+values_ = [0] * 8
+n = int(input())
+for i in range(n):
+    values_[i] = i * 3
+for i in range(n - 1, -1, -2):
+    print(values_[i])
+for j in range(5, n):
+    print(j)
+for j in range(n):
+    n = n - 1
+    j = j + 10
+    print(j)
+print(j)
+print(n)
+for a in range(3):
+    for b in range(a, 3):
+        c = a * 3
+        c = c + b
+        print(c)
+s = squares(4)
+print(s)
+''', [6]),
+}
+
+
+@pytest.mark.parametrize('engine', ENGINES, ids=lambda engine: engine.__name__)
+@pytest.mark.parametrize('options', OPTIONS.values(), ids=OPTIONS.keys())
+@pytest.mark.parametrize('path', SAMPLES.keys())
+def test_sample(path, options, engine):
+    with open(os.path.join(ROOT, path)) as f:
+        source = f.read()
+    inputs = SAMPLES[path]
+    assert simulate(source, inputs, options, engine).output == expected(source, inputs)
+
+@pytest.mark.parametrize('engine', ENGINES, ids=lambda engine: engine.__name__)
+@pytest.mark.parametrize('options', OPTIONS.values(), ids=OPTIONS.keys())
+@pytest.mark.parametrize('name', PROGRAMS.keys())
+def test_program(name, options, engine):
+    source, inputs = PROGRAMS[name]
+    assert simulate(source, inputs, options, engine).output == expected(source, inputs)
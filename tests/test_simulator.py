@@ -0,0 +1,32 @@
+import pytest
+
+from helpers import ENGINES, assemble
+
+
+@pytest.mark.parametrize('engine', ENGINES, ids=lambda engine: engine.__name__)
+def test_accounting(engine):
+    program = assemble('LDWA 5,i', 'ADDA x,d', 'STWA x,d', 'DECO x,d', 'STOP', 'x: .WORD 2', '.END')
+    sim = engine(program)
+    stats = sim.run()
+    assert sim.output == ['7']
+    # every instruction costs a fetch (3 cycles for non-unary ones) and an ALU cycle,
+    # every word read or written 2 cycles, and DECO is a trap
+    assert (stats.instructions, stats.reads, stats.writes, stats.cycles) == (5, 2, 1, 44)
+    assert stats.stack_high_water == 0
+
+@pytest.mark.parametrize('engine', ENGINES, ids=lambda engine: engine.__name__)
+def test_stack_and_input(engine):
+    program = assemble('DECI n,d', 'CALL f', 'DECO n,d', 'STOP', 'f: SUBSP 4,i', 'ADDSP 4,i', 'RET',
+                       'n: .BLOCK 2', '.END')
+    sim = engine(program, [-12])
+    stats = sim.run()
+    assert sim.output == ['-12']
+    assert (stats.instructions, stats.reads, stats.writes) == (7, 2, 2)
+    assert stats.stack_high_water == 6  # the return address and 4 bytes of locals
+
+@pytest.mark.parametrize('engine', ENGINES, ids=lambda engine: engine.__name__)
+def test_errors(engine):
+    with pytest.raises(RuntimeError, match='no more input'):
+        engine(assemble('DECI n,d', 'STOP', 'n: .BLOCK 2', '.END')).run()
+    with pytest.raises(RuntimeError, match='Step limit'):
+        engine(assemble('loop: BR loop', '.END'), max_steps=1000).run()
@@ -0,0 +1,27 @@
+import ast
+
+from visitors.Switch import Switch
+
+
+def switch(source):
+    return Switch(ast.parse(source).body[0])
+
+def test_cases():
+    chain = switch('if x == 1:\n    a = 1\nelif 2 == x:\n    a = 2\nelif x == 1:\n    a = 3\nelse:\n    a = 4')
+    assert chain.variable.id == 'x'
+    # a constant tested again never matches
+    assert {value: ast.unparse(body) for value, body in chain.cases.items()} == {1: 'a = 1', 2: 'a = 2'}
+    assert ast.unparse(chain.default) == 'a = 4'
+    # the first test on something else starts the default
+    chain = switch('if x == 1:\n    a = 1\nelif y == 2:\n    a = 2\nelse:\n    a = 3')
+    assert list(chain.cases) == [1]
+    assert ast.unparse(chain.default) == 'if y == 2:\n    a = 2\nelse:\n    a = 3'
+
+def test_dense():
+    chain = 'if x == 0:\n    a = 0\nelif x == 1:\n    a = 1\nelif x == 2:\n    a = 2\n'
+    assert not switch(chain).dense()  # too few cases
+    spread = switch(chain + 'elif x == 7:\n    a = 7')
+    assert spread.dense() and (spread.low, spread.high) == (0, 7)
+    assert not switch(chain + 'elif x == 8:\n    a = 8').dense()  # more than two entries per case
+    # arrays are not tested
+    assert switch('if a_ == 1:\n    b = 1').cases == {}
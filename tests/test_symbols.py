@@ -0,0 +1,69 @@
+import ast
+
+from visitors.SymbolTable import SymbolTable
+
+
+def symbols(source, **options):
+    table = SymbolTable(**options)
+    table.visit(ast.parse(source))
+    return table
+
+def test_globals():
+    table = symbols('a = 3\nb = int(input())\narr_ = [0] * 4\nc = a')
+    assert table.results == {'a': 3, 'b': None, 'arr_': 4, 'c': None}
+
+def test_constant_assigned_in_a_loop():
+    # the store runs on every iteration: the variable is not an initialized .WORD
+    table = symbols('i = 0\nwhile i < 3:\n    k = 5\n    i = i + 1')
+    assert table.results == {'i': 0, 'k': None}
+
+def test_frame():
+    table = symbols('def f(a, b):\n    c = a + b\n    return c')
+    # locals, the return address, the parameters pushed in order, the return value
+    assert table.functions['f'].results == {'c': 0, 'bN': 4, 'aN': 6, 'fRet': 8}
+    table = symbols('def f(a, b):\n    c = a + b\n    return c', register_calls=True)
+    assert table.functions['f'].results == {'c': 0, 'aN': 2, 'bN': 4}
+
+def test_register_convention():
+    # leaf functions with up to two parameters
+    table = symbols('def f(a, b):\n    return a\ndef g(a, b, c):\n    return a\ndef h(a):\n    x = f(a, a)\n    return x',
+                    register_calls=True)
+    assert [table.functions[name].registers for name in 'fgh'] == [True, False, False]
+    # calls to the built-in functions do not count
+    table = symbols('def f(a):\n    print(a)\n    return a', register_calls=True)
+    assert table.functions['f'].registers
+
+def test_memoized():
+    fib = 'def fib(n):\n    if n < 2:\n        return n\n    a = fib(n - 1)\n    b = fib(n - _K)\n    return a + b\n'
+    table = symbols('_K = 2\n' + fib, memoize=16)
+    assert (table.functions['fib'].memo, table.functions['fib'].memo_size) == ('fib_', 16)
+    assert table.results['fib_'] == 16
+    # the table name is not taken, nothing happens without a number of entries
+    assert symbols('_K = 2\nfib_ = [0] * 2\n' + fib, memoize=16).functions['fib'].memo == 'fib1_'
+    assert symbols('_K = 2\n' + fib).functions['fib'].memo is None
+    not_pure = [
+        # a single recursive call, reading a global variable, assigning the parameter
+        'def f(n):\n    if n < 2:\n        return n\n    a = f(n - 1)\n    return a + n',
+        'def f(n):\n    if n < 2:\n        return _k\n    a = f(n - 1)\n    b = f(n - 2)\n    return a + b',
+        'def f(n):\n    if n < 2:\n        return n\n    n = n - 1\n    a = f(n)\n    b = f(n - 1)\n    return a + b',
+    ]
+    for source in not_pure:
+        assert symbols('_k = 1\n' + source, memoize=16).functions['f'].memo is None
+
+def test_packed_arrays():
+    source = 'a_ = [0] * 8\nb_ = [0] * 4\nc_ = [0] * 4\nd_ = [0] * 4\ni = int(input())\n' \
+        'a_[i] = 1\nb_[i] = 200\nc_[i] = -1\nd_[i] = i\nx = b_[i]\nif a_[i] == 1:\n    x = 1'
+    # 0/1 in bits, up to 255 in bytes, negative or computed values in words
+    assert symbols(source, bit_arrays=True).array_modes == {'a_': 'bit', 'b_': 'byte'}
+    assert symbols(source).array_modes == {'a_': 'byte', 'b_': 'byte'}
+    # elements read within expressions, or indexed by expressions, stay words
+    assert symbols('a_ = [0] * 8\ni = 1\na_[i] = 1\nx = a_[i] + 1', bit_arrays=True).array_modes == {}
+    assert symbols('a_ = [0] * 8\ni = 1\na_[i + 1] = 1', bit_arrays=True).array_modes == {}
+
+def test_unique_equates():
+    table = symbols('x = 1\ndef f(v):\n    x = v\n    return x\ndef g(v):\n    w = v\n    return w')
+    f, g = table.functions['f'], table.functions['g']
+    assert f.slot('x') == 'xL'  # shadowing a global
+    assert (f.slot('v'), g.slot('v')) == ('vN', 'vN1')
+    assert not set(f.results) & set(g.results)
+    assert not (set(f.results) | set(g.results)) & set(table.results)
@@ -0,0 +1,31 @@
+import ast
+
+from optimizers.TailRecursion import TailRecursion
+
+
+def converted(source):
+    return ast.unparse(TailRecursion().visit(ast.parse(source)))
+
+def test_tail_call():
+    # parameters read by a later argument change once every argument is computed
+    assert converted('def f(a, b):\n    if b == 0:\n        return a\n    r = f(b, a % b)\n    return r') == \
+        'def f(a, b):\n    while b != 0:\n        a_t = b\n        b = a % b\n        a = a_t\n    return a'
+
+def test_accumulator():
+    assert converted('def f(n):\n    if n <= 1:\n        return 1\n    r = f(n - 1)\n    return r * n') == \
+        'def f(n):\n    acc = 1\n    while n > 1:\n        acc = acc * n\n        n = n - 1\n    return acc'
+
+def test_not_converted():
+    sources = [
+        # the recursive call is not the last thing done
+        'def f(n):\n    if n <= 0:\n        return 0\n    r = f(n - 1)\n    print(r)\n    return r',
+        # two recursive calls
+        'def f(n):\n    if n <= 1:\n        return n\n    a = f(n - 1)\n    b = f(n - 2)\n    return a + b',
+        # returning on the way down would skip the values accumulated so far
+        'def f(n):\n    if n <= 0:\n        return 0\n    if n == 5:\n        return 100\n'
+        '    r = f(n - 1)\n    return r + n',
+        'def f(n):\n    if n <= 0:\n        return 0\n    i = 0\n    while i < 1:\n        if n == 5:\n'
+        '            return 100\n        i = i + 1\n    r = f(n - 1)\n    return r + n',
+    ]
+    for source in sources:
+        assert converted(source) == ast.unparse(ast.parse(source))
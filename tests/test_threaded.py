@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from benchmarks.samples import SAMPLES
+from helpers import assemble, simulate
+from simulator.Simulator import Simulator
+from simulator.ThreadedSimulator import ThreadedSimulator
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+@pytest.mark.parametrize('path', SAMPLES.keys())
+def test_same_stats(path):
+    with open(os.path.join(ROOT, path)) as f:
+        source = f.read()
+    reference = simulate(source, SAMPLES[path], engine=Simulator)
+    threaded = simulate(source, SAMPLES[path], engine=ThreadedSimulator)
+    assert vars(threaded.stats) == vars(reference.stats)
+
+def test_word_at_last_address():
+    # the second byte of a word at 0xFFFF is at 0, as in the reference simulator
+    lines = ('LDWA 0x1234,i', 'STWA 0xFFFF,d', 'DECO 0xFFFF,d', 'LDWX 0xFFFE,i', 'LDWA 0x5678,i', 'STWA 1,x',
+             'DECO 0,d', 'STOP', '.END')
+    outputs = list()
+    for engine in (Simulator, ThreadedSimulator):
+        sim = engine(assemble(*lines))
+        sim.run()
+        outputs.append((sim.output, len(sim.memory), sim.memory[0xFFFF], sim.memory[0]))
+    assert outputs[0] == outputs[1]
+    assert outputs[0] == (['4660', '30738'], 0x10000, 0x56, 0x78)
+
+def test_decoded_programs():
+    compiled = ThreadedSimulator._ThreadedSimulator__compiled
+    assert ThreadedSimulator.MAX_PROGRAMS >= len(SAMPLES)  # the benchmark suite runs warm
+    program = assemble('LDWA 1,i', 'DECO 0,d', 'STOP', '.END')
+    ThreadedSimulator(program).run()
+    blocks = compiled[bytes(program.code)]
+    ThreadedSimulator(program).run()
+    assert compiled[bytes(program.code)] is blocks
+    for n in range(ThreadedSimulator.MAX_PROGRAMS + 8):
+        ThreadedSimulator(assemble(f'LDWA {n + 2},i', 'STOP', '.END')).run()
+    assert len(compiled) == ThreadedSimulator.MAX_PROGRAMS
+    assert bytes(program.code) not in compiled  # the oldest programs go first
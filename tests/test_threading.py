@@ -0,0 +1,39 @@
+from helpers import instructions, listing
+from optimizers.JumpThreading import JumpThreading
+
+
+def optimized(*lines):
+    return listing(JumpThreading(instructions(*lines)).optimize())
+
+def test_collapse_pads():
+    assert optimized('start: LDWA 0,i', 'BREQ pad', 'STOP', 'pad: NOP1', 'STWA a,d', 'STOP') == \
+        ['start: LDWA 0,i', 'BREQ pad', 'STOP', 'pad: STWA a,d', 'STOP']
+    # a pad falling into a labeled instruction is renamed to it
+    assert optimized('start: LDWA 0,i', 'BREQ pad', 'STOP', 'pad: NOP1', 'next: STOP') == \
+        ['start: LDWA 0,i', 'BREQ next', 'STOP', 'next: STOP']
+    # the entry point and pads before data stay
+    assert optimized('start: NOP1', 'STOP', 'pad: NOP1', 'a: .WORD 0') == \
+        ['start: NOP1', 'STOP', 'pad: NOP1', 'a: .WORD 0']
+
+def test_thread():
+    assert optimized('start: LDWA 0,i', 'BREQ hop', 'STOP', 'hop: BR end', 'end: STOP') == \
+        ['start: LDWA 0,i', 'BREQ end', 'STOP', 'hop: BR end', 'end: STOP']
+    # cycles of jumps end
+    assert optimized('start: BR a', 'a: BR b', 'b: BR a') == ['start: BR b', 'a: BR a', 'b: BR b']
+
+def test_invert():
+    assert optimized('start: LDWA a,d', 'BRLT less', 'BR done', 'less: STWA b,d', 'done: STOP') == \
+        ['start: LDWA a,d', 'BRGE done', 'less: STWA b,d', 'done: STOP']
+    # a labeled jump may be reached by another branch
+    assert optimized('start: LDWA a,d', 'BRLT less', 'other: BR done', 'less: STWA b,d', 'done: STOP') == \
+        ['start: LDWA a,d', 'BRLT less', 'other: BR done', 'less: STWA b,d', 'done: STOP']
+
+def test_rotate_loop():
+    assert optimized('start: LDWA 0,i', 'STWA i,d',
+                     'test_1: LDWA i,d', 'CPWA 5,i', 'BRGE end_1',
+                     'ADDA 1,i', 'STWA i,d', 'BR test_1',
+                     'end_1: STOP') == \
+        ['start: LDWA 0,i', 'STWA i,d', 'BR test_1',
+         'loop_1: ADDA 1,i', 'STWA i,d',
+         'test_1: LDWA i,d', 'CPWA 5,i', 'BRLT loop_1',
+         'end_1: STOP']
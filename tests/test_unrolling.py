@@ -0,0 +1,43 @@
+import ast
+
+from optimizers.LoopUnrolling import LoopUnrolling
+
+
+def unrolled(source, factor=4, budget=64):
+    return ast.unparse(LoopUnrolling(factor, budget).visit(ast.parse(source)))
+
+def test_removed():
+    # every iteration fits in the budget
+    assert unrolled('i = 0\nwhile i < 3:\n    print(i)\n    i = i + 1') == \
+        'i = 0' + '\nprint(i)\ni = i + 1' * 3
+
+def test_constant_bound():
+    # groups of iterations, the remaining ones as straight code
+    assert unrolled('i = 0\nwhile i < 10:\n    print(i)\n    i = i + 1', budget=40) == \
+        'i = 0\nwhile i < 8:' + '\n    print(i)\n    i = i + 1' * 4 + '\nprint(i)\ni = i + 1' * 2
+    # counting down, the bound included
+    assert unrolled('i = 10\nwhile i >= 0:\n    print(i)\n    i = i - 3', factor=2, budget=20) == \
+        'i = 10\nwhile i > -2:' + '\n    print(i)\n    i = i - 3' * 2
+
+def test_variable_bound():
+    # the main loop only runs when the original one would
+    assert unrolled('i = 0\nwhile i < n:\n    print(i)\n    i = i + 2', factor=2) == \
+        'i = 0\nif i < n:\n    lim_u0 = n - 2\n    while i < lim_u0:' + '\n        print(i)\n        i = i + 2' * 2 \
+        + '\nwhile i < n:\n    print(i)\n    i = i + 2'
+
+def test_not_unrolled():
+    sources = [
+        # the counter is not known before the loop
+        'while i < 3:\n    print(i)\n    i = i + 1',
+        # the body does not fit twice in the budget
+        'i = 0\nwhile i < 10:\n    print(i)\n    i = i + 1',
+        # the step goes the wrong way, the counter changes elsewhere, the bound changes
+        'i = 0\nwhile i < n:\n    print(i)\n    i = i - 1',
+        'i = 0\nwhile i < n:\n    i = i * 2\n    i = i + 1',
+        'i = 0\nwhile i < n:\n    n = n - 1\n    i = i + 1',
+    ]
+    for source in sources:
+        assert unrolled(source, budget=16) == ast.unparse(ast.parse(source))
+    # the limit could wrap around
+    source = 'i = -32767\nwhile i < n:\n    print(i)\n    i = i + 2'
+    assert unrolled(source) == ast.unparse(ast.parse(source))
@@ -1,66 +1,244 @@
 import argparse
 import ast
-from visitors.GlobalVariables import GlobalVariableExtraction
-from visitors.LocalVariables import LocalVariableExtraction
+import itertools
+import sys
+from visitors.SymbolTable import SymbolTable
 from visitors.TopLevelProgram import TopLevelProgram
 from visitors.FunctionVisitor import FunctionVisitor
+from visitors.RangeLoops import RangeLoops
 from generators.StaticMemoryAllocation import StaticMemoryAllocation
 from generators.LocalMemoryAllocation import LocalMemoryAllocation
 from generators.EntryPoint import EntryPoint
 from generators.FuncEntryPoint import FuncEntryPoint
+from generators.RuntimeLibrary import RuntimeLibrary
+from generators.Program import Program, CompiledFunction
+from generators.Emitter import Emitter
+from generators.Instruction import Instruction
+from optimizers.PeepholeOptimizer import PeepholeOptimizer
+from optimizers.DeadCodeElimination import DeadCodeElimination
+from optimizers.JumpThreading import JumpThreading
+from optimizers.LoadElimination import LoadElimination
+from optimizers.InductionVariables import InductionVariables
+from optimizers.FlagReuse import FlagReuse
+from optimizers.ConstantFolding import ConstantFolding
+from optimizers.LoopInvariants import LoopInvariants
+from optimizers.LoopUnrolling import LoopUnrolling
+from optimizers.Inliner import Inliner
+from optimizers.TailRecursion import TailRecursion
+
+DEFAULT_OPTIONS = {
+    'tail_calls': True,
+    'inline_threshold': 20,
+    'fold_constants': True,
+    'hoist_invariants': True,
+    'unroll_factor': 1,
+    'unroll_budget': 64,
+    'register_calls': True,
+    'memoize': 0,
+    'share_slots': True,
+    'bit_arrays': False,
+    'jump_tables': True,
+    'peephole': True,
+    'dead_code': True,
+    'jump_threading': True,
+    'induction_vars': True,
+    'redundant_loads': True,
+    'flag_reuse': True,
+    'stats': False,
+}
+MEMO_ENTRIES = 64  # arguments covered by --memoize when not given
 
 def main():
-    input_file, print_ast = process_cli()
+    input_file, print_ast, output_file, options = process_cli()
     with open(input_file) as f:
         source = f.read()
     node = ast.parse(source)
     if print_ast:
         print(ast.dump(node, indent=2))
+    elif output_file:
+        with open(output_file, 'w') as f:
+            Emitter(f).emit(compile_tree(input_file, node, options))
     else:
-        process(input_file, node)
+        process(input_file, node, options)
     
 def process_cli():
     """"Process Command Line Interface options"""
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', help='filename to compile (.py)')
+    parser.add_argument('-o', help='file to write the assembly to (.pep), standard output by default')
     parser.add_argument('--ast-only', default=False, action='store_true')
+    parser.add_argument('--no-tail-calls', dest='tail_calls', default=True, action='store_false',
+                        help='keep recursive functions recursive instead of turning them into loops')
+    parser.add_argument('--inline-threshold', type=int, default=DEFAULT_OPTIONS['inline_threshold'],
+                        help='largest function (in AST nodes) inlined at its call sites, 0 disables inlining')
+    parser.add_argument('--no-fold', dest='fold_constants', default=True, action='store_false',
+                        help='disable constant folding and propagation')
+    parser.add_argument('--no-licm', dest='hoist_invariants', default=True, action='store_false',
+                        help='keep computations whose operands do not change in a loop inside of it')
+    parser.add_argument('--unroll-factor', type=int, default=DEFAULT_OPTIONS['unroll_factor'],
+                        help='copies of the body of counting loops made by unrolling, 1 only replaces the loops '
+                        'whose iterations all fit in the budget')
+    parser.add_argument('--unroll-budget', type=int, default=DEFAULT_OPTIONS['unroll_budget'],
+                        help='largest unrolled loop body (in AST nodes), 0 disables unrolling')
+    parser.add_argument('--no-register-calls', dest='register_calls', default=True, action='store_false',
+                        help='pass every argument on the stack, even to small leaf functions')
+    parser.add_argument('--memoize', type=int, nargs='?', const=MEMO_ENTRIES, default=DEFAULT_OPTIONS['memoize'],
+                        metavar='ENTRIES', help=f'keep the results of pure recursive functions of one argument '
+                        f'in a table (of {MEMO_ENTRIES} entries unless given)')
+    parser.add_argument('--no-slot-sharing', dest='share_slots', default=True, action='store_false',
+                        help='give every local variable its own stack slot, even when lifetimes do not overlap')
+    parser.add_argument('--bit-arrays', default=False, action='store_true',
+                        help='pack arrays only holding 0 and 1 eight elements per byte (smaller, slower)')
+    parser.add_argument('--no-jump-tables', dest='jump_tables', default=True, action='store_false',
+                        help='compile if/elif chains on one variable as compares, even when dense')
+    parser.add_argument('--no-dce', dest='dead_code', default=True, action='store_false',
+                        help='disable unreachable code and useless branch removal')
+    parser.add_argument('--no-threading', dest='jump_threading', default=True, action='store_false',
+                        help='disable jump threading, branch inversion and loop rotation')
+    parser.add_argument('--no-induction', dest='induction_vars', default=True, action='store_false',
+                        help='disable keeping loop counters in the index register')
+    parser.add_argument('--no-load-elim', dest='redundant_loads', default=True, action='store_false',
+                        help='disable the removal of loads of values already in a register')
+    parser.add_argument('--no-flag-reuse', dest='flag_reuse', default=True, action='store_false',
+                        help='keep the compares with zero of values whose flags are already set')
+    parser.add_argument('--no-peephole', dest='peephole', default=True, action='store_false',
+                        help='disable the peephole optimizer')
+    parser.add_argument('--stats', default=False, action='store_true',
+                        help='print optimization statistics as comments')
     args = vars(parser.parse_args())
-    return args['f'], args['ast_only']
+    options = {name: args[name] for name in DEFAULT_OPTIONS}
+    return args['f'], args['ast_only'], args['o'], options
+
+def compile_source(source, input_file='<source>', options=DEFAULT_OPTIONS) -> Program:
+    """Translates Python source code into a Program, without printing anything"""
+    return compile_tree(input_file, ast.parse(source), options)
 
-def process(input_file, root_node):
-    print(f'; Translating {input_file}')
-    extractor = GlobalVariableExtraction()
-    extractor.visit(root_node)
-    memory_alloc = StaticMemoryAllocation(extractor.results)
-    print('; Branching to top level (tl) instructions')
-    print('\t\tBR tl')
-    memory_alloc.generate()
-    all_locals = [] # storing all local variables so that TopLevelProgram has a copy of all local vars
-    top_level = TopLevelProgram('tl')
-    for s in range(len(root_node.body)):
-        if isinstance(root_node.body[s], ast.FunctionDef):
-                local_ext = LocalVariableExtraction(extractor.results)
-                local_ext.visit(root_node.body[s])
-                all_locals.append(local_ext.results)
-    top_level.set_local_vars(all_locals)
+def process(input_file, root_node, options=DEFAULT_OPTIONS):
+    Emitter(sys.stdout).emit(compile_tree(input_file, root_node, options))
+
+def compile_tree(input_file, root_node, options=DEFAULT_OPTIONS) -> Program:
+    program = Program(input_file)
+    ranges = RangeLoops()  # for loops are compiled as while loops
+    root_node = ranges.visit(root_node)
+    if options['stats']:
+        program.header.comments.append(f'range loops: {ranges.lowered} for loops lowered, '
+                                       f'{ranges.hidden} counting with a copy of their variable')
+    if options['tail_calls']:  # before inlining: the loops may make leaf functions
+        tail_calls = TailRecursion()
+        root_node = tail_calls.visit(root_node)
+        if options['stats']:
+            program.header.comments.append(f'tail recursion: {tail_calls.converted} functions turned into loops, '
+                                           f'{tail_calls.accumulated} with an accumulator')
+    if options['hoist_invariants']:  # before inlining: calls to pure functions move whole
+        invariants = LoopInvariants()
+        root_node = invariants.visit(root_node)
+        if options['stats']:
+            program.header.comments.append(f'loop invariants: {invariants.hoisted} computations hoisted out of '
+                                           f'{invariants.loops} loops')
+    if options['inline_threshold']:
+        inliner = Inliner(options['inline_threshold'])
+        root_node = inliner.visit(root_node)
+        if options['stats']:
+            program.header.comments.append(f'inlining: {inliner.inlined} calls inlined, '
+                                           f'{inliner.removed} functions removed')
+    if options['fold_constants']:
+        folding = ConstantFolding()
+        root_node = folding.visit(root_node)
+        if options['stats']:
+            program.header.comments.append(f'constant folding: {folding.folded} folded, {folding.propagated} propagated, '
+                                           f'{folding.removed_branches} branches removed')
+    if options['unroll_budget']:  # after folding: constant bounds are known
+        unrolling = LoopUnrolling(options['unroll_factor'], options['unroll_budget'])
+        root_node = unrolling.visit(root_node)
+        if options['stats']:
+            program.header.comments.append(f'loop unrolling: {unrolling.unrolled} loops unrolled, '
+                                           f'{unrolling.removed} replaced by copies of their body')
+    # a single analysis walk provides the globals and the locals of every function
+    symbols = SymbolTable(options['register_calls'], options['memoize'], options['share_slots'],
+                          options['bit_arrays'])
+    symbols.visit(root_node)
+    memoized = [name for name, function in symbols.functions.items() if function.memo]
+    if options['stats'] and options['memoize']:
+        program.header.comments.append(f'memoization: {len(memoized)} functions ({", ".join(memoized) or "none"}), '
+                                       f'{options["memoize"]} entries each')
+    memory_alloc = StaticMemoryAllocation(symbols.results, symbols.array_modes, symbols.array_values)
+    program.header.comments.append('Branching to top level (tl) instructions')
+    program.header.instructions.append(Instruction('BR', 'tl'))
+    program.data = memory_alloc.generate()
+    label_ids = itertools.count()  # loop and branch labels are numbered across the whole program
+    top_level = TopLevelProgram('tl', label_ids, options['jump_tables'])
+    # storing all local variables so that TopLevelProgram has a copy of all local vars
+    top_level.set_local_vars(symbols.local_vars())
+    top_level.set_functions(symbols.functions)
+    top_level.set_array_modes(symbols.array_modes)
 
     top_level.visit(root_node)
-    ep = EntryPoint(top_level.finalize())
+    stats = list()
+    ep = EntryPoint(optimize(top_level.finalize(), options, stats))
+    runtime_calls = set(top_level.runtime_calls)
     for s in root_node.body:
             if isinstance(s, ast.FunctionDef):
-                func_process(s,extractor.results)
-    ep.generate() 
+                function = func_process(s, symbols, options, label_ids)
+                program.functions[s.name] = function
+                runtime_calls |= function.runtime_calls
+    program.runtime = RuntimeLibrary(runtime_calls).generate()
+    program.top_level = ep.generate()
+    program.top_level.comments += stats
+    return program
 
-def func_process(funcdef_node, global_vars):
-    print(f'; ***** {funcdef_node.name} function definition')
-    extractor = LocalVariableExtraction(global_vars)
-    extractor.visit(funcdef_node)
-    memory_alloc = LocalMemoryAllocation(extractor.results)
-    memory_alloc.generate()
-    func_level = FunctionVisitor(f'{funcdef_node.name}',extractor)
+def func_process(funcdef_node, symbols, options=DEFAULT_OPTIONS, label_ids=None) -> CompiledFunction:
+    function_symbols = symbols.functions[funcdef_node.name]
+    memory_alloc = LocalMemoryAllocation(function_symbols)
+    frame = memory_alloc.generate()
+    frame.comments.insert(0, f'***** {funcdef_node.name} function definition')
+    func_level = FunctionVisitor(f'{funcdef_node.name}', function_symbols, symbols.functions, label_ids,
+                                 options['jump_tables'])
     func_level.visit(funcdef_node)
-    ep_func = FuncEntryPoint(func_level.finalize())
-    ep_func.generate()
+    stats = list()
+    ep_func = FuncEntryPoint(optimize(func_level.finalize(), options, stats))
+    code = ep_func.generate()
+    code.comments += stats
+    return CompiledFunction(funcdef_node.name, frame, code, func_level.runtime_calls)
+
+def optimize(instructions, options, comments=None):
+    """Optimization passes run between code generation and the entry points, their
+    statistics go to comments"""
+    if options['dead_code']:
+        dce = DeadCodeElimination(instructions)
+        instructions = dce.optimize()
+        if options['stats'] and comments is not None:
+            comments.append(f'dead code: {dce.unreachable} unreachable blocks, {dce.branches} branches, '
+                            f'{dce.labels} landing pads removed')
+    if options['jump_threading']:
+        threading = JumpThreading(instructions)
+        instructions = threading.optimize()
+        if options['stats'] and comments is not None:
+            comments.append(f'jump threading: {threading.threaded} threaded, {threading.inverted} inverted, '
+                            f'{threading.rotated} loops rotated, {threading.collapsed} landing pads collapsed')
+    if options['induction_vars']:
+        induction = InductionVariables(instructions)
+        instructions = induction.optimize()
+        if options['stats'] and comments is not None:
+            comments.append(f'induction variables: {induction.resident} kept in X, '
+                            f'{induction.scaled} strength-reduced to byte offsets')
+    if options['redundant_loads']:
+        loads = LoadElimination(instructions)
+        instructions = loads.optimize()
+        if options['stats'] and comments is not None:
+            comments.append(f'redundant loads: {loads.loads} loads and {loads.shifts} shifts removed, '
+                            f'{loads.reads} memory reads saved, {loads.hoisted} loads moved out of loops')
+    if options['flag_reuse']:
+        flags = FlagReuse(instructions)
+        instructions = flags.optimize()
+        if options['stats'] and comments is not None:
+            comments.append(f'flag reuse: {flags.compares} compares with zero removed')
+    if options['peephole']:
+        peephole = PeepholeOptimizer(instructions)
+        instructions = peephole.optimize()
+        if options['stats'] and comments is not None:
+            for rule, hits in sorted(peephole.hits.items()):
+                comments.append(f'peephole {rule}: {hits}')
+    return instructions
     
 if __name__ == '__main__':
     main()
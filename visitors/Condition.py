@@ -0,0 +1,70 @@
+import ast
+
+# branch taken when the comparison holds
+BRANCH_IF = {ast.Lt: 'BRLT', ast.LtE: 'BRLE', ast.Gt: 'BRGT', ast.GtE: 'BRGE', ast.NotEq: 'BRNE', ast.Eq: 'BREQ'}
+# branch taken when it does not
+BRANCH_UNLESS = {
+    ast.Lt: 'BRGE',  # '<'  in the code means we branch if '>='
+    ast.LtE: 'BRGT',  # '<=' in the code means we branch if '>'
+    ast.Gt: 'BRLE',  # '>'  in the code means we branch if '<='
+    ast.GtE: 'BRLT',  # '>=' in the code means we branch if '<'
+    ast.NotEq: 'BREQ',  # '!=' in the code means we branch if '=='
+    ast.Eq: 'BRNE'  # '==' in the code means we branch if '!='
+}
+
+
+class Condition():
+    """The test of an if or a while loop as a sequence of compares, each followed by a
+    conditional branch, jumping to a target when the test does not hold (or when it
+    does) and falling through otherwise.
+
+    Comparisons may be chained (a < b < c compares a with b, then b with c) and
+    combined with and, or and not, operands being evaluated left to right and only
+    until the outcome is known: no boolean is ever computed. A variable or a constant
+    alone holds when it is not 0. Each step is either (left, right, branch, target),
+    loading left into A, comparing it with right and branching to target, or the name
+    of a label placed there, where the branches skipping the rest of a sub-test land
+    (and_N, or_N)."""
+
+    def __init__(self, test: ast.expr, target: str, identify, when=False) -> None:
+        self.steps = list()
+        self.__identify = identify  # unique label numbers, shared with the visitor
+        self.__branch(test, target, when)
+
+    ####
+    ## Helper functions
+    ####
+
+    def __branch(self, test, target, when):
+        """Steps jumping to target when the test evaluates to when"""
+        if isinstance(test, ast.UnaryOp) and isinstance(test.op, ast.Not):
+            self.__branch(test.operand, target, not when)
+        elif isinstance(test, ast.BoolOp):
+            # and jumping when false, or jumping when true: the first operand deciding jumps
+            if isinstance(test.op, ast.And) != when:
+                for value in test.values:
+                    self.__branch(value, target, when)
+                return
+            # otherwise the first operand deciding skips the others
+            skip = f'{"and" if isinstance(test.op, ast.And) else "or"}_{self.__identify()}'
+            for value in test.values[:-1]:
+                self.__branch(value, skip, not when)
+            self.__branch(test.values[-1], target, when)
+            self.steps.append(skip)
+        elif isinstance(test, ast.Compare):
+            pairs = list(zip([test.left] + test.comparators, test.ops, test.comparators))
+            if not when:  # any comparison failing
+                for left, op, right in pairs:
+                    self.steps.append((left, right, BRANCH_UNLESS[type(op)], target))
+                return
+            skip = f'and_{self.__identify()}' if len(pairs) > 1 else None
+            for left, op, right in pairs[:-1]:
+                self.steps.append((left, right, BRANCH_UNLESS[type(op)], skip))
+            left, op, right = pairs[-1]
+            self.steps.append((left, right, BRANCH_IF[type(op)], target))
+            if skip is not None:
+                self.steps.append(skip)
+        elif isinstance(test, (ast.Name, ast.Constant)):
+            self.steps.append((test, ast.Constant(value=0), 'BRNE' if when else 'BREQ', target))
+        else:
+            raise ValueError(f'Unsupported condition: {ast.unparse(test)}')
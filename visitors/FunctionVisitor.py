@@ -1,23 +1,32 @@
 import ast
-from .LocalVariables import LocalVariableExtraction
-
-LabeledInstruction = tuple[str, str]
+from .SymbolTable import FunctionSymbols
+from generators.RuntimeLibrary import RuntimeLibrary, OPERATIONS
+from generators.Instruction import Instruction
+from .Switch import Switch
+from .Condition import Condition
 
 class FunctionVisitor(ast.NodeVisitor):
     """We supports assignments and input/print calls"""
 
-    def __init__(self, entry_point, local_vars: LocalVariableExtraction) -> None:
+    def __init__(self, entry_point, local_vars: FunctionSymbols, functions=None, label_ids=None,
+                 jump_tables=True) -> None:
         super().__init__()
+        self.symbols = local_vars
         self.local_vars = local_vars.results
-        self.stack_alloc = len(self.local_vars)*2
+        self.functions = functions if functions is not None else dict()
+        self.stack_alloc = local_vars.locals_size
         self.__instructions = list()
         self.__record_instruction('NOP1', label=entry_point)
         self.__should_save = True
         self.__current_variable = None
         self.__elem_id = 0
-        self.num_params = 0
-        self.params = []
-        self.retval = ''
+        self.__label_ids = label_ids  # shared with the other visitors, keeping labels unique
+        self.__jump_tables = jump_tables  # dense if/elif chains on one variable go through a table
+        self.__epilogue = None
+        self.__shift = 0  # bytes pushed on top of the frame by calls being prepared
+        self.__symbol_table = dict()
+        self.retval = local_vars.retval
+        self.runtime_calls = set()  # runtime library routines used by the function
 
     def finalize(self):
         #self.__instructions.append((None, '.END'))
@@ -28,34 +37,29 @@ class FunctionVisitor(ast.NodeVisitor):
     ####
 
     def visit_Assign(self, node):
+        if not isinstance(node.targets[0], ast.Name):
+            raise ValueError('Unsupported assignment target in a function')
         # remembering the name of the target
         self.__current_variable = node.targets[0].id
         # visiting the left part, now knowing where to store the result
         self.visit(node.value)
         if self.__should_save:
-            if self.__current_variable + 'L' in self.local_vars:
-                self.__record_instruction(f'STWA {self.__current_variable}L,s')
-            else:
-                self.__record_instruction(f'STWA {self.__current_variable},s')
+            self.__access_memory(node.targets[0], 'STWA')
         else:
             self.__should_save = True
         self.__current_variable = None
 
-
     def visit_Constant(self, node):
-        self.__record_instruction(f'LDWA {node.value},i')
-    
-    def visit_Name(self, node):
-        self.__record_instruction(f'LDWA {node.id},s')
+        self.__record_instruction('LDWA', node.value, 'i')
 
+    def visit_Name(self, node):
+        self.__access_memory(node, 'LDWA')
 
     def visit_BinOp(self, node):
-        if node.left.id+'N' in self.local_vars:
-            self.__access_memory(node.left, 'LDWA', name='N')
-        else:
-            self.__access_memory(node.left, 'LDWA')
-        if node.left.id in self.params:
-            self.__record_instruction(f'SUBSP {self.stack_alloc - (self.num_params*2)},i')
+        if type(node.op) in OPERATIONS:
+            self.__arithmetic(node)
+            return
+        self.__access_memory(node.left, 'LDWA')
         if isinstance(node.op, ast.Add):
             self.__access_memory(node.right, 'ADDA')
         elif isinstance(node.op, ast.Sub):
@@ -63,168 +67,254 @@ class FunctionVisitor(ast.NodeVisitor):
         else:
             raise ValueError(f'Unsupported binary operator: {node.op}')
 
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, ast.USub):
+            raise ValueError(f'Unsupported unary operator: {node.op}')
+        if isinstance(node.operand, ast.Constant):
+            self.__record_instruction('LDWA', -node.operand.value, 'i')
+            return
+        # expressions are flat: only variables are negated
+        if not isinstance(node.operand, ast.Name):
+            raise ValueError(f'Unsupported operand of unary minus: {ast.unparse(node.operand)}')
+        self.__access_memory(node.operand, 'LDWA')
+        self.__record_instruction('NEGA')
+
     def visit_Call(self, node):
         match node.func.id:
-            case 'int': 
+            case 'int':
                 # Let's visit whatever is casted into an int
                 self.visit(node.args[0])
             case 'input':
                 # We are only supporting integers for now
-                self.__record_instruction(f'DECI {self.__current_variable},s')
+                self.__access_memory(ast.Name(id=self.__current_variable), 'DECI')
                 self.__should_save = False # DECI already save the value in memory
             case 'print':
                 # We are only supporting integers for now
-                self.__record_instruction(f'DECO {node.args[0].id},s')
+                self.__access_memory(node.args[0], 'DECO')
             case _:
-                self.__record_instruction(f'CALL {node.func.id}')
-                #raise ValueError(f'Unsupported function call: { node.func.id}')
+                if node.func.id not in self.functions:
+                    raise ValueError(f'Unsupported function call: {node.func.id}')
+                if self.functions[node.func.id].registers:
+                    self.__register_call(node)
+                    return
+                # room for the return value and the arguments, our own frame moves
+                # down while they are computed (they may call functions too)
+                returns = self.functions[node.func.id].returns
+                size = 2 * len(node.args) + (2 if returns else 0)
+                self.__record_instruction('SUBSP', size, 'i')
+                self.__shift += size
+                for i, arg in enumerate(node.args):
+                    self.visit(arg)
+                    self.__record_instruction('STWA', 2 * (len(node.args) - 1 - i), 's')
+                self.__shift -= size
+                self.__record_instruction('CALL', node.func.id)
+                if returns:
+                    self.__record_instruction('LDWA', size - 2, 's')
+                self.__record_instruction('ADDSP', size, 'i')
 
     ####
-    ## Handling While loops (only variable OP variable)
+    ## Handling While loops (comparisons of variables and constants)
     ####
 
 
     def visit_While(self, node):
         loop_id = self.__identify()
         loop_name = loop_id
-        inverted = {
-            ast.Lt: 'BRGE',  # '<'  in the code means we branch if '>=' 
-            ast.LtE: 'BRGT',  # '<=' in the code means we branch if '>' 
-            ast.Gt: 'BRLE',  # '>'  in the code means we branch if '<='
-            ast.GtE: 'BRLT',  # '>=' in the code means we branch if '<'
-            ast.NotEq: 'BREQ', # '=' in the code means we branch if '!='
-            ast.Eq: 'BRNE' # '!=' in the code means we branch if '=='
-        }
-        # left part can only be a variable
-        self.__access_memory(node.test.left, 'LDWA', label=f'test_{loop_name}')
-        # right part can only be a variable
-        self.__access_memory(node.test.comparators[0], 'CPWA')
-        # Branching is condition is not true (thus, inverted)
-        self.__record_instruction(f'{inverted[type(node.test.ops[0])]} end_l_{loop_name}')
+        # Branching out of the loop when the condition is not true
+        self.__condition(node.test, f'end_l_{loop_name}', f'test_{loop_name}')
         # Visiting the body of the loop
         for contents in node.body:
             self.visit(contents)
-        self.__record_instruction(f'BR test_{loop_name}')
+        self.__record_instruction('BR', f'test_{loop_name}')
         # Sentinel marker for the end of the loop
-        self.__record_instruction(f'NOP1', label=f'end_l_{loop_name}')
-    
+        self.__record_instruction('NOP1', label=f'end_l_{loop_name}')
+
 
     def visit_If(self,node):
+        switch = Switch(node)
+        if self.__jump_tables and switch.dense():
+            self.__jump_table(switch)
+            return
         cond_id = self.__identify()
-        inverted = {
-            ast.Lt:  'BRGE', # '<'  in the code means we branch if '>=' 
-            ast.LtE: 'BRGT', # '<=' in the code means we branch if '>' 
-            ast.Gt:  'BRLE', # '>'  in the code means we branch if '<='
-            ast.GtE: 'BRLT', # '>=' in the code means we branch if '<'
-            ast.NotEq: 'BREQ', # '=' in the code means we branch if '!='
-            ast.Eq: 'BRNE' # '!=' in the code means we branch if '=='
-        }
-        # left part can only be a variable
-        self.__access_memory(node.test.left, 'LDWA', label = f'if_{cond_id}')
-        # right part can only be a variable
-        self.__access_memory(node.test.comparators[0], 'CPWA')
-        # Branching is condition is not true (thus, inverted)
-    
-        # Visiting the body of the loop
-        
-        if node.orelse:
-            if isinstance(node.orelse[0], ast.If):
-                self.__record_instruction(f'{inverted[type(node.test.ops[0])]} elif_{cond_id}')
-            else: 
-                self.__record_instruction(f'{inverted[type(node.test.ops[0])]} else_{cond_id}')
-
+        # Branching when the condition is not true
+        self.__condition(node.test, f'else_{cond_id}' if node.orelse else f'aft_{cond_id}', f'if_{cond_id}')
+        # Visiting the body of the condition
         for contents in node.body:
             self.visit(contents)
-        self.__record_instruction(f'BR aft_{cond_id}')
-
-        while node.orelse and len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If):
-            self.__record_instruction(f'NOP1', label = f'elif_{cond_id}')
-            
-            #self.__access_memory(node.test.left, 'LDWA', label = f'/elif_{cond_id}')
-        # right part can only be a variable
-            self.__access_memory(node.test.comparators[0], 'CPWA')
-            self.__record_instruction(f'{inverted[type(node.test.ops[0])]} else_{cond_id}')
-            node = node.orelse[0]
-            self.visit(node.test)
-            for content in node.body:
-                self.visit(content)
-            self.__record_instruction(f'BR aft_{cond_id}')
-            
         if node.orelse:
-            self.__record_instruction(f'NOP1', label = f'else_{cond_id}')
+            self.__record_instruction('BR', f'aft_{cond_id}')
+            # an elif is an If nested in the else part, with its own labels
+            self.__record_instruction('NOP1', label=f'else_{cond_id}')
             for contents in node.orelse:
                 self.visit(contents)
-            self.__record_instruction(f'BR aft_{cond_id}')
-        
-        self.__record_instruction(f'BR aft_{cond_id}')
-        self.__record_instruction(f'NOP1', label = f'aft_{cond_id}')
-
+        self.__record_instruction('NOP1', label=f'aft_{cond_id}')
 
     ####
-    ## Not handling function calls 
+    ## Handling the function itself
     ####
 
     def visit_FunctionDef(self, node):
-        
-        # if function is not a void, allocating space on the stack for return value
-        for s in node.body:
-            if isinstance(s, ast.Return):
-                self.stack_alloc -= 2
-                if len(node.name) > 4:
-                    self.retval = node.name[-4:]+'Ret'
-                else:
-                    self.retval = node.name+'Ret'
-             
-        
-        # finding number of params in function
-        if node.args.args:
-            self.num_params = len(node.args.args)
-            for i in range(len(node.args.args)):
-                self.params.append(node.args.args[i].arg)
-        else:
-            self.__record_instruction(f'SUBSP {self.stack_alloc - (self.num_params*2)},i')
-        
+        # allocating the local variables, parameters and return value are pushed by the caller
+        self.__epilogue = f'ret_{self.__identify()}'
+        self.__record_instruction('SUBSP', self.stack_alloc, 'i')
+        if self.symbols.registers:  # parameters arrive in A and X
+            for param, register in zip(self.symbols.params, 'AX'):
+                self.__record_instruction(f'STW{register}', self.symbols.slot(param), 's')
+        memo_id = self.__identify() if self.symbols.memo else None
+        if memo_id is not None:  # a result already computed is returned right away
+            self.__memo_entry(f'calc_{memo_id}')
+            self.__record_instruction('LDWA', self.symbols.memo, 'x')
+            self.__record_instruction('BREQ', f'calc_{memo_id}')
+            if not self.symbols.registers:
+                self.__record_instruction('STWA', self.retval, 's')
+            self.__record_instruction('BR', f'memo_{memo_id}')
+            self.__record_instruction('NOP1', label=f'calc_{memo_id}')
         for contents in node.body:
             self.visit(contents)
-        self.__record_instruction(f'ADDSP {self.stack_alloc - (self.num_params*2)},i')
-        self.__record_instruction(f'RET')
-        
+        self.__record_instruction('NOP1', label=self.__epilogue)
+        if memo_id is not None:  # keeping the result for the next calls
+            if not self.symbols.registers:
+                self.__record_instruction('LDWA', self.retval, 's')
+            self.__memo_entry(f'memo_{memo_id}')
+            self.__record_instruction('STWA', self.symbols.memo, 'x')
+            self.__record_instruction('NOP1', label=f'memo_{memo_id}')
+        self.__record_instruction('ADDSP', self.stack_alloc, 'i')
+        self.__record_instruction('RET')
+
     def visit_Return(self, node):
-        pass
-        self.__record_instruction(f'STWA {self.retval},s')
-        self.__record_instruction(f'LDWA {self.retval},s')
+        if node.value is not None:
+            self.visit(node.value)
+            if not self.symbols.registers:  # otherwise the value is returned in A
+                self.__record_instruction('STWA', self.retval, 's')
+        self.__record_instruction('BR', self.__epilogue)
 
 
 
     ####
-    ## Helper functions to 
+    ## Helper functions to
     ####
 
-    def __record_instruction(self, instruction, label = None):
-        self.__instructions.append((label, instruction))
-
-    def __access_memory(self, node, instruction, label = None, name = None):
-        if name != None:
-            if isinstance(node, ast.Constant):
-                self.__record_instruction(f'{instruction} {node.value}N,i', label)
-            # if node is a constant with a name (.EQUATE) keyword 
-            elif node.id[0] == '_': 
-                self.__record_instruction(f'{instruction} {node.id}N,i', label)
-            else:
-                self.__record_instruction(f'{instruction} {node.id}N,s', label)
+    def __record_instruction(self, mnemonic, operand=None, mode=None, label=None):
+        self.__instructions.append(Instruction(mnemonic, operand, mode, label))
 
-        
+    def __access_memory(self, node, instruction, label = None):
+        if isinstance(node, ast.Constant):
+            self.__record_instruction(instruction, node.value, 'i', label)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) \
+                and isinstance(node.operand, ast.Constant):  # negative constant, unless folded
+            self.__record_instruction(instruction, -node.operand.value, 'i', label)
+        # if node is a constant with a name (.EQUATE) keyword
+        elif node.id[0] == '_':
+            self.__record_instruction(instruction, node.id, 'i', label)
+        # parameters and local variables live in the stack frame, anything else is global
+        elif self.symbols.slot(node.id) in self.local_vars:
+            slot = self.symbols.slot(node.id)
+            if self.__shift:  # a call is being prepared
+                slot = self.local_vars[slot] + self.__shift
+            self.__record_instruction(instruction, slot, 's', label)
         else:
-            if isinstance(node, ast.Constant):
-                self.__record_instruction(f'{instruction} {node.value},i', label)
-            # if node is a constant with a name (.EQUATE) keyword 
-            elif node.id[0] == '_': 
-                self.__record_instruction(f'{instruction} {node.id},i', label)
-            else:
-                self.__record_instruction(f'{instruction} {node.id},s', label)
+            self.__record_instruction(instruction, self.__get_name(node.id), 'd', label)
+
+    def __register_call(self, node):
+        # first argument in A, second one in X (loaded last: computing the first one may
+        # use X), the result comes back in A
+        if len(node.args) == 2 and not isinstance(node.args[1], (ast.Name, ast.Constant)):
+            # the second argument waits on the stack while the first one is computed
+            self.visit(node.args[1])
+            self.__record_instruction('SUBSP', 2, 'i')
+            self.__shift += 2
+            self.__record_instruction('STWA', 0, 's')
+            self.visit(node.args[0])
+            self.__record_instruction('LDWX', 0, 's')
+            self.__shift -= 2
+            self.__record_instruction('ADDSP', 2, 'i')
+        elif node.args:
+            self.visit(node.args[0])
+            if len(node.args) == 2:
+                self.__access_memory(node.args[1], 'LDWX')
+        self.__record_instruction('CALL', node.func.id)
+
+    def __memo_entry(self, outside):
+        # X gets the offset of the argument in the table, branching away when it is not
+        # in it (negative arguments compare as large unsigned values and set C too)
+        self.__record_instruction('LDWX', self.symbols.slot(self.symbols.params[0]), 's')
+        self.__record_instruction('CPWX', self.symbols.memo_size, 'i')
+        self.__record_instruction('BRC', outside)
+        self.__record_instruction('ASLX')
+
+    def __condition(self, test, target, label):
+        # compares and short-circuit branches to target when the test does not hold,
+        # the first instruction getting the label
+        for step in Condition(test, target, self.__identify).steps:
+            if isinstance(step, str):
+                self.__record_instruction('NOP1', label=step)
+                continue
+            left, right, branch, destination = step
+            self.__access_memory(left, 'LDWA', label=label)
+            self.__access_memory(right, 'CPWA')
+            self.__record_instruction(branch, destination)
+            label = None
+
+    def __jump_table(self, switch):
+        table_id = self.__identify()
+        default = f'else_{table_id}' if switch.default else f'aft_{table_id}'
+        labels = {value: f'case_{self.__identify()}' for value in switch.cases}
+        # X holds the offset of the case in the table, the unsigned compare sending any
+        # value out of its range (those below it wrap around) to the default
+        self.__access_memory(switch.variable, 'LDWX', label=f'if_{table_id}')
+        if switch.low:
+            self.__record_instruction('SUBX', switch.low, 'i')
+        self.__record_instruction('CPWX', switch.high - switch.low + 1, 'i')
+        self.__record_instruction('BRC', default)
+        self.__record_instruction('ASLX')
+        self.__record_instruction('BR', f'jt_{table_id}', 'x')
+        for value in range(switch.low, switch.high + 1):
+            self.__record_instruction('.ADDRSS', labels.get(value, default),
+                                      label=f'jt_{table_id}' if value == switch.low else None)
+        for value, body in switch.cases.items():
+            self.__record_instruction('NOP1', label=labels[value])
+            for contents in body:
+                self.visit(contents)
+            self.__record_instruction('BR', f'aft_{table_id}')
+        if switch.default:
+            self.__record_instruction('NOP1', label=default)
+            for contents in switch.default:
+                self.visit(contents)
+        self.__record_instruction('NOP1', label=f'aft_{table_id}')
+
+    def __arithmetic(self, node):
+        # multiplication, floor division and modulo: shifts for suitable constants,
+        # runtime library call (A op X) otherwise
+        left, right = node.left, node.right
+        if isinstance(node.op, ast.Mult) and isinstance(left, ast.Constant):
+            left, right = right, left
+        if isinstance(right, ast.Constant):
+            sequence = RuntimeLibrary.strength_reduce(node.op, right.value)
+            if sequence is not None:
+                self.__access_memory(left, 'LDWA')
+                for instruction in sequence:
+                    if instruction.mnemonic == 'ADDA' and instruction.operand is None:
+                        self.__access_memory(left, 'ADDA')
+                    else:
+                        self.__instructions.append(instruction)
+                return
+        routine = OPERATIONS[type(node.op)]
+        self.runtime_calls.add(routine)
+        self.__access_memory(left, 'LDWA')
+        self.__access_memory(right, 'LDWX')
+        self.__record_instruction('CALL', routine)
 
     def __identify(self):
+        if self.__label_ids is not None:
+            return next(self.__label_ids)
         result = self.__elem_id
         self.__elem_id = self.__elem_id + 1
         return result
 
+    def __get_name(self, name):  # records and returns 8 character name of a global variable
+        if name not in self.__symbol_table.keys():
+            if len(name) > 8:  # rename if len > 8
+                self.__symbol_table[name] = name[0: 4] + name[-4:]
+            else:
+                self.__symbol_table[name] = name
+        return self.__symbol_table[name]
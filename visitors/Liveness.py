@@ -0,0 +1,64 @@
+import ast
+
+
+class Liveness():
+    """Which variables of a function body hold a value still to be read at the same
+    time: two variables interfere when one is assigned while the other is live, and
+    only variables that do not interfere may share a stack slot.
+
+    The body is walked backwards once per statement (loops until nothing changes),
+    a return leaving live only what the epilogue reads."""
+
+    def __init__(self, node: ast.FunctionDef, entering=(), leaving=()) -> None:
+        self.interference = dict()  # variable -> variables live when it is assigned, and conversely
+        self.__leaving = set(leaving)  # read after the body, by every return
+        live = self.__block(node.body, set(self.__leaving))
+        for name in entering:  # set before the body runs (parameters passed in registers)
+            self.__define(name, live | set(entering))
+
+    def interferes(self, name, other):
+        return other in self.interference.get(name, ())
+
+    ####
+    ## Helper functions
+    ####
+
+    def __block(self, statements, live):
+        """Variables live before the statements, knowing those live after them"""
+        for s in reversed(statements):
+            live = self.__statement(s, live)
+        return live
+
+    def __statement(self, s, live):
+        if isinstance(s, ast.Return):
+            return set(self.__leaving) | self.__uses(s.value)
+        if isinstance(s, ast.Assign):
+            target = s.targets[0]
+            if isinstance(target, ast.Name):
+                self.__define(target.id, live)
+                return (live - {target.id}) | self.__uses(s.value)
+            return live | self.__uses(s.value) | self.__uses(target)
+        if isinstance(s, ast.If):
+            return self.__block(s.body, live) | self.__block(s.orelse, live) | self.__uses(s.test)
+        if isinstance(s, ast.While):
+            # live at the test: read by the test, after the loop, or by the body
+            test = live | self.__uses(s.test)
+            while True:
+                entering = self.__block(s.body, test) | test
+                if entering == test:
+                    return test
+                test = entering
+        return live | self.__uses(s)
+
+    def __define(self, name, live):
+        for other in live:
+            if other != name:
+                self.interference.setdefault(name, set()).add(other)
+                self.interference.setdefault(other, set()).add(name)
+
+    @staticmethod
+    def __uses(node):
+        if node is None:
+            return set()
+        called = {id(n.func) for n in ast.walk(node) if isinstance(n, ast.Call)}
+        return {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and id(n) not in called}
@@ -0,0 +1,143 @@
+import ast
+import itertools
+
+
+class RangeLoops(ast.NodeTransformer):
+    """Lowers the for loops over a range (for i in range(start, stop, step)) into
+    counting while loops, before any other pass: they are then compiled and optimized
+    like any other loop (the test moving to the bottom of the loop, the counter kept in
+    the index register, and so on).
+
+        i = start
+        while i < stop:  (i > stop when the step is negative)
+            body
+            i = i + step
+
+    The step must be a non-zero constant, so that the direction of the loop is known.
+    The stop value is evaluated once: a constant stays an immediate operand, and so does
+    a variable the loop never assigns, anything else goes to a fresh variable first.
+    The loop counts with a fresh variable, i being assigned from it at the top of every
+    iteration, when the body assigns i (the next iteration must not see it) or when i
+    may be read after the loop (it then holds the last value of the range): anywhere
+    but in the body of a for loop over i."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.lowered = 0
+        self.hidden = 0  # loops counting with a fresh variable
+        self.__names = set()  # every name of the program, as written and truncated
+        self.__ids = itertools.count()
+        self.__loose = set()  # names read where a for loop over them may have ended, in the current scope
+
+    def visit_Module(self, node):
+        for n in ast.walk(node):
+            for name in (getattr(n, 'id', None), getattr(n, 'arg', None), getattr(n, 'name', None)):
+                if isinstance(name, str):
+                    self.__names |= {name, name[0:4] + name[-4:]}
+        for s in node.body:
+            if isinstance(s, ast.FunctionDef):
+                self.__loose = self.__loose_reads(s)
+                s.body = self.__block(s.body)
+        self.__loose = self.__loose_reads(node)  # functions may read global variables
+        node.body = self.__block(node.body)
+        return ast.fix_missing_locations(node)
+
+    ####
+    ## Helper functions
+    ####
+
+    def __block(self, statements):
+        result = list()
+        for s in statements:
+            if isinstance(s, ast.For):
+                result += self.__lower(s)
+                continue
+            if isinstance(s, (ast.If, ast.While)):
+                s.body, s.orelse = self.__block(s.body), self.__block(s.orelse)
+            result.append(s)
+        return result
+
+    def __lower(self, loop):
+        """Statements replacing the loop"""
+        call = loop.iter
+        if not isinstance(loop.target, ast.Name) or not isinstance(call, ast.Call) \
+                or not isinstance(call.func, ast.Name) or call.func.id != 'range' \
+                or call.keywords or not 1 <= len(call.args) <= 3:
+            raise ValueError(f'Unsupported for loop: {ast.unparse(loop.target)} in {ast.unparse(call)}')
+        args = [self.__value(arg) for arg in call.args]
+        if len(args) == 1:
+            args = [ast.Constant(value=0)] + args
+        start, stop, step = args if len(args) == 3 else args + [ast.Constant(value=1)]
+        if not isinstance(step, ast.Constant) or type(step.value) is not int:
+            raise ValueError(f'Unsupported range step: {ast.unparse(step)} (must be a constant)')
+        if step.value == 0:
+            raise ValueError('range() step must not be zero')
+        body = self.__block(loop.body)
+        name = loop.target.id
+        assigned = self.__assigned(body)
+        statements = list()
+        if not isinstance(stop, ast.Constant) and not (isinstance(stop, ast.Name) and stop.id not in assigned | {name}):
+            if any(isinstance(n, ast.Call) for n in ast.walk(start)):  # start is evaluated first
+                first = self.__fresh('start')
+                statements.append(self.__assign(first, start))
+                start = self.__load(first)
+            bound = self.__fresh('stop')
+            statements.append(self.__assign(bound, stop))
+            stop = self.__load(bound)
+        counter = name
+        if name in assigned or name in self.__loose:
+            counter = self.__fresh(name)
+            body = [self.__assign(name, self.__load(counter))] + body
+            self.hidden += 1
+        statements.append(self.__assign(counter, start))
+        step_op = ast.Add() if step.value > 0 else ast.Sub()
+        body.append(self.__assign(counter, ast.BinOp(left=self.__load(counter), op=step_op,
+                                                     right=ast.Constant(value=abs(step.value)))))
+        test = ast.Compare(left=self.__load(counter), ops=[ast.Lt() if step.value > 0 else ast.Gt()], comparators=[stop])
+        statements.append(ast.While(test=test, body=body, orelse=[]))
+        self.lowered += 1
+        return [ast.copy_location(s, loop) for s in statements] + self.__block(loop.orelse)
+
+    @staticmethod
+    def __value(node):
+        """Negative constants (-c) as constants, other arguments as they are"""
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) \
+                and isinstance(node.operand, ast.Constant) and type(node.operand.value) is int:
+            return ast.Constant(value=-node.operand.value)
+        return node
+
+    @staticmethod
+    def __loose_reads(scope):
+        """Names read outside of the body of the for loops over them (which assign them
+        first), and those of for loops nested in another one over the same name"""
+        covered = set()  # (read, name)
+        loose = set()
+        for n in ast.walk(scope):
+            if isinstance(n, ast.For) and isinstance(n.target, ast.Name):
+                inner = {id(m) for s in n.body for m in ast.walk(s)}
+                covered |= {(m, n.target.id) for m in inner}
+                if any(isinstance(m, ast.For) and isinstance(m.target, ast.Name) and m.target.id == n.target.id
+                       for s in n.body for m in ast.walk(s)):
+                    loose.add(n.target.id)
+        return loose | {n.id for n in ast.walk(scope) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)
+                        and (id(n), n.id) not in covered}
+
+    @staticmethod
+    def __assigned(statements):
+        return {n.id for s in statements for n in ast.walk(s) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+
+    @staticmethod
+    def __assign(name, value):
+        return ast.Assign(targets=[ast.Name(id=name, ctx=ast.Store())], value=value)
+
+    @staticmethod
+    def __load(name):
+        return ast.Name(id=name, ctx=ast.Load())
+
+    def __fresh(self, name):
+        while True:
+            tag = f'_r{next(self.__ids)}'
+            candidate = name[:8 - len(tag)] + tag
+            if candidate not in self.__names:
+                self.__names.add(candidate)
+                return candidate
@@ -0,0 +1,61 @@
+import ast
+
+# smallest chain worth a table: the range check and the jump cost about as much as
+# three compares
+MIN_CASES = 4
+# at most this many table entries per case, the others going to the default
+SPREAD = 2
+
+
+class Switch():
+    """An if/elif chain comparing one variable for equality with integer constants
+    (x == 0, elif x == 1, ...), the first test not doing so (and the else part) making
+    up the default.
+
+    Dense chains are compiled into a table of addresses indexed by the variable (BR
+    table,x), behind a range check sending any other value to the default, so that
+    every case is reached in the same number of instructions."""
+
+    def __init__(self, node: ast.If) -> None:
+        self.variable = None  # the Name tested
+        self.cases = dict()  # constant -> body of the first branch testing it, in order
+        self.default = list()  # statements run when no constant matches
+        while True:
+            value = self.__case(node.test)
+            if value is None:
+                self.default = [node]
+                break
+            if value not in self.cases:  # later branches with the same constant never run
+                self.cases[value] = node.body
+            if len(node.orelse) != 1 or not isinstance(node.orelse[0], ast.If):
+                self.default = node.orelse
+                break
+            node = node.orelse[0]
+
+    @property
+    def low(self):
+        return min(self.cases)
+
+    @property
+    def high(self):
+        return max(self.cases)
+
+    def dense(self):
+        return len(self.cases) >= MIN_CASES and self.high - self.low + 1 <= SPREAD * len(self.cases)
+
+    ####
+    ## Helper functions
+    ####
+
+    def __case(self, test):
+        """Constant the test compares the variable with, None when it does not"""
+        if not isinstance(test, ast.Compare) or len(test.ops) != 1 or not isinstance(test.ops[0], ast.Eq):
+            return None
+        for name, constant in ((test.left, test.comparators[0]), (test.comparators[0], test.left)):
+            if isinstance(name, ast.Name) and isinstance(constant, ast.Constant) \
+                    and type(constant.value) is int and name.id[-1] != '_':
+                if self.variable is None:
+                    self.variable = name
+                if name.id == self.variable.id:
+                    return constant.value
+        return None
@@ -0,0 +1,275 @@
+import ast
+from .Liveness import Liveness
+
+
+class FunctionSymbols():
+    """Names a function uses: its parameters, its local variables and its return slot.
+
+    `results` maps every stack slot name to its offset from the stack pointer once the
+    function has allocated its locals. The frame, from the top of the stack, holds the
+    local variables (renamed xxxL when they shadow a global variable), the return
+    address, the parameters (xxxN, pushed in order by the caller) and the return value
+    slot (xxxxRet).
+
+    Functions using registers receive their (up to two) parameters in A and X, store
+    them with their local variables, and return their value in A.
+
+    Local variables whose values are never needed at the same time (see Liveness) share
+    a slot, the first free one in the order they are assigned.
+
+    Memoized functions keep their results in a global table (memo, an array) indexed by
+    their argument, 0 meaning not computed yet."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.params = list()
+        self.returns = False
+        self.assigned = list()  # local variables, before renaming
+        self.results = dict()  # stack slot name -> offset
+        self.locals_size = 0  # bytes allocated by the function itself
+        self.retval = None
+        self.global_vars = dict()
+        self.renamed = dict()  # slot name -> name of its equate, when it had to change
+        self.calls = set()  # names called by the function, only known when it may use registers
+        self.registers = False  # parameters in A and X, result in A
+        self.pure = False  # one parameter never assigned, only locals read, several calls to itself
+        self.memo = None  # global table of the results, when memoized
+        self.memo_size = 0  # number of arguments (from 0) the table covers
+        self.liveness = None  # variables needed at the same time, None when no slot is shared
+
+    def resolve(self, global_vars):
+        self.global_vars = global_vars
+        local_slots = list()
+        for name in self.assigned:
+            slot = self.slot(name)
+            if name not in self.params and slot not in local_slots:
+                local_slots.append(slot)
+        if self.registers:
+            local_slots += [param+'N' for param in self.params]
+        for slot, offset in self.__offsets(local_slots).items():
+            self.results[slot] = offset
+        offset = self.locals_size = 2 * len(set(self.results.values()))
+        if self.registers:
+            return
+        offset += 2  # return address
+        for param in reversed(self.params):
+            self.results[param+'N'] = offset
+            offset += 2
+        if self.returns:
+            self.retval = self.name[-4:]+'Ret' if len(self.name) > 4 else self.name+'Ret'
+            self.results[self.retval] = offset
+
+    def __offsets(self, local_slots):
+        if self.liveness is None:
+            return {slot: 2 * i for i, slot in enumerate(local_slots)}
+        variables = dict()  # slot -> variables it holds
+        for name in self.assigned + self.params:
+            variables.setdefault(self.slot(name), set()).add(name)
+        offsets = dict()
+        for slot in local_slots:
+            taken = {offset for other, offset in offsets.items()
+                     if any(self.liveness.interferes(name, o) for name in variables.get(slot, ()) for o in variables[other])}
+            offset = 0
+            while offset in taken:
+                offset += 2
+            offsets[slot] = offset
+        return offsets
+
+    def slot(self, name):
+        """Stack slot holding a variable of the function"""
+        if name in self.params:
+            slot = name+'N'
+        # avoiding duplicates between global and local variables
+        elif name in self.global_vars:
+            slot = name[-7:]+'L' if len(name) > 7 else name+'L'
+        else:
+            slot = name
+        return self.renamed.get(slot, slot)
+
+    def make_unique(self, used: set, suffixes: dict):
+        """Equates are global to the whole program: slots whose name is already used
+        (by a global or another function) get a numbered name, suffixes holding the next
+        number to try for every name"""
+        results = dict()
+        for slot, offset in self.results.items():
+            unique, n = slot, suffixes.get(slot, 1)
+            while unique in used:
+                unique, n = f'{slot}{n}', n + 1
+            suffixes[slot] = n
+            if unique != slot:
+                self.renamed[slot] = unique
+            used.add(unique)
+            results[unique] = offset
+        self.results = results
+        self.retval = self.renamed.get(self.retval, self.retval)
+
+
+class SymbolTable(ast.NodeVisitor):
+    """
+        Collects, in a single walk of the tree, the global variables (with their initial
+        value or array size) and the symbols of every function definition.
+
+        Arrays are initialized with a list of constants ([1, 2, 3]) or a repeated one
+        ([v] * n), their contents going to the data section.
+
+        Arrays only ever storing (and initialized with) constants from 0 to 255, and only
+        read whole (as the left side of a test or the value of an assignment), are packed
+        one element per byte, or per bit when they only store 0 and 1 and bit_arrays is set.
+    """
+
+    def __init__(self, register_calls=False, memoize=0, share_slots=False, bit_arrays=False) -> None:
+        super().__init__()
+        self.register_calls = register_calls  # small leaf functions get their parameters in registers
+        self.memoize = memoize  # entries of the result tables of pure recursive functions, 0 for none
+        self.share_slots = share_slots  # local variables with disjoint lifetimes share stack slots
+        self.bit_arrays = bit_arrays  # 0/1 arrays are packed 8 elements per byte
+        self.array_modes = dict()  # array name -> 'byte' or 'bit', arrays of words are not listed
+        self.array_values = dict()  # array name -> initial elements, arrays of zeros are not listed
+        self.results = dict()  # global variables, as GlobalVariableExtraction
+        self.functions = dict()  # function name -> FunctionSymbols, in definition order
+        self.__function = None  # function being visited, None at the top level
+        self.__nested = False  # in a loop: the statement may run more than once
+
+    def visit_Module(self, node):
+        self.__statements(node.body)
+        self.__pack_arrays(node)
+        # local names can only be told apart from globals once all of them are known
+        for symbols in self.functions.values():
+            if symbols.pure and self.memoize:
+                symbols.memo = self.__table(symbols.name)
+                symbols.memo_size = self.memoize
+                self.results[symbols.memo] = self.memoize
+        used, suffixes = set(self.functions), dict()
+        for name in self.results:
+            used |= {name, name[0:4] + name[-4:] if len(name) > 8 else name}
+        for symbols in self.functions.values():
+            # a leaf function does not need its parameters to survive a call
+            symbols.registers = self.register_calls and len(symbols.params) <= 2 \
+                and not symbols.calls & self.functions.keys()
+            symbols.resolve(self.results)
+            symbols.make_unique(used, suffixes)
+
+    def visit_Assign(self, node):
+        if len(node.targets) != 1:
+            raise ValueError("Only unary assignments are supported")
+        target = node.targets[0]
+        if not isinstance(target, ast.Name):  # skip array access nodes
+            return
+        if self.__function is not None:
+            self.__function.assigned.append(target.id)
+        elif target.id not in self.results:
+            if target.id[-1] == '_' and isinstance(node.value, (ast.BinOp, ast.List)):  # array: store its size
+                values = self.__elements(target.id, node.value)
+                self.results[target.id] = len(values)
+                if any(values):
+                    if self.__nested:
+                        raise ValueError(f'Array {target.id} can only be initialized outside of loops')
+                    self.array_values[target.id] = values
+            elif isinstance(node.value, ast.Constant) and not self.__nested:  # constant or variable with a value
+                self.results[target.id] = node.value.value
+                node.value.name = target.id  # code generators skip the first store of a .WORD
+            else:
+                self.results[target.id] = None
+
+    def visit_FunctionDef(self, node):
+        if self.__function is not None:  # nested definitions are not supported
+            return
+        self.__function = FunctionSymbols(node.name)
+        self.functions[node.name] = self.__function
+        self.__function.params = [arg.arg for arg in node.args.args]
+        if self.register_calls and len(self.__function.params) <= 2:
+            self.__function.calls = {n.func.id for n in ast.walk(node)
+                                     if isinstance(n, ast.Call) and isinstance(n.func, ast.Name)}
+        self.__statements(node.body)
+        if self.memoize:
+            self.__function.pure = self.__pure(node)
+        if self.share_slots:  # parameters passed in registers are stored on entry
+            self.__function.liveness = Liveness(node, entering=self.__function.params)
+        self.__function = None
+
+    def visit_Return(self, node):
+        if self.__function is not None and node.value is not None:
+            self.__function.returns = True
+
+    def __statements(self, statements):
+        # only statements declare names: expressions are never walked
+        for s in statements:
+            if isinstance(s, (ast.Assign, ast.FunctionDef, ast.Return)):
+                self.visit(s)
+            else:
+                nested, self.__nested = self.__nested, self.__nested or isinstance(s, (ast.While, ast.For))
+                for field in ('body', 'orelse', 'finalbody'):
+                    self.__statements(getattr(s, field, ()))
+                self.__nested = nested
+
+    def __pure(self, node):
+        """The function always returns the same value for the same argument, and calls
+        itself more than once (a single call never meets the same argument twice)"""
+        symbols = self.__function
+        if len(symbols.params) != 1 or not symbols.returns or symbols.params[0] in symbols.assigned:
+            return False
+        known = set(symbols.params) | set(symbols.assigned) | {node.name}
+        recursive = 0
+        for n in ast.walk(node):
+            if isinstance(n, ast.Call):
+                if not isinstance(n.func, ast.Name) or n.func.id != node.name:
+                    return False  # input, print, or anything else than itself
+                recursive += 1
+            elif isinstance(n, (ast.Subscript, ast.Global, ast.Nonlocal)):
+                return False
+            elif isinstance(n, ast.Name) and n.id not in known and not (n.id[0] == '_' and n.id[1:].isupper()):
+                return False  # a global variable may change between calls
+        return recursive > 1
+
+    @staticmethod
+    def __elements(name, node):
+        """Initial elements of an array, from [c1, c2, ...] or [c] * n"""
+        def value(element):
+            if isinstance(element, ast.UnaryOp) and isinstance(element.op, ast.USub):
+                return -value(element.operand)
+            if isinstance(element, ast.Constant) and isinstance(element.value, int):
+                return int(element.value)
+            raise ValueError(f'Array {name} can only be initialized with integer constants')
+        if isinstance(node, ast.List):
+            return [value(element) for element in node.elts]
+        if not isinstance(node.op, ast.Mult) or not isinstance(node.left, ast.List) or len(node.left.elts) != 1 \
+                or not isinstance(node.right, ast.Constant) or not isinstance(node.right.value, int):
+            raise ValueError(f'Array {name} must be initialized as [value] * size or [value, ...]')
+        return [value(node.left.elts[0])] * node.right.value
+
+    def __pack_arrays(self, node):
+        arrays = {name for name, size in self.results.items() if name[-1] == '_' and isinstance(size, int)}
+        stored = {name: set(self.array_values.get(name, ())) for name in arrays}
+        for n in ast.walk(node):
+            if isinstance(n, ast.Assign) and isinstance(n.targets[0], ast.Subscript):
+                array = n.targets[0].value
+                if isinstance(array, ast.Name) and array.id in stored:
+                    value = n.value
+                    stored[array.id].add(value.value if isinstance(value, ast.Constant) else None)
+        loaded = set()  # subscripts read whole into A
+        for n in ast.walk(node):
+            if isinstance(n, ast.Compare):  # the first operand of a test, the others are compared
+                loaded.add(id(n.left))
+            elif isinstance(n, ast.Assign):
+                loaded |= {id(n.value), id(n.targets[0])}
+        for n in ast.walk(node):
+            if isinstance(n, ast.Subscript) and isinstance(n.value, ast.Name):
+                if id(n) not in loaded or not isinstance(n.slice, (ast.Name, ast.Constant)):
+                    stored.pop(n.value.id, None)
+        for name, values in stored.items():
+            if values <= {0, 1} and self.bit_arrays:
+                self.array_modes[name] = 'bit'
+            elif all(isinstance(v, int) and not isinstance(v, bool) and 0 <= v <= 255 for v in values):
+                self.array_modes[name] = 'byte'
+
+    def __table(self, name):
+        """Unused global array name for the results of a function"""
+        used = set(self.functions) | {g[0:4] + g[-4:] if len(g) > 8 else g for g in self.results}
+        table, n = name[:7] + '_', 1
+        while table in used:
+            table, n = f'{name[:6 - len(str(n))]}{n}_', n + 1
+        return table
+
+    def local_vars(self):
+        """Stack slot names of every function, in definition order"""
+        return [symbols.results for symbols in self.functions.values()]
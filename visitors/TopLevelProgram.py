@@ -1,13 +1,14 @@
 import ast
-from .LocalVariables import LocalVariableExtraction
-
-LabeledInstruction = tuple[str, str]
+from generators.RuntimeLibrary import RuntimeLibrary, OPERATIONS
+from generators.Instruction import Instruction
+from .Switch import Switch
+from .Condition import Condition
 
 
 class TopLevelProgram(ast.NodeVisitor):
     """We supports assignments and input/print calls"""
 
-    def __init__(self, entry_point) -> None:
+    def __init__(self, entry_point, label_ids=None, jump_tables=True) -> None:
         super().__init__()
         self.__instructions = list()
         self.__record_instruction('NOP1', label=entry_point)
@@ -19,14 +20,23 @@ class TopLevelProgram(ast.NodeVisitor):
         self.__is_index = set()
         # if the top level program contains a function, it is important for tl program to know the variables for push/pop operations
         self.local_vars = None
-        self.current_function = 0
-        self.returns = False
+        self.functions = dict()  # function name -> FunctionSymbols
+        self.array_modes = dict()  # array name -> 'byte' or 'bit' when packed
+        self.__label_ids = label_ids  # shared with the function visitors, keeping labels unique
+        self.__jump_tables = jump_tables  # dense if/elif chains on one variable go through a table
+        self.runtime_calls = set()  # runtime library routines used by the program
 
     def set_local_vars(self, local_vars):
         self.local_vars = local_vars
 
+    def set_functions(self, functions):
+        self.functions = functions
+
+    def set_array_modes(self, array_modes):
+        self.array_modes = array_modes
+
     def finalize(self):
-        self.__instructions.append((None, '.END'))
+        self.__record_instruction('.END')
         return self.__instructions
 
     ####
@@ -34,23 +44,37 @@ class TopLevelProgram(ast.NodeVisitor):
     ####
 
     def visit_Assign(self, node):
+        target = node.targets[0]
+        if isinstance(target, ast.Subscript) and target.value.id in self.array_modes:
+            self.__store_packed(target, node.value.value)  # packed arrays only store constants
+            return
         # remembering the name of the target
-        if isinstance(node.targets[0], ast.Subscript):
-            self.__current_variable = node.targets[0].value.id
-            self.visit(node.targets[0])
-        elif 'id' in node.targets[0].__dict__.keys():
-            self.__current_variable = node.targets[0].id
+        if isinstance(target, ast.Subscript):
+            self.__current_variable = target.value.id
+        elif 'id' in target.__dict__.keys():
+            self.__current_variable = target.id
+        # the value goes in A before the index of the element goes in X: reading an
+        # element, calls and runtime routines use X (DECI stores through it, though)
+        reads_input = any(isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id == 'input'
+                          for n in ast.walk(node.value))
+        if isinstance(target, ast.Subscript) and reads_input:
+            self.visit(target)
         # visiting the left part, now knowing where to store the result
-        self.visit(node.value)
+        if isinstance(node.value, ast.Subscript):  # reading an array element
+            self.__access_memory(node.value, 'LDWA')
+        else:
+            self.visit(node.value)
+        if isinstance(target, ast.Subscript) and not reads_input:
+            self.visit(target)
         node_value = node.value.__dict__
         name = self.__get_name(self.__current_variable)
         if self.__should_save:
             if name not in self.__first and self.is_array(name):  # skip first SWTX if array
                 self.__first[name] = False
             elif name in self.__first and self.is_array(name):  # STWA 'x' if array
-                self.__record_instruction(f'STWA {name},x')
+                self.__record_instruction('STWA', name, 'x')
             elif name in self.__is_index:  # STWX if index
-                self.__record_instruction(f'STWX {name},d')
+                self.__record_instruction('STWX', name, 'd')
             elif self.is_constant(node.targets[0].id):  # skip STWA if constant
                 pass
             # # handling when assign statement is a function call (i.e function returns a value that is stored in another variable)
@@ -63,11 +87,11 @@ class TopLevelProgram(ast.NodeVisitor):
             #     self.__record_instruction(f'ADDSP {len(self.local_vars[self.current_function])*2},i')
             #     self.current_function += 1
             elif 'value' not in node_value.keys():  # STWA if no known value
-                self.__record_instruction(f'STWA {name},d')
-            elif self.__first[node.targets[0].id]:  # skip STWA if first variable
+                self.__record_instruction('STWA', name, 'd')
+            elif self.__first.get(node.targets[0].id, False):  # skip STWA if first variable
                 self.__first[node.targets[0].id] = False
             else:  # STWA if not first variable
-                self.__record_instruction(f'STWA {name},d')
+                self.__record_instruction('STWA', name, 'd')
         else:
             self.__should_save = True
         self.__current_variable = None
@@ -75,11 +99,11 @@ class TopLevelProgram(ast.NodeVisitor):
     def visit_Constant(self, node):
         node_value = node.__dict__
         if 'name' not in node_value.keys():  # LDWA i when variable is modified
-            self.__record_instruction(f'LDWA {node.value},i')
+            self.__record_instruction('LDWA', node.value, 'i')
         elif self.is_constant(node_value['name']):  # skip LDWA if constant
             pass
         elif node_value['name'] in self.__first.keys():  # LDWA for known variable
-            self.__record_instruction(f'LDWA {node.value},i')
+            self.__record_instruction('LDWA', node.value, 'i')
         else:  # skip first LDWA for known variable and indicate to skip STWA
             self.__first[node_value['name']] = True
 
@@ -87,9 +111,11 @@ class TopLevelProgram(ast.NodeVisitor):
         node_value = node.__dict__
         name = self.__get_name(node.id)
         if name in self.__is_index:
-            self.__record_instruction(f'LDWX {name},d')
+            self.__record_instruction('LDWX', name, 'd')
         elif 'value' not in node_value.keys() and not self.is_constant(node.id):  # check not a Constant
-            self.__record_instruction(f'LDWA {name},d')
+            self.__record_instruction('LDWA', name, 'd')
+        elif 'value' not in node_value.keys():  # equate copied into a variable
+            self.__record_instruction('LDWA', name, 'i')
 
     def visit_Subscript(self, node):
         array_id = self.__identify()
@@ -98,21 +124,40 @@ class TopLevelProgram(ast.NodeVisitor):
         index = node.slice
         # add index to is_index
         self.__is_index.add(index)
-        self.__record_instruction(f'LDWX {index.id},d')
+        self.__access_memory(index, 'LDWX')
         self.__record_instruction('ASLX')
         self.__should_save = True
 
+    def visit_List(self, node):
+        # array initializers are in the data section
+        pass
+
     def visit_BinOp(self, node):
+        if isinstance(node.left, ast.List):  # skip Mult operation for array initialization
+            return
+        if type(node.op) in OPERATIONS:
+            self.__arithmetic(node)
+            return
         self.__access_memory(node.left, 'LDWA')
         if isinstance(node.op, ast.Add):
             self.__access_memory(node.right, 'ADDA')
         elif isinstance(node.op, ast.Sub):
             self.__access_memory(node.right, 'SUBA')
-        elif isinstance(node.op, ast.Mult):  # skip Mult operation for array initialization
-            pass
         else:
             raise ValueError(f'Unsupported binary operator: {node.op}')
 
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, ast.USub):
+            raise ValueError(f'Unsupported unary operator: {node.op}')
+        if isinstance(node.operand, ast.Constant):
+            self.__record_instruction('LDWA', -node.operand.value, 'i')
+            return
+        # expressions are flat: only variables and array elements are negated
+        if not isinstance(node.operand, (ast.Name, ast.Subscript)):
+            raise ValueError(f'Unsupported operand of unary minus: {ast.unparse(node.operand)}')
+        self.__access_memory(node.operand, 'LDWA')
+        self.__record_instruction('NEGA')
+
     def visit_Call(self, node):
         match node.func.id:
             case 'int':
@@ -122,72 +167,50 @@ class TopLevelProgram(ast.NodeVisitor):
                 # We are only supporting integers for now
                 current_variable = self.__get_name(self.__current_variable)
                 if self.is_array(current_variable):  # input to array
-                    self.__record_instruction(f'DECI {current_variable},x')
+                    self.__record_instruction('DECI', current_variable, 'x')
                 else:
-                    self.__record_instruction(f'DECI {current_variable},d')
+                    self.__record_instruction('DECI', current_variable, 'd')
                 self.__should_save = False  # DECI already save the value in memory
             case 'print':
                 if isinstance(node.args[0], ast.Subscript):  # print array[i]
-                    name = self.__get_name(node.args[0].value.id)
-                    index = node.args[0].slice.id
-                    self.__record_instruction(f'LDWX {index},d')
-                    self.__record_instruction('ASLX')
-                    self.__record_instruction(f'DECO {name},x')
+                    self.__access_element(node.args[0], 'DECO')
                 else:  # print integer
                     name = self.__get_name(node.args[0].id)
-                    self.__record_instruction(f'DECO {name},d')
+                    self.__record_instruction('DECO', name, 'd')
             case 'exit':
                 self.__record_instruction('STOP')
             case _:
-
-                if node.args:
-                    if self.returns:  # if function returns a value and has params is called
-                        self.__record_instruction(f'SUBSP {len(node.args) * 2 + 2},i')
-                        s = 2 * len(node.args)
-                        for i in range(len(node.args)):
-                            s -= 2
-                            self.__record_instruction(f'LDWA {node.args[i].id},d')
-                            self.__record_instruction(f'STWA {s},s')
-                        self.__record_instruction(f'CALL {node.func.id}')
-                        self.__record_instruction(f'ADDSP {len(node.args) * 2},i')
-                        self.__record_instruction(f'LDWA  0,s')
-
-                    else:  # if void function with params is called
-
-                        self.__record_instruction(f'SUBSP {len(node.args) * 2},i')
-                        s = 2 * len(node.args)
-                        for i in range(len(node.args)):
-                            s -= 2
-                            self.__record_instruction(f'LDWA {node.args[i].id},d')
-                            self.__record_instruction(f'STWA {s},s')
-                        self.__record_instruction(f'CALL {node.func.id}')
-                        self.__record_instruction(f'ADDSP {len(node.args) * 2},i')
-                else:  # if void function without params is called
-                    self.__record_instruction(f'CALL {node.func.id}')
-
-                # raise ValueError(f'Unsupported function call: {node.func.id}')
+                if node.func.id not in self.functions:
+                    raise ValueError(f'Unsupported function call: {node.func.id}')
+                if self.functions[node.func.id].registers:
+                    # first argument in A, second one in X, the result comes back in A
+                    for arg, register in zip(node.args, 'AX'):
+                        self.__access_memory(arg, f'LDW{register}')
+                    self.__record_instruction('CALL', node.func.id)
+                    return
+                # room for the return value, then the arguments in order (first one deepest)
+                returns = self.functions[node.func.id].returns
+                size = 2 * len(node.args) + (2 if returns else 0)
+                if size:
+                    self.__record_instruction('SUBSP', size, 'i')
+                for i in range(len(node.args)):
+                    self.__access_memory(node.args[i], 'LDWA')
+                    self.__record_instruction('STWA', 2 * (len(node.args) - 1 - i), 's')
+                self.__record_instruction('CALL', node.func.id)
+                if returns:  # the return value is left in A
+                    self.__record_instruction('LDWA', size - 2, 's')
+                if size:
+                    self.__record_instruction('ADDSP', size, 'i')
 
     ####
-    ## Handling While loops (only variable OP variable)
+    ## Handling While loops (comparisons of variables and constants)
     ####
 
     def visit_While(self, node):
         loop_id = self.__identify()
         loop_name = self.__get_name(loop_id)
-        inverted = {
-            ast.Lt: 'BRGE',  # '<'  in the code means we branch if '>='
-            ast.LtE: 'BRGT',  # '<=' in the code means we branch if '>'
-            ast.Gt: 'BRLE',  # '>'  in the code means we branch if '<='
-            ast.GtE: 'BRLT',  # '>=' in the code means we branch if '<'
-            ast.NotEq: 'BREQ',  # '=' in the code means we branch if '!='
-            ast.Eq: 'BRNE'  # '!=' in the code means we branch if '=='
-        }
-        # left part can only be a variable
-        self.__access_memory(node.test.left, 'LDWA', label=f'test_{loop_name}')
-        # right part can only be a variable
-        self.__access_memory(node.test.comparators[0], 'CPWA')
-        # Branching is condition is not true (thus, inverted)
-        self.__record_instruction(f'{inverted[type(node.test.ops[0])]} end_l_{loop_name}')
+        # Branching out of the loop when the condition is not true
+        self.__condition(node.test, f'end_l_{loop_name}', f'test_{loop_name}')
         # Visiting the body of the loop
         for contents in node.body:
             node_value = contents.__dict__
@@ -198,92 +221,160 @@ class TopLevelProgram(ast.NodeVisitor):
                     self.__first[node_value['targets'][0].id] = False
 
             self.visit(contents)
-        self.__record_instruction(f'BR test_{loop_name}')
+        self.__record_instruction('BR', f'test_{loop_name}')
         # Sentinel marker for the end of the loop
-        self.__record_instruction(f'NOP1', label=f'end_l_{loop_name}')
+        self.__record_instruction('NOP1', label=f'end_l_{loop_name}')
 
     def visit_If(self, node):
+        switch = Switch(node)
+        if self.__jump_tables and switch.dense():
+            self.__jump_table(switch)
+            return
         cond_id = self.__identify()
-        inverted = {
-            ast.Lt: 'BRGE',  # '<'  in the code means we branch if '>='
-            ast.LtE: 'BRGT',  # '<=' in the code means we branch if '>'
-            ast.Gt: 'BRLE',  # '>'  in the code means we branch if '<='
-            ast.GtE: 'BRLT',  # '>=' in the code means we branch if '<'
-            ast.NotEq: 'BREQ',  # '=' in the code means we branch if '!='
-            ast.Eq: 'BRNE'  # '!=' in the code means we branch if '=='
-        }
-        # left part can only be a variable
-        self.__access_memory(node.test.left, 'LDWA', label=f'if_{cond_id}')
-        # right part can only be a variable
-        self.__access_memory(node.test.comparators[0], 'CPWA')
-        # Branching is condition is not true (thus, inverted)
-        if not node.orelse:
-            self.__record_instruction(f'{inverted[type(node.test.ops[0])]} aft_{cond_id}')
-        # Visiting the body of the loop
-
-        if node.orelse:
-            if isinstance(node.orelse[0], ast.If):
-                self.__record_instruction(f'{inverted[type(node.test.ops[0])]} elif_{cond_id}')
-            else:
-                self.__record_instruction(f'{inverted[type(node.test.ops[0])]} else_{cond_id}')
-
+        # Branching when the condition is not true
+        self.__condition(node.test, f'else_{cond_id}' if node.orelse else f'aft_{cond_id}', f'if_{cond_id}')
+        # Visiting the body of the condition
         for contents in node.body:
             self.visit(contents)
-        self.__record_instruction(f'BR aft_{cond_id}')
-
-        while node.orelse and len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If):
-            self.__record_instruction(f'NOP1', label=f'elif_{cond_id}')
-            self.__access_memory(node.test.comparators[0], 'CPWA')
-            self.__record_instruction(f'{inverted[type(node.test.ops[0])]} else_{cond_id}')
-            node = node.orelse[0]
-            self.visit(node.test)
-            for content in node.body:
-                self.visit(content)
-            self.__record_instruction(f'BR aft_{cond_id}')
-
         if node.orelse:
-            self.__record_instruction(f'NOP1', label=f'else_{cond_id}')
+            self.__record_instruction('BR', f'aft_{cond_id}')
+            # an elif is an If nested in the else part, with its own labels
+            self.__record_instruction('NOP1', label=f'else_{cond_id}')
             for contents in node.orelse:
                 self.visit(contents)
-            self.__record_instruction(f'BR aft_{cond_id}')
-
-        if not node.orelse:
-            self.__record_instruction(f'BR aft_{cond_id}')
-
-        self.__record_instruction(f'NOP1', label=f'aft_{cond_id}')
+        self.__record_instruction('NOP1', label=f'aft_{cond_id}')
 
     ####
     ## Not handling function calls
     ####
 
     def visit_FunctionDef(self, node):
-        self.returns = False
-        for s in node.body:
-            if isinstance(s, ast.Return):
-                self.returns = True
-
+        # function bodies are generated separately by FunctionVisitor
         pass
 
     ####
     ## Helper functions
     ####
 
-    def __record_instruction(self, instruction, label=None):
-        self.__instructions.append((label, instruction))
+    def __record_instruction(self, mnemonic, operand=None, mode=None, label=None):
+        self.__instructions.append(Instruction(mnemonic, operand, mode, label))
 
     def __access_memory(self, node, instruction, label=None):
         if isinstance(node, ast.Constant):  # i instruction with value
-            self.__record_instruction(f'{instruction} {node.value},i', label)
+            self.__record_instruction(instruction, node.value, 'i', label)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) \
+                and isinstance(node.operand, ast.Constant):  # negative constant, unless folded
+            self.__record_instruction(instruction, -node.operand.value, 'i', label)
         elif isinstance(node, ast.List):  # no instruction for array initializer
             pass
+        elif isinstance(node, ast.Subscript):  # array element
+            self.__access_element(node, instruction, label)
         elif self.is_constant(node.id):  # i instruction for constant
             name = self.__get_name(node.id)
-            self.__record_instruction(f'{instruction} {name},i', label)
+            self.__record_instruction(instruction, name, 'i', label)
         else:  # d instruction
             name = self.__get_name(node.id)
-            self.__record_instruction(f'{instruction} {name},d', label)
+            self.__record_instruction(instruction, name, 'd', label)
+
+    def __access_element(self, node, instruction, label=None):
+        array = node.value.id
+        name = self.__get_name(array)
+        mode = self.array_modes.get(array)
+        if mode is not None and instruction != 'LDWA':
+            raise ValueError(f'Unsupported access to packed array {array}: {instruction}')
+        if mode == 'bit':  # index in A, array address in X, the bit comes back in A
+            self.__access_memory(node.slice, 'LDWA', label)
+            self.__record_instruction('LDWX', name, 'i')
+            self.__record_instruction('CALL', 'rt_bget')
+            self.runtime_calls.add('rt_bget')
+            return
+        self.__access_memory(node.slice, 'LDWX', label)
+        if mode == 'byte':  # LDBA leaves the high byte of A as it is
+            self.__record_instruction('LDWA', 0, 'i')
+            self.__record_instruction('LDBA', name, 'x')
+        else:
+            self.__record_instruction('ASLX')
+            self.__record_instruction(instruction, name, 'x')
+
+    def __store_packed(self, node, value):
+        array = node.value.id
+        name = self.__get_name(array)
+        if self.array_modes[array] == 'bit':
+            routine = 'rt_bset' if value else 'rt_bclr'
+            self.__access_memory(node.slice, 'LDWA')
+            self.__record_instruction('LDWX', name, 'i')
+            self.__record_instruction('CALL', routine)
+            self.runtime_calls.add(routine)
+            return
+        self.__access_memory(node.slice, 'LDWX')
+        self.__record_instruction('LDWA', value, 'i')
+        self.__record_instruction('STBA', name, 'x')
+
+    def __condition(self, test, target, label):
+        # compares and short-circuit branches to target when the test does not hold,
+        # the first instruction getting the label
+        for step in Condition(test, target, self.__identify).steps:
+            if isinstance(step, str):
+                self.__record_instruction('NOP1', label=step)
+                continue
+            left, right, branch, destination = step
+            self.__access_memory(left, 'LDWA', label=label)
+            self.__access_memory(right, 'CPWA')
+            self.__record_instruction(branch, destination)
+            label = None
+
+    def __jump_table(self, switch):
+        table_id = self.__identify()
+        default = f'else_{table_id}' if switch.default else f'aft_{table_id}'
+        labels = {value: f'case_{self.__identify()}' for value in switch.cases}
+        # X holds the offset of the case in the table, the unsigned compare sending any
+        # value out of its range (those below it wrap around) to the default
+        self.__access_memory(switch.variable, 'LDWX', label=f'if_{table_id}')
+        if switch.low:
+            self.__record_instruction('SUBX', switch.low, 'i')
+        self.__record_instruction('CPWX', switch.high - switch.low + 1, 'i')
+        self.__record_instruction('BRC', default)
+        self.__record_instruction('ASLX')
+        self.__record_instruction('BR', f'jt_{table_id}', 'x')
+        for value in range(switch.low, switch.high + 1):
+            self.__record_instruction('.ADDRSS', labels.get(value, default),
+                                      label=f'jt_{table_id}' if value == switch.low else None)
+        for value, body in switch.cases.items():
+            self.__record_instruction('NOP1', label=labels[value])
+            for contents in body:
+                self.visit(contents)
+            self.__record_instruction('BR', f'aft_{table_id}')
+        if switch.default:
+            self.__record_instruction('NOP1', label=default)
+            for contents in switch.default:
+                self.visit(contents)
+        self.__record_instruction('NOP1', label=f'aft_{table_id}')
+
+    def __arithmetic(self, node):
+        # multiplication, floor division and modulo: shifts for suitable constants,
+        # runtime library call (A op X) otherwise
+        left, right = node.left, node.right
+        if isinstance(node.op, ast.Mult) and isinstance(left, ast.Constant):
+            left, right = right, left
+        if isinstance(right, ast.Constant):
+            sequence = RuntimeLibrary.strength_reduce(node.op, right.value)
+            if sequence is not None:
+                self.__access_memory(left, 'LDWA')
+                for instruction in sequence:
+                    if instruction.mnemonic == 'ADDA' and instruction.operand is None:
+                        self.__access_memory(left, 'ADDA')
+                    else:
+                        self.__instructions.append(instruction)
+                return
+        routine = OPERATIONS[type(node.op)]
+        self.runtime_calls.add(routine)
+        self.__access_memory(left, 'LDWA')
+        self.__access_memory(right, 'LDWX')
+        self.__record_instruction('CALL', routine)
 
     def __identify(self):
+        if self.__label_ids is not None:
+            return next(self.__label_ids)
         result = self.__elem_id
         self.__elem_id = self.__elem_id + 1
         return result